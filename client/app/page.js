@@ -89,9 +89,11 @@ export default function Home() {
   const [greeting, setGreeting] = useState('Initializing...');
   const [result, setResult] = useState(null);
   const [history, setHistory] = useState([]);
+  const [historyCursor, setHistoryCursor] = useState(null); // next_cursor of the last loaded page
   const [isLoading, setIsLoading] = useState(false);
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [generatedIdeas, setGeneratedIdeas] = useState([]);
+  const [streamingText, setStreamingText] = useState(''); // Live Gemini output while generating
   const [tone, setTone] = useState(""); // New state for AI tone
 
   // 2. Inside your Home component, create a filtered list
@@ -112,9 +114,21 @@ export default function Home() {
     try {
       const [g, h] = await Promise.all([publicApi.getGreeting(), publicApi.getHistory()]);
       setGreeting(g.message);
-      setHistory(h);
+      setHistory(h.ideas);
+      setHistoryCursor(h.next_cursor);
     } catch (e) { setGreeting('Ready to Propel'); }
   });
+
+  const loadMoreHistory = async () => {
+    if (!historyCursor) return;
+    try {
+      const page = await publicApi.getHistory(historyCursor);
+      setHistory(prev => [...prev, ...page.ideas]);
+      setHistoryCursor(page.next_cursor);
+    } catch (error) {
+      console.error("Failed to load more history");
+    }
+  };
   useEffect(() => {
     loadData();
   }, [loadData]);
@@ -131,33 +145,45 @@ export default function Home() {
 
     setIsLoading(true);
     setResult(null);
+    setGeneratedIdeas([]);
+    setStreamingText('');
     try {
       // If prompt is empty, we send a "Brainstorm" instruction
       const finalPrompt = prompt
         ? `[Categories: ${selectedCategories.join(', ')}] ${prompt}`
         : `[Categories: ${selectedCategories.join(', ')}] BRAINSTORM_MODE`;
 
-      const data = await publicApi.generateIdea(finalPrompt, tone);
+      const data = await publicApi.generateIdea(finalPrompt, tone, {
+        onToken: (text) => setStreamingText(prev => prev + text),
+        // Ideas appear one by one as the stream delivers them
+        onIdea: (idea) => setGeneratedIdeas(prev => [...prev, idea]),
+      });
       setGeneratedIdeas(data.ideas); // Assuming data.ideas is an array of ideas
       // setResult(data.result); // Remove this line if we're displaying multiple ideas
 
       const updatedHistory = await publicApi.getHistory();
-      setHistory(updatedHistory);
+      setHistory(updatedHistory.ideas);
+      setHistoryCursor(updatedHistory.next_cursor);
     } catch (error) {
       setResult("Engine failed to ignite. Check connection.");
     } finally {
       setIsLoading(false);
+      setStreamingText('');
     }
   };
 
   const toggleStar = async (ideaId) => {
+    const current = generatedIdeas.find(idea => idea.id === ideaId);
+    const starred = !current?.is_starred;
     try {
-      await publicApi.toggleStar(ideaId);
+      await publicApi.setStar(ideaId, starred);
       // Locally update the UI for instant feedback
       setGeneratedIdeas(prev => prev.map(idea =>
-        idea.id === ideaId ? { ...idea, is_starred: !idea.is_starred } : idea
+        idea.id === ideaId ? { ...idea, is_starred: starred } : idea
+      ));
+      setHistory(prev => prev.map(item =>
+        item.id === ideaId ? { ...item, is_starred: starred } : item
       ));
-      loadData(); // Refresh history to show starred status there too
     } catch (error) {
       console.error("Failed to star idea");
     }
@@ -272,12 +298,18 @@ export default function Home() {
                 <div className="flex items-center gap-2 text-purple-400/50 text-[10px] uppercase font-bold tracking-widest">
                   <BrainCircuit size={14} className="animate-pulse" /> AI Processing
                 </div>
-                <Skeleton className="h-3 w-full bg-white/5" />
-                <Skeleton className="h-3 w-3/4 bg-white/5" />
+                {streamingText ? (
+                  <p className="text-xs text-gray-400 whitespace-pre-wrap max-h-40 overflow-y-auto">{streamingText}</p>
+                ) : (
+                  <>
+                    <Skeleton className="h-3 w-full bg-white/5" />
+                    <Skeleton className="h-3 w-3/4 bg-white/5" />
+                  </>
+                )}
               </div>
             )}
 
-            {generatedIdeas.length > 0 && !isLoading && (
+            {generatedIdeas.length > 0 && (
               <div className="mt-6 grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4 animate-in fade-in zoom-in-95 duration-500">
                 {generatedIdeas.map((idea, index) => (
                   <Card key={idea.id || index} className="bg-purple-500/5 border-purple-500/20 group relative overflow-hidden">
@@ -344,6 +376,11 @@ export default function Home() {
                 ) : (
                   history.map((item) => <IdeaCard key={item.id} item={item} />)
                 )}
+                {historyCursor && (
+                  <Button variant="ghost" size="sm" className="text-xs text-gray-500" onClick={loadMoreHistory}>
+                    Load more
+                  </Button>
+                )}
               </div>
             </TabsContent>
 
@@ -11,6 +11,36 @@ const getHeaders = () => {
   };
 };
 
+// Conditional GETs: the last body and ETag per URL (and per signed-in token). On a 304 the
+// cached body is returned, so unchanged history refreshes cost no DB read and no transfer.
+const CONDITIONAL_CACHE_MAX_ENTRIES = 50;
+const conditionalCache = new Map();
+
+const conditionalGet = async (url, headers = {}) => {
+  const key = `${headers.Authorization || ''} ${url}`;
+  const cached = conditionalCache.get(key);
+  const response = await fetch(url, {
+    headers: cached ? { ...headers, 'If-None-Match': cached.etag } : headers,
+  });
+  if (response.status === 304 && cached) {
+    conditionalCache.delete(key); // re-insert to keep the map in least-recently-used order
+    conditionalCache.set(key, cached);
+    return { ok: true, data: cached.data };
+  }
+  if (!response.ok) return { ok: false, data: null };
+
+  const data = await response.json();
+  const etag = response.headers.get('ETag');
+  conditionalCache.delete(key);
+  if (etag) {
+    conditionalCache.set(key, { etag, data });
+    if (conditionalCache.size > CONDITIONAL_CACHE_MAX_ENTRIES) {
+      conditionalCache.delete(conditionalCache.keys().next().value);
+    }
+  }
+  return { ok: true, data };
+};
+
 export const publicApi = {
   // Generic POST method
   post: async (endpoint, body) => {
@@ -34,9 +64,8 @@ export const publicApi = {
 
   getGreeting: async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/greeting`);
-      if (!response.ok) throw new Error('Network response was not ok');
-      const data = await response.json();
+      const { ok, data } = await conditionalGet(`${API_BASE_URL}/api/greeting`);
+      if (!ok) throw new Error('Network response was not ok');
       return data;
     } catch (error) {
       console.error("API Error:", error);
@@ -44,21 +73,83 @@ export const publicApi = {
     }
   },
 
-  generateIdea: async (prompt, tone) => {
-    const response = await fetch(`${API_BASE_URL}/api/generate`, {
+  // Streams /api/generate/stream (SSE). onToken(text) fires per Gemini chunk, onIdea(idea)
+  // as soon as each idea is saved. Resolves with the final payload ({ ideas, credits_remaining, ... }).
+  generateIdea: async (prompt, tone, { onToken, onIdea } = {}) => {
+    const response = await fetch(`${API_BASE_URL}/api/generate/stream`, {
       method: 'POST',
-      headers: getHeaders(),
+      headers: { ...getHeaders(), Accept: 'text/event-stream' },
       body: JSON.stringify({ prompt, tone }),
     });
-    if (!response.ok) throw new Error('Generation failed');
+    if (!response.ok || !response.body) throw new Error('Generation failed');
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+    let streamError = null;
+
+    const handleFrame = (frame) => {
+      let event = 'message';
+      let data = '';
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (!data) return;
+      const payload = JSON.parse(data);
+      if (event === 'token') onToken?.(payload.text);
+      else if (event === 'idea') onIdea?.(payload);
+      else if (event === 'error') streamError = payload.detail;
+      else if (event === 'done') result = payload;
+    };
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        handleFrame(buffer.slice(0, boundary));
+        buffer = buffer.slice(boundary + 2);
+      }
+    }
+
+    if (!result || (result.ideas.length === 0 && streamError)) {
+      throw new Error(streamError || 'Generation failed');
+    }
+    return result;
+  },
+
+  // Returns one page: { ideas: [{ id, name, preview, is_starred, created_at }], next_cursor }
+  getHistory: async (cursor = null, limit = 20) => {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor) params.set('cursor', cursor);
+    const { ok, data } = await conditionalGet(`${API_BASE_URL}/api/history?${params}`, getHeaders());
+    if (!ok) throw new Error('Failed to fetch history');
+    return data;
+  },
+
+  // Server-side keyword search. filters: { starred, since, until } (ISO dates).
+  // Resolves with { total, results: [{ id, name, preview, is_starred, created_at, score }] }
+  searchIdeas: async (q, { starred, since, until, limit = 20 } = {}) => {
+    const params = new URLSearchParams({ q, limit: String(limit) });
+    if (starred !== undefined) params.set('starred', String(starred));
+    if (since) params.set('since', since);
+    if (until) params.set('until', until);
+    const response = await fetch(`${API_BASE_URL}/api/ideas/search?${params}`, {
+      headers: getHeaders(),
+    });
+    if (!response.ok) throw new Error('Search failed');
     return await response.json();
   },
 
-  getHistory: async () => {
-    const response = await fetch(`${API_BASE_URL}/api/history`, {
+  // Full idea body (history pages only carry a preview)
+  getIdea: async (id) => {
+    const response = await fetch(`${API_BASE_URL}/api/ideas/${id}`, {
       headers: getHeaders(),
     });
-    if (!response.ok) throw new Error('Failed to fetch history');
+    if (!response.ok) throw new Error('Failed to fetch idea');
     return await response.json();
   },
 
@@ -78,5 +169,27 @@ export const publicApi = {
     });
     if (!response.ok) throw new Error('Failed to toggle star');
     return await response.json();
+  },
+
+  // Explicit target state, so repeated clicks can't flip it back
+  setStar: async (id, starred) => {
+    const response = await fetch(`${API_BASE_URL}/api/ideas/${id}/star`, {
+      method: 'PUT',
+      headers: getHeaders(),
+      body: JSON.stringify({ starred }),
+    });
+    if (!response.ok) throw new Error('Failed to star idea');
+    return await response.json();
+  },
+
+  // action: 'star' | 'unstar' | 'delete'. Resolves with { succeeded, failed, results: [{ id, status }] }
+  bulkIdeas: async (action, ids) => {
+    const response = await fetch(`${API_BASE_URL}/api/ideas/bulk`, {
+      method: 'POST',
+      headers: getHeaders(),
+      body: JSON.stringify({ action, ids }),
+    });
+    if (!response.ok) throw new Error(`Failed to ${action} ideas`);
+    return await response.json();
   }
 };
\ No newline at end of file
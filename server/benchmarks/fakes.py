@@ -0,0 +1,247 @@
+"""
+Local stand-ins for Appwrite and Gemini so benchmarks run offline and reproducibly.
+Both take a fixed latency (plus optional jitter) and an error rate.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from appwrite.exception import AppwriteException
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+
+class FaultProfile:
+    """Latency (seconds) with uniform jitter, and the probability that a call fails."""
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+
+# --- Appwrite ---
+
+class FakeDatabases:
+    """
+    In-memory drop-in for `appwrite.services.databases.Databases` (document API only).
+    Calls block for the configured latency, like the real SDK does, so the AsyncDatabases
+    thread pool is exercised realistically. Supports the Query methods the server uses.
+    """
+    def __init__(self, profile: Optional[FaultProfile] = None):
+        self.profile = profile or FaultProfile()
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _io(self):
+        self.calls += 1
+        delay = self.profile.delay()
+        if delay:
+            time.sleep(delay)
+        if self.profile.should_fail():
+            raise AppwriteException("Injected failure", 503, "general_server_error")
+
+    def _collection(self, database_id: str, collection_id: str) -> Dict[str, Dict[str, Any]]:
+        return self._collections.setdefault(f"{database_id}/{collection_id}", {})
+
+    def seed(self, database_id: str, collection_id: str, data: dict, document_id: Optional[str] = None) -> dict:
+        """Inserts a document without latency or failures."""
+        document_id = document_id or uuid.uuid4().hex
+        now = datetime.utcnow().isoformat()
+        document = {"$id": document_id, "$createdAt": now, "$updatedAt": now, **data}
+        with self._lock:
+            self._collection(database_id, collection_id)[document_id] = document
+        return dict(document)
+
+    def list_documents(self, database_id: str, collection_id: str, queries: Optional[List[str]] = None):
+        self._io()
+        with self._lock:
+            documents = list(self._collection(database_id, collection_id).values())
+
+        limit, cursor, order, fields = 25, None, None, None
+        for raw in queries or []:
+            query = json.loads(raw)
+            method, attribute, values = query.get("method"), query.get("attribute"), query.get("values") or []
+            if method == "equal":
+                documents = [d for d in documents if d.get(attribute) in values]
+            elif method == "limit":
+                limit = values[0]
+            elif method == "cursorAfter":
+                cursor = values[0]
+            elif method == "orderDesc":
+                order = (attribute, True)
+            elif method == "orderAsc":
+                order = (attribute, False)
+            elif method == "select":
+                fields = values
+
+        total = len(documents)
+        if order:
+            documents.sort(key=lambda d: d.get(order[0]) or "", reverse=order[1])
+        if cursor:
+            ids = [d["$id"] for d in documents]
+            if cursor not in ids:
+                raise AppwriteException("Invalid cursor", 400, "document_not_found")
+            documents = documents[ids.index(cursor) + 1:]
+        documents = documents[:limit]
+        if fields:
+            documents = [{k: v for k, v in d.items() if k in fields or k.startswith("$")} for d in documents]
+        return {"total": total, "documents": [dict(d) for d in documents]}
+
+    def get_document(self, database_id: str, collection_id: str, document_id: str, queries: Optional[List[str]] = None):
+        self._io()
+        with self._lock:
+            document = self._collection(database_id, collection_id).get(document_id)
+        if document is None:
+            raise AppwriteException("Document not found", 404, "document_not_found")
+        return dict(document)
+
+    def create_document(self, database_id: str, collection_id: str, document_id: str, data: dict, permissions=None):
+        self._io()
+        if document_id == "unique()":
+            document_id = uuid.uuid4().hex
+        with self._lock:
+            if document_id in self._collection(database_id, collection_id):
+                raise AppwriteException("Document already exists", 409, "document_already_exists")
+        return self.seed(database_id, collection_id, data, document_id)
+
+    def update_document(self, database_id: str, collection_id: str, document_id: str, data: Optional[dict] = None, permissions=None):
+        self._io()
+        with self._lock:
+            document = self._collection(database_id, collection_id).get(document_id)
+            if document is None:
+                raise AppwriteException("Document not found", 404, "document_not_found")
+            document.update(data or {})
+            document["$updatedAt"] = datetime.utcnow().isoformat()
+            return dict(document)
+
+    def decrement_document_attribute(self, database_id: str, collection_id: str, document_id: str, attribute: str, value=None, min=None):
+        self._io()
+        with self._lock:
+            document = self._collection(database_id, collection_id).get(document_id)
+            if document is None:
+                raise AppwriteException("Document not found", 404, "document_not_found")
+            new_value = document.get(attribute, 0) - (1 if value is None else value)
+            if min is not None and new_value < min:
+                raise AppwriteException("Value would go below the minimum", 400, "attribute_limit_exceeded")
+            document[attribute] = new_value
+            document["$updatedAt"] = datetime.utcnow().isoformat()
+            return dict(document)
+
+    def delete_document(self, database_id: str, collection_id: str, document_id: str):
+        self._io()
+        with self._lock:
+            if self._collection(database_id, collection_id).pop(document_id, None) is None:
+                raise AppwriteException("Document not found", 404, "document_not_found")
+        return {}
+
+
+# --- Gemini ---
+
+ANALYSIS_REPLY = (
+    "NAME: Plan | PROBLEM: The market is fragmented and slow. | SOLUTION: Start with one niche, "
+    "validate pricing with ten customers, then expand through integrations. " * 4
+)
+
+
+def _structured_reply(schema: dict) -> str:
+    """A JSON array matching an idea responseSchema (batch schemas also get a Source number)."""
+    count = schema.get("maxItems", 3)
+    sourced = "Source" in schema.get("items", {}).get("properties", {})
+    ideas = []
+    for i in range(1, count + 1):
+        idea = {
+            "Name": f"Idea {i}",
+            "Problem": f"Teams lose hours to manual step {i}.",
+            "Solution": f"Automate step {i} with a small agent.",
+        }
+        if sourced:
+            idea["Source"] = i
+        ideas.append(idea)
+    return json.dumps(ideas)
+
+
+def _reply_for(payload: dict) -> str:
+    schema = payload.get("generationConfig", {}).get("responseSchema")
+    return _structured_reply(schema) if schema else ANALYSIS_REPLY
+
+
+def _usage(text: str) -> dict:
+    completion = max(1, len(text) // 4)
+    return {"promptTokenCount": 120, "candidatesTokenCount": completion, "totalTokenCount": 120 + completion}
+
+
+def _candidate(text: str, finished: bool = True) -> dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return candidate
+
+
+def create_fake_gemini_app(profile: Optional[FaultProfile] = None, stream_chunks: int = 8) -> Starlette:
+    """
+    ASGI app answering `models/<model>:generateContent` and `:streamGenerateContent?alt=sse`.
+    Serve it with uvicorn, or hand it to GeminiClient via `httpx.ASGITransport(app=...)`.
+    Injected failures return 503 (which the client retries).
+    """
+    profile = profile or FaultProfile()
+
+    async def handle(request: Request):
+        model_method = request.path_params["model_method"]
+        payload = await request.json()
+        await asyncio.sleep(profile.delay())
+        if profile.should_fail():
+            return JSONResponse({"error": {"code": 503, "message": "Injected failure"}}, status_code=503)
+        text = _reply_for(payload)
+
+        if model_method.endswith(":generateContent"):
+            return JSONResponse({"candidates": [_candidate(text)], "usageMetadata": _usage(text)})
+        if model_method.endswith(":streamGenerateContent"):
+            size = max(1, len(text) // stream_chunks)
+            pieces = [text[i:i + size] for i in range(0, len(text), size)]
+
+            async def events():
+                for index, piece in enumerate(pieces):
+                    last = index == len(pieces) - 1
+                    chunk = {"candidates": [_candidate(piece, finished=last)]}
+                    if last:
+                        chunk["usageMetadata"] = _usage(text)
+                    yield f"data: {json.dumps(chunk)}\r\n\r\n"
+                    await asyncio.sleep(profile.latency / (stream_chunks * 4))
+            return StreamingResponse(events(), media_type="text/event-stream")
+        return Response(status_code=404)
+
+    return Starlette(routes=[Route("/models/{model_method:path}", handle, methods=["POST"])])
+
+
+if __name__ == "__main__":
+    # Standalone fake Gemini: point the server at it with GEMINI_BASE_URL=http://127.0.0.1:8765
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Gemini API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = create_fake_gemini_app(FaultProfile(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate))
+    uvicorn.run(fake, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,158 @@
+"""Load driver, latency statistics and baseline comparison."""
+import asyncio
+import json
+import math
+import os
+import platform
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(name: str, latencies: List[float], errors: int, wall_seconds: float) -> Dict[str, float]:
+    """Throughput and latency percentiles (ms) for one scenario."""
+    ordered = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        "name": name,
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "throughput_rps": round(total / wall_seconds, 2) if wall_seconds else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+async def run_load(
+    name: str,
+    operation: Callable[[int], Awaitable[bool]],
+    requests: int,
+    concurrency: int,
+    warmup: int = 0,
+) -> Dict[str, float]:
+    """
+    Runs `operation(i)` `requests` times with `concurrency` workers (closed loop).
+    The operation returns False (or raises) to count as an error; errors are excluded from latencies.
+    """
+    for i in range(warmup):
+        try:
+            await operation(-1 - i)
+        except Exception:
+            pass
+
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ok = await operation(i)
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(max(1, concurrency))])
+    return summarize(name, latencies, errors, time.perf_counter() - start)
+
+
+def run_micro(name: str, fn: Callable[[int], object], iterations: int, warmup: int = 3) -> Dict[str, float]:
+    """Times a synchronous function call by call."""
+    for i in range(warmup):
+        fn(-1 - i)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(name, latencies, 0, time.perf_counter() - start)
+
+
+# --- Reporting ---
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": str(os.cpu_count()),
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+def format_table(results: List[Dict[str, float]]) -> str:
+    header = f"{'scenario':<28}{'reqs':>7}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r['name']:<28}{r['requests']:>7}{r['errors']:>6}{r['throughput_rps']:>10.1f}"
+            f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Dict[str, float]]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return {r["name"]: r for r in json.load(f)["results"]}
+
+
+def save_results(path: str, results: List[Dict[str, float]], config: dict):
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "config": config, "results": results}, f, indent=2)
+        f.write("\n")
+
+
+def compare(results: List[Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """
+    Regressions against the baseline: p95/p99 slower, or throughput lower, by more than `tolerance`
+    (a fraction, e.g. 0.2 = 20%), or a higher error rate. Scenarios missing from the baseline are skipped.
+    """
+    regressions = []
+    for r in results:
+        base = baseline.get(r["name"])
+        if base is None:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if base[metric] and r[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{r['name']}: {metric} {base[metric]:.2f} -> {r[metric]:.2f}")
+        if base["throughput_rps"] and r["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{r['name']}: throughput {base['throughput_rps']:.1f} -> {r['throughput_rps']:.1f} rps")
+        if r["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{r['name']}: error rate {base['error_rate']:.2%} -> {r['error_rate']:.2%}")
+    return regressions
+
+
+def format_comparison(results: List[Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> str:
+    lines = []
+    for r in results:
+        base = baseline.get(r["name"])
+        if base is None:
+            lines.append(f"{r['name']:<28}(no baseline)")
+            continue
+        deltas = []
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            if base[metric]:
+                deltas.append(f"{metric} {(r[metric] - base[metric]) / base[metric]:+.1%}")
+        lines.append(f"{r['name']:<28}" + "  ".join(deltas))
+    return "\n".join(lines)
@@ -0,0 +1,88 @@
+"""
+Import-time budget check for the API process.
+
+    cd server
+    python -m benchmarks.import_time                 # report + enforce the default budget
+    python -m benchmarks.import_time --budget-ms 800 --top 30
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter, prints the slowest imports and
+exits 1 if `main` takes longer than the budget or if a module that must stay lazy (the NLP stack,
+the legacy SQL layer) is imported eagerly.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "2000"))
+# Loaded on first use only; importing any of these at startup is a regression
+LAZY_MODULES = ["bs4", "sumy", "nltk", "yake", "sqlalchemy", "src.database"]
+
+
+def measure(module: str = "main", runs: int = 3):
+    """
+    Best-of-N import times from -X importtime: ({module: cumulative us}, {module imported directly by
+    `module`: cumulative us}).
+    """
+    env = {
+        **os.environ,
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "import-check"),
+        "APPWRITE_ENDPOINT": os.getenv("APPWRITE_ENDPOINT", "http://appwrite.invalid/v1"),
+        "APPWRITE_PROJECT_ID": os.getenv("APPWRITE_PROJECT_ID", "import-check"),
+        "APPWRITE_API_KEY": os.getenv("APPWRITE_API_KEY", "import-check"),
+    }
+    best = None
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=SERVER_DIR, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+        timings, direct = {}, {}
+        for line in completed.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, raw_name = line[len("import time:"):].split("|")
+            if not cumulative.strip().isdigit():
+                continue
+            name = raw_name.strip()
+            timings[name] = int(cumulative)
+            # Nesting is shown as two spaces per level below the top-level import
+            if len(raw_name) - len(raw_name.lstrip()) == 3:
+                direct[name] = int(cumulative)
+        if best is None or timings.get(module, 0) < best[0].get(module, 0):
+            best = (timings, direct)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check the API's import time")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    timings, direct = measure(args.module, args.runs)
+    total_ms = timings.get(args.module, 0) / 1000
+
+    print(f"{'imported by ' + args.module:<40}{'cumulative ms':>15}")
+    for name, us in sorted(direct.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<40}{us / 1000:>15.1f}")
+    print(f"\nimport {args.module}: {total_ms:.1f}ms (budget {args.budget_ms:.0f}ms)")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.1f}ms exceeds the {args.budget_ms:.0f}ms budget")
+    eager = [name for name in LAZY_MODULES if name in timings]
+    if eager:
+        failures.append(f"modules that should load lazily were imported at startup: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Micro-benchmarks for CPU-bound helpers on the request path."""
+from typing import Callable, Dict
+
+SAMPLE_PARAGRAPHS = [
+    "Small clinics still schedule equipment maintenance with paper logs and phone calls.",
+    "Missed calibrations lead to failed inspections and idle machines for days at a time.",
+    "Vendors offer service contracts, but pricing is opaque and response times vary widely.",
+    "A shared marketplace could match clinics with certified technicians near them.",
+    "Procurement teams want predictable monthly costs instead of surprise repair invoices.",
+    "Regulators are tightening audit requirements for diagnostic devices every year.",
+]
+
+
+def sample_html(paragraphs: int = 60) -> str:
+    """Deterministic article-like page with the boilerplate the cleaner has to strip."""
+    body = "".join(f"<p>{SAMPLE_PARAGRAPHS[i % len(SAMPLE_PARAGRAPHS)]} (section {i})</p>" for i in range(paragraphs))
+    return (
+        "<html><head><style>p{margin:0}</style><script>var tracking = 1;</script></head><body>"
+        "<nav><a href='/'>Home</a><a href='/pricing'>Pricing</a></nav><header>Industry News</header>"
+        f"<article>{body}</article><footer>Copyright</footer></body></html>"
+    )
+
+
+def build_micro_benchmarks() -> Dict[str, Callable[[int], object]]:
+    """Benchmark name -> fn(i). NLP stages get a fresh memo per call so we time the real work."""
+    from src.generation import extract_categories
+    from src.nlp_processor import NLPPipeline
+    from src.response_cache import response_cache_key
+    from src.similarity import _UserIndex, embed
+
+    pipeline = NLPPipeline()
+    html = sample_html()
+    cleaned = pipeline.clean_html(html)
+    prompt = "A subscription marketplace for refurbished lab equipment. [Categories: Healthcare, Fintech, Logistics]"
+
+    # A heavy user's index: 5000 ideas
+    index = _UserIndex(len(embed("")))
+    index.add({"$id": str(n), "name": f"Idea {n}", "problem": SAMPLE_PARAGRAPHS[n % len(SAMPLE_PARAGRAPHS)] + f" {n}"}
+              for n in range(5000))
+    query = embed(prompt)
+
+    def uncached(stage):
+        def fn(i: int):
+            pipeline._memo.clear()
+            return stage()
+        return fn
+
+    return {
+        "extract_categories": lambda i: extract_categories(prompt),
+        "response_cache_key": lambda i: response_cache_key("You are a startup consultant.", prompt, "casual", "b, a"),
+        "nlp_clean_html": uncached(lambda: pipeline.clean_html(html)),
+        "nlp_summarize": uncached(lambda: pipeline.summarize(cleaned)),
+        "nlp_extract_keywords": uncached(lambda: pipeline.extract_keywords(cleaned)),
+        "nlp_memo_hit": lambda i: pipeline.clean_html(html),
+        "similarity_embed": lambda i: embed(f"{prompt} {i}"),
+        "similarity_search_5k": lambda i: index.search(query, 10, 0.2),
+    }
@@ -0,0 +1,131 @@
+"""
+Benchmark runner.
+
+    cd server
+    python -m benchmarks.run                                  # everything, default profile
+    python -m benchmarks.run -s generate_brainstorm -s history -n 500 -c 32
+    python -m benchmarks.run --db-latency-ms 40 --llm-error-rate 0.05
+    python -m benchmarks.run --save-baseline                  # record benchmarks/baseline.json
+    python -m benchmarks.run --compare                        # exit 1 on regressions vs the baseline
+
+Load scenarios: login, generate_brainstorm, generate_analysis, generate_cached, generate_stream,
+history, search, idea_detail, star, toggle_star, bulk_star, delete. Micro-benchmarks: extract_categories,
+response_cache_key, nlp_clean_html, nlp_summarize, nlp_extract_keywords, nlp_memo_hit, similarity_embed,
+similarity_search_5k.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from .fakes import FaultProfile
+from .harness import compare, format_comparison, format_table, load_baseline, run_load, run_micro, save_results
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+# bcrypt dominates login; keep its default request count low so a full run stays quick
+SLOW_SCENARIOS = {"login": 50}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="PropelAI server benchmarks (offline)")
+    parser.add_argument("-s", "--scenario", action="append", help="Run only these scenarios/micro-benchmarks")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="Requests per load scenario")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("--iterations", type=int, default=50, help="Iterations per micro-benchmark")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--db-latency-ms", type=float, default=15)
+    parser.add_argument("--db-jitter-ms", type=float, default=5)
+    parser.add_argument("--db-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-url", help="Use a standalone fake Gemini server instead of the in-process one")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--no-load", action="store_true", help="Skip HTTP load scenarios")
+    parser.add_argument("--no-micro", action="store_true", help="Skip micro-benchmarks")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--compare", action="store_true", help="Fail (exit 1) on regressions vs the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown fraction before flagging")
+    return parser.parse_args(argv)
+
+
+def _selected(name: str, args) -> bool:
+    return not args.scenario or name in args.scenario
+
+
+async def run_load_scenarios(args):
+    from .scenarios import BenchEnvironment, build_scenarios
+
+    env = BenchEnvironment(
+        db_profile=FaultProfile(args.db_latency_ms / 1000, args.db_jitter_ms / 1000, args.db_error_rate, args.seed),
+        llm_profile=FaultProfile(args.llm_latency_ms / 1000, args.llm_jitter_ms / 1000, args.llm_error_rate, args.seed),
+        gemini_url=args.gemini_url,
+    )
+    results = []
+    async with env.client() as http:
+        for name, operation in build_scenarios(env, http, args.requests, args.warmup).items():
+            if not _selected(name, args):
+                continue
+            requests = args.requests if args.scenario else min(args.requests, SLOW_SCENARIOS.get(name, args.requests))
+            print(f"running {name} ({requests} requests, concurrency {args.concurrency})...", file=sys.stderr)
+            results.append(await run_load(name, operation, requests, args.concurrency, args.warmup))
+
+    from src.llm_client import close_llm_client
+    await close_llm_client()
+    return results
+
+
+def run_micro_benchmarks(args):
+    from .micro import build_micro_benchmarks
+    from .scenarios import _configure_environment
+
+    _configure_environment() # server modules read their settings at import time
+    results = []
+    for name, fn in build_micro_benchmarks().items():
+        if not _selected(name, args):
+            continue
+        print(f"running {name} ({args.iterations} iterations)...", file=sys.stderr)
+        try:
+            results.append(run_micro(name, fn, args.iterations))
+        except LookupError as e:
+            # sumy/NLTK data (e.g. punkt) isn't installed
+            print(f"skipped {name}: {str(e).strip().splitlines()[0]}", file=sys.stderr)
+    return results
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = []
+    if not args.no_load:
+        results += asyncio.run(run_load_scenarios(args))
+    if not args.no_micro:
+        results += run_micro_benchmarks(args)
+
+    print(format_table(results))
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "save_baseline", "compare")}
+    if args.output:
+        save_results(args.output, results, config)
+
+    baseline = load_baseline(args.baseline)
+    status = 0
+    if baseline:
+        print("\nvs baseline:")
+        print(format_comparison(results, baseline))
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:")
+            print("\n".join(f"  {line}" for line in regressions))
+            status = 1 if args.compare else 0
+    elif args.compare:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline first.")
+
+    if args.save_baseline:
+        save_results(args.baseline, results, config)
+        print(f"\nBaseline saved to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
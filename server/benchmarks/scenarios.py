@@ -0,0 +1,172 @@
+"""
+HTTP load scenarios against the real FastAPI app, with Appwrite and Gemini replaced by the fakes.
+The app is driven in-process through httpx's ASGI transport, so no ports or credentials are needed.
+"""
+import os
+import tempfile
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from .fakes import FakeDatabases, FaultProfile, create_fake_gemini_app
+
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+HISTORY_SEED_IDEAS = 500
+BULK_SIZE = 20
+
+BRAINSTORM_PROMPT = "BRAINSTORM_MODE [Categories: Fintech, Health]"
+ANALYSIS_PROMPT = "A subscription marketplace for refurbished lab equipment. [Categories: Healthcare]"
+
+
+def _configure_environment():
+    """Settings that must be in place before any server module is imported."""
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    os.environ.setdefault("APPWRITE_ENDPOINT", "http://appwrite.invalid/v1")
+    os.environ.setdefault("APPWRITE_PROJECT_ID", "bench")
+    os.environ.setdefault("APPWRITE_API_KEY", "bench")
+    # Benchmarks measure throughput, not the limiter
+    os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "100000000")
+    os.environ.setdefault("RATE_LIMIT_BURST", "100000000")
+    # Keep caches and queues out of the working tree and start cold
+    os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="propelai-bench-"))
+    os.environ.setdefault("JOB_QUEUE_BACKEND", "memory")
+
+
+class BenchEnvironment:
+    """The app wired to fake Appwrite/Gemini, plus a seeded user and ideas."""
+    def __init__(self, db_profile: FaultProfile, llm_profile: FaultProfile, gemini_url: str = None):
+        _configure_environment()
+        from src import async_db
+
+        self.fake_db = FakeDatabases(db_profile)
+        # Must happen before any other server module is imported: they grab the singleton at import time
+        async_db._async_db = async_db.AsyncDatabases(client=self.fake_db)
+
+        from src.llm_client import GeminiClient, set_llm_client
+
+        if gemini_url:
+            # A standalone `python -m benchmarks.fakes` server (real sockets, true streaming)
+            set_llm_client(GeminiClient(api_key="bench", base_url=gemini_url))
+        else:
+            transport = httpx.ASGITransport(app=create_fake_gemini_app(llm_profile))
+            set_llm_client(GeminiClient(api_key="bench", base_url="http://fake-gemini", transport=transport))
+
+        import main
+        from src.appwrite_service import DATABASE_ID, IDEAS_COLLECTION_ID, USERS_COLLECTION_ID
+        from src.auth import create_access_token
+        from src.password_service import BCRYPT_ROUNDS, _hash_password
+
+        self.app = main.app
+        self.user = self.fake_db.seed(DATABASE_ID, USERS_COLLECTION_ID, {
+            "email": BENCH_EMAIL,
+            "full_name": "Bench User",
+            "hashed_password": _hash_password(BENCH_PASSWORD, BCRYPT_ROUNDS),
+            "subscription_tier": "free",
+            "idea_credits": 10 ** 9,
+            "is_active": True,
+        })
+        self.token = create_access_token({"user_id": self.user["$id"], "email": BENCH_EMAIL})
+        self._ideas = (DATABASE_ID, IDEAS_COLLECTION_ID)
+        self.idea_ids = self.seed_ideas(HISTORY_SEED_IDEAS)
+
+    def seed_ideas(self, count: int) -> List[str]:
+        ids = []
+        for i in range(count):
+            doc = self.fake_db.seed(*self._ideas, {
+                "owner_id": self.user["$id"],
+                "name": f"Seeded idea {i}",
+                "problem": f"Seeded problem statement {i} " * 4,
+                "result": f"NAME: Seeded idea {i} | PROBLEM: ... | SOLUTION: ... " * 20,
+                "created_at": f"2024-01-01T00:00:{i % 60:02d}",
+                "is_starred": False,
+            })
+            ids.append(doc["$id"])
+        return ids
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=self.app),
+            base_url="http://bench",
+            headers={"Authorization": f"Bearer {self.token}"},
+            timeout=120,
+        )
+
+
+def build_scenarios(
+    env: BenchEnvironment, http: httpx.AsyncClient, requests: int, warmup: int = 0
+) -> Dict[str, Callable[[int], Awaitable[bool]]]:
+    """Scenario name -> operation(i) returning True on success."""
+
+    async def login(i: int) -> bool:
+        r = await http.post("/auth/login", json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+        return r.status_code == 200
+
+    def generate(prompt: str, no_cache: bool = True):
+        async def operation(i: int) -> bool:
+            r = await http.post("/api/generate", json={"prompt": prompt, "no_cache": no_cache})
+            return r.status_code == 200
+        return operation
+
+    async def generate_stream(i: int) -> bool:
+        r = await http.post("/api/generate/stream", json={"prompt": BRAINSTORM_PROMPT, "no_cache": True})
+        return r.status_code == 200 and "event: done" in r.text and '"status": "error"' not in r.text
+
+    async def history(i: int) -> bool:
+        r = await http.get("/api/history", params={"limit": 20})
+        return r.status_code == 200
+
+    history_etag: Dict[str, str] = {}
+
+    async def history_revalidate(i: int) -> bool:
+        """The client's conditional refresh of an unchanged first page (304, no Appwrite read)."""
+        if "etag" not in history_etag:
+            history_etag["etag"] = (await http.get("/api/history", params={"limit": 20})).headers["ETag"]
+        r = await http.get("/api/history", params={"limit": 20}, headers={"If-None-Match": history_etag["etag"]})
+        return r.status_code == 304
+
+    async def search(i: int) -> bool:
+        r = await http.get("/api/ideas/search", params={"q": f"seeded statement {i % HISTORY_SEED_IDEAS}"})
+        return r.status_code == 200 and r.json()["total"] > 0
+
+    async def idea_detail(i: int) -> bool:
+        r = await http.get(f"/api/ideas/{env.idea_ids[i % len(env.idea_ids)]}")
+        return r.status_code == 200
+
+    async def star(i: int) -> bool:
+        idea_id = env.idea_ids[i % len(env.idea_ids)]
+        r = await http.put(f"/api/ideas/{idea_id}/star", json={"starred": i % 2 == 0})
+        return r.status_code == 200
+
+    async def toggle_star(i: int) -> bool:
+        r = await http.patch(f"/api/ideas/{env.idea_ids[i % len(env.idea_ids)]}/toggle-star")
+        return r.status_code == 200
+
+    async def bulk_star(i: int) -> bool:
+        start = (i * BULK_SIZE) % len(env.idea_ids)
+        ids = env.idea_ids[start:start + BULK_SIZE]
+        r = await http.post("/api/ideas/bulk", json={"action": "star" if i % 2 == 0 else "unstar", "ids": ids})
+        return r.status_code == 200 and r.json()["failed"] == 0
+
+    # Every delete needs its own document (warmup calls use negative indexes, taken from the end)
+    delete_ids = env.seed_ideas(requests + warmup)
+
+    async def delete(i: int) -> bool:
+        r = await http.delete(f"/api/ideas/{delete_ids[i]}")
+        return r.status_code == 200
+
+    return {
+        "login": login,
+        "generate_brainstorm": generate(BRAINSTORM_PROMPT),
+        "generate_analysis": generate(ANALYSIS_PROMPT),
+        "generate_cached": generate(BRAINSTORM_PROMPT, no_cache=False),
+        "generate_stream": generate_stream,
+        "history": history,
+        "history_revalidate": history_revalidate,
+        "search": search,
+        "idea_detail": idea_detail,
+        "star": star,
+        "toggle_star": toggle_star,
+        "bulk_star": bulk_star,
+        "delete": delete,
+    }
@@ -3,29 +3,83 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-import re
+import json
+import asyncio
+import anyio
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException, Depends, APIRouter
+from fastapi import FastAPI, HTTPException, Depends, APIRouter, Header
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from appwrite.id import ID
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response, StreamingResponse
+from appwrite.exception import AppwriteException
 from appwrite.query import Query
 
 # Import core files from the src directory
-from src.nlp_processor import NLPProcessor
+from src.nlp_processor import NLPProcessor, warm_nlp_pipeline
+from src.preprocess import shutdown_preprocess_engine
+from src.llm_client import close_llm_client
+from src.async_db import get_async_db
+from src.idea_store import (
+    BULK_MAX_IDS, BulkIdeaRequest, StarRequest, apply_bulk_action, delete_ideas, idea_body, owned_idea_ids,
+    persist_ideas
+)
+from src.response_cache import response_cache
+from src.generation import (
+    IdeaRequest, run_generation, build_generation_prompt, generation_config, generation_cache_key,
+    brainstorm_idea_data, analysis_idea_data, repair_brainstorm, reserve_generation_credit, charge_generation,
+    find_duplicate_idea, duplicate_response
+)
+from src.credits import credit_ledger
+from src.admission import rate_limit, rate_limiter, llm_admission
+from src.metrics import MetricsMiddleware, register_gauge, render_metrics, stage
+from src.idea_parser import IdeaStreamParser, serialize_ideas
+from src import idea_events
+from src.similarity import SIMILARITY_MIN_SCORE, similarity_index
+from src.search_index import parse_timestamp, search_index
+from src.blob_store import get_blob_store
+from src.http_cache import PROCESS_EPOCH, PRIVATE_REVALIDATE, etag_matches, make_etag, not_modified
+from src.history_cache import HISTORY_CACHE_ITEMS, HISTORY_LIST_FIELDS, history_cache, history_item
 # Import Appwrite Service
-from src.appwrite_service import init_appwrite, get_db_client, DATABASE_ID, USERS_COLLECTION_ID, IDEAS_COLLECTION_ID
+from src.appwrite_service import DATABASE_ID, IDEAS_COLLECTION_ID
+from src.migrate import run_startup_migrations
 # Import Auth
-from src.auth import signup_user, login_user, UserSignup, UserLogin, Token
+from src.password_service import password_hasher
+from src.auth import (
+    signup_user, login_user, get_current_user, require_internal_token, user_cache, UserSignup, UserLogin, Token,
+)
+from src.job_queue import enqueue_job, get_job, start_inprocess_worker, drain_inprocess_worker, worker_stats
+from src.batch import (
+    BatchRequest, BATCH_MAX_DOCUMENTS, enqueue_batch_job, get_batch_job, close_batch_resources
+)
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY is not set in the environment variables.")
 
+# Responses smaller than this aren't worth compressing
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1000"))
+# Brotli level for clients that send `Accept-Encoding: br` (0-11; 4 is about gzip's cost at a smaller size)
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+try:
+    from brotli_asgi import BrotliMiddleware # Optional: br where accepted, gzip otherwise
+except ImportError:
+    BrotliMiddleware = None
+
+# Async data-access layer: blocking Appwrite SDK calls run on a bounded thread pool
+adb = get_async_db()
+# Off-loaded idea bodies (None when BLOB_STORE_BACKEND=none)
+blob_store = get_blob_store()
+
 app = FastAPI(
     title="PropelAI Backend API",
-    on_startup=[init_appwrite] # Run Schema Migration on startup
+    # Schema Migration (versioned, see RUN_MIGRATIONS), bcrypt workers, NLP models, background job worker
+    on_startup=[run_startup_migrations, password_hasher.start, warm_nlp_pipeline, credit_ledger.start, start_inprocess_worker],
+    # Drain jobs first, then release pools
+    on_shutdown=[drain_inprocess_worker, credit_ledger.stop, close_llm_client, adb.shutdown, password_hasher.shutdown,
+                 shutdown_preprocess_engine, close_batch_resources,
+                 similarity_index.flush, search_index.flush]
 )
 
 app.add_middleware(
@@ -34,28 +88,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
+# Compress JSON bodies (idea detail, history, search). SSE streams are never buffered for compression.
+if BrotliMiddleware is not None:
+    app.add_middleware(
+        BrotliMiddleware, quality=BROTLI_QUALITY, minimum_size=GZIP_MIN_BYTES, gzip_fallback=True,
+        excluded_handlers=[r"^/api/generate/stream$"],
+    )
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES) # excludes text/event-stream itself
+# Request latency + per-stage timers (and the optional Server-Timing header)
+app.add_middleware(MetricsMiddleware)
 
-databases = get_db_client()
+register_gauge("propelai_llm_in_flight", "Gemini calls currently running.", lambda: llm_admission.in_flight)
+register_gauge("propelai_llm_queue_depth", "Gemini calls waiting for an admission slot.", lambda: llm_admission.waiting)
 
-# --- Pydantic Schemas ---
-class IdeaRequest(BaseModel):
-    prompt: str
-    tone: Optional[str] = None
+# History list pagination (projection and preview length live in src/history_cache.py)
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+HISTORY_MAX_PAGE_SIZE = 100
 
-# --- Helper Logic ---
-def extract_categories(prompt: str):
-    # Fixed Regex: r"\[Categories:\s*(.*?)\]" correctly finds [Categories: X, Y]
-    match = re.search(r"\[Categories:\s*(.*?)\]", prompt)
-    if match:
-        categories = match.group(1)
-        clean_prompt = prompt.replace(match.group(0), "").strip()
-        return categories, clean_prompt
-    return None, prompt
+def history_etag(user_id: str, version: int, cursor: Optional[str], limit: int) -> str:
+    return make_etag(PROCESS_EPOCH, user_id, version, cursor or "", limit)
 
 # --- API Routes ---
 
-@app.post("/auth/signup", response_model=Token)
+@app.post("/auth/signup", response_model=Token, dependencies=[Depends(rate_limit("auth"))])
 async def signup(user: UserSignup):
     """Register a new user."""
     # We pass 'databases' which is initialized globally, but src.auth imports it directly now or we pass it?
@@ -63,144 +121,443 @@ async def signup(user: UserSignup):
     # Looking at src/auth.py signatures in Step 246:
     # def signup_user(signup_data: UserSignup) -> Token
     # It doesn't take db session anymore.
-    return signup_user(user)
+    return await signup_user(user)
 
-@app.post("/auth/login", response_model=Token)
+@app.post("/auth/login", response_model=Token, dependencies=[Depends(rate_limit("auth"))])
 async def login(user: UserLogin):
     """Login an existing user."""
-    return login_user(user)
+    return await login_user(user)
+
+GREETING = {"message": "Hello from PropelAI (Appwrite Edition)!"}
+GREETING_ETAG = make_etag(json.dumps(GREETING, sort_keys=True))
+GREETING_CACHE_CONTROL = "public, max-age=300"
 
 @app.get("/api/greeting")
-async def get_greeting():
-    return {"message": "Hello from PropelAI (Appwrite Edition)!"}
+async def get_greeting(response: Response, if_none_match: Optional[str] = Header(None)):
+    if etag_matches(if_none_match, GREETING_ETAG):
+        return not_modified(GREETING_ETAG, GREETING_CACHE_CONTROL)
+    response.headers["ETag"] = GREETING_ETAG
+    response.headers["Cache-Control"] = GREETING_CACHE_CONTROL
+    return GREETING
 
-@app.post("/api/generate")
-async def generate_idea(request: IdeaRequest):
-    # 1. Credit Check - Hardcoded User for MVP (Replace with proper Auth later)
-    # We need to find the user. For MVP, we'll try to find the FIRST user created.
-    try:
-        user_list = databases.list_documents(DATABASE_ID, USERS_COLLECTION_ID, queries=[])
-        if user_list['total'] == 0:
-             # Create a dummy user if none exists for testing
-             user = databases.create_document(DATABASE_ID, USERS_COLLECTION_ID, ID.unique(), {
-                 "email": "test@example.com",
-                 "full_name": "Test User", 
-                 "hashed_password": "dummy_hash",
-                 "idea_credits": 5,
-                 "is_active": True
-             })
-        else:
-             user = user_list['documents'][0]
-    except Exception as e:
-         raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}")
-
-    if user['idea_credits'] <= 0:
-        raise HTTPException(status_code=403, detail="Insufficient credits")
-
-    # 2. Extract Categories
-    categories, clean_user_prompt = extract_categories(request.prompt)
-    
-    system_instruction = ""
-    final_prompt_for_ai = ""
-
-    # 3. Mode Selection
-    if "BRAINSTORM_MODE" in request.prompt:
-        system_instruction = (
-            f"You are a Venture Capitalist. Generate 5 unique startup opportunities for: {categories or 'general'}. "
-            "Format: NAME: [Name] | PROBLEM: [Problem] | SOLUTION: [Solution] ---"
-        )
-        final_prompt_for_ai = f"Target Industries: {categories}"
-    else:
-        system_instruction = "You are a startup consultant. Analyze this idea and provide a plan."
-        if categories:
-            system_instruction += f" Context: {categories}."
-        final_prompt_for_ai = clean_user_prompt
-
-    if request.tone:
-        system_instruction += f" Use a {request.tone} tone."
-
-    # 4. AI Call
-    nlp_processor = NLPProcessor(GEMINI_API_KEY)
-    try:
-        ai_raw_response = await nlp_processor.generate_idea(system_instruction, final_prompt_for_ai)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"AI engine failed: {str(e)}")
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_internal_token)])
+async def get_metrics():
+    """Prometheus scrape endpoint (bearer INTERNAL_API_TOKEN)."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/api/internal/stats", include_in_schema=False, dependencies=[Depends(require_internal_token)])
+async def get_internal_stats():
+    """Runtime counters for the data-access layer (per-call Appwrite latency). Bearer INTERNAL_API_TOKEN."""
+    return {
+        "appwrite": adb.stats(),
+        "password_hasher": password_hasher.stats(),
+        "user_cache": user_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "job_worker": worker_stats(),
+        "history_cache": history_cache.stats(),
+        "similarity_index": similarity_index.stats(),
+        "search_index": search_index.stats(),
+        "blob_store": blob_store.stats() if blob_store is not None else None,
+        "credits": credit_ledger.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "llm_admission": llm_admission.stats(),
+    }
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/generate", dependencies=[Depends(rate_limit("generate"))])
+async def generate_idea(request: IdeaRequest, user: dict = Depends(get_current_user)):
+    return await run_generation(request, user)
+
+@app.post("/api/generate/stream", dependencies=[Depends(rate_limit("generate_stream"))])
+async def generate_idea_stream(request: IdeaRequest, user: dict = Depends(get_current_user)):
+    """
+    Server-Sent Events variant of /api/generate.
+    Emits `token` events as Gemini streams, an `idea` event as soon as each brainstorm idea's JSON
+    object is complete, validated and saved, then a final `done` event shaped like the /api/generate response.
+    """
+    with stage("credit_reserve"):
+        reservation = await reserve_generation_credit(user)
+    with stage("prompt_build"):
+        system_instruction, final_prompt_for_ai, clean_user_prompt, is_brainstorm = build_generation_prompt(request)
+    with stage("dedup"):
+        duplicate = await find_duplicate_idea(user, request, clean_user_prompt, is_brainstorm)
+    if duplicate is not None:
+        done = duplicate_response(duplicate, await credit_ledger.refund(reservation))
+
+        async def duplicate_stream():
+            yield sse_event("idea", {"index": 0, "id": duplicate["id"], "result": duplicate["result"]})
+            yield sse_event("done", done)
+        return StreamingResponse(duplicate_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    with stage("cache_lookup"):
+        cache_key = generation_cache_key(request, system_instruction, final_prompt_for_ai)
+        cached_response = None if request.no_cache else response_cache.get(cache_key)
+    cache_hit = cached_response is not None
+    if not cache_hit:
+        # Errors after the stream starts can only be reported in-band, so reject up front when saturated
+        try:
+            llm_admission.check()
+        except HTTPException:
+            await credit_ledger.refund(reservation)
+            raise
 
-    # 5. Process and Save
+    async def replay_cached():
+        yield cached_response
+
+    source = replay_cached() if cache_hit else NLPProcessor().stream_idea(
+        system_instruction, final_prompt_for_ai, generation_config(is_brainstorm)
+    )
+
+    # Persistence runs in separate tasks, in idea order, so saves outlive a client disconnect
+    pending: List[asyncio.Task] = []
     saved_ideas = []
-    
-    # Decrement Credits
-    databases.update_document(DATABASE_ID, USERS_COLLECTION_ID, user['$id'], {
-        "idea_credits": user['idea_credits'] - 1
-    })
-
-    if "BRAINSTORM_MODE" in request.prompt:
-        raw_ideas = ai_raw_response.split("---")
-        for raw_item in raw_ideas:
-            if len(raw_item.strip()) < 10: continue
-            
-            new_idea_data = {
-                "owner_id": user['$id'],
-                "name": "New Venture",
-                "problem": raw_item.strip()[:255], # Truncate for safety
-                "result": raw_item.strip(),
-                "created_at": datetime.utcnow().isoformat()
-            }
-            
-            new_idea = databases.create_document(DATABASE_ID, IDEAS_COLLECTION_ID, ID.unique(), new_idea_data)
-            saved_ideas.append(new_idea)
-    else:
-        new_idea_data = {
-            "owner_id": user['$id'],
-            "name": "Analysis",
-            "problem": clean_user_prompt[:255],
-            "result": ai_raw_response,
-            "created_at": datetime.utcnow().isoformat()
-        }
-        new_idea = databases.create_document(DATABASE_ID, IDEAS_COLLECTION_ID, ID.unique(), new_idea_data)
-        saved_ideas.append(new_idea)
 
+    async def event_stream():
+        parser = IdeaStreamParser()
+        chunks = []
+        failed_ideas = []
+        error = None
+
+        def start_save(idea_data: dict):
+            pending.append(asyncio.create_task(persist_ideas(adb, [idea_data])))
+
+        async def drain(wait: bool = False):
+            # Emit finished saves in order; with wait=True, block until all are done
+            events = []
+            while pending and (wait or pending[0].done()):
+                index = len(saved_ideas) + len(failed_ideas)
+                # Shielded so a disconnect can't cancel the save itself; settled_stream still counts it
+                task_saved, task_failed = await asyncio.shield(pending[0])
+                pending.pop(0)
+                for doc in task_saved:
+                    saved_ideas.append(doc)
+                    events.append(sse_event("idea", {"index": index, "id": doc['$id'], "result": doc['result']}))
+                for failure in task_failed:
+                    failed_ideas.append({"index": index, "error": failure["error"]})
+            return events
+
+        try:
+            async for chunk in source:
+                yield sse_event("token", {"text": chunk})
+                chunks.append(chunk)
+                if is_brainstorm:
+                    for idea in parser.feed(chunk):
+                        start_save(brainstorm_idea_data(user['$id'], idea))
+                    for event in await drain():
+                        yield event
+        except Exception as e:
+            error = f"AI engine failed: {str(e)}"
+
+        if not error:
+            if is_brainstorm:
+                parser.finish()
+                if not cache_hit:
+                    # Only the malformed/missing ideas are requested again
+                    replacements = await repair_brainstorm(system_instruction, final_prompt_for_ai, parser.ideas)
+                    for idea in replacements:
+                        start_save(brainstorm_idea_data(user['$id'], idea))
+                    if parser.ideas or replacements:
+                        response_cache.set(cache_key, serialize_ideas(parser.ideas + replacements))
+            else:
+                if not cache_hit:
+                    response_cache.set(cache_key, "".join(chunks))
+                start_save(analysis_idea_data(user['$id'], clean_user_prompt, "".join(chunks)))
+        for event in await drain(wait=True):
+            yield event
+
+        if saved_ideas:
+            credits_remaining = await charge_generation(reservation, cache_hit)
+        else:
+            credits_remaining = await credit_ledger.refund(reservation)
+        if not saved_ideas and not error:
+            error = "Failed to save generated ideas. No credits were charged."
+
+        if error:
+            yield sse_event("error", {"detail": error})
+        yield sse_event("done", {
+            "status": "error" if not saved_ideas else ("partial" if failed_ideas or error else "success"),
+            "ideas": [{"id": i['$id'], "result": i['result']} for i in saved_ideas],
+            "failed": failed_ideas,
+            "credits_remaining": credits_remaining,
+            "cached": cache_hit
+        })
+
+    async def settled_stream():
+        try:
+            async for event in event_stream():
+                yield event
+        finally:
+            # The client may disconnect after `idea` events but before `done`: let the saves already
+            # started finish and charge for them; the hold is released only when nothing was stored.
+            # Shielded because a disconnect cancels the response's scope.
+            with anyio.CancelScope(shield=True):
+                results = await asyncio.gather(*pending, return_exceptions=True)
+                if saved_ideas or any(not isinstance(r, BaseException) and r[0] for r in results):
+                    await charge_generation(reservation, cache_hit)
+                await credit_ledger.refund(reservation) # no-op once charged
+
+    return StreamingResponse(
+        settled_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/jobs/generate", status_code=202, dependencies=[Depends(rate_limit("jobs"))])
+async def enqueue_generation(
+    request: IdeaRequest,
+    idempotency_key: Optional[str] = Header(None),
+    user: dict = Depends(get_current_user),
+):
+    """
+    Queues a generation instead of running it inside the request. Poll /api/jobs/{job_id}.
+    Re-sending the same Idempotency-Key returns the original job rather than generating twice.
+    """
+    payload = {**request.model_dump(), "user_id": user['$id']}
+    job = await enqueue_job("generate", payload, idempotency_key=idempotency_key, owner_id=user['$id'])
+    return {"job_id": job.job_id, "status": job.status}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str, user: dict = Depends(get_current_user)):
+    job = await get_job(job_id)
+    if job is None or job.owner_id != user['$id']:
+        raise HTTPException(status_code=404, detail="Job not found")
     return {
-        "status": "success",
-        "ideas": [{"id": i['$id'], "result": i['result']} for i in saved_ideas],
-        "credits_remaining": user['idea_credits'] - 1
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
     }
 
-@app.get("/api/history")
-async def get_history():
-    # Fetch all ideas
-    result = databases.list_documents(
-        DATABASE_ID, 
-        IDEAS_COLLECTION_ID, 
-        queries=[Query.order_desc("$createdAt")] # Appwrite uses $createdAt or custom attribute
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str, user: dict = Depends(get_current_user)):
+    job = await get_job(job_id)
+    if job is None or job.owner_id != user['$id']:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=422, detail=job.error or "Job failed")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job.result
+
+@app.post("/api/generate/batch", status_code=202, dependencies=[Depends(rate_limit("batch"))])
+async def generate_batch(request: BatchRequest, user: dict = Depends(get_current_user)):
+    """
+    Queues N documents/URLs for ideation on the job queue. Documents are cleaned and summarized in
+    parallel, several summaries share one Gemini call, and progress is polled per item via the job id.
+    """
+    if not request.documents:
+        raise HTTPException(status_code=400, detail="No documents provided")
+    if len(request.documents) > BATCH_MAX_DOCUMENTS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_DOCUMENTS} documents per batch")
+    if any(bool(d.text) == bool(d.url) for d in request.documents):
+        raise HTTPException(status_code=400, detail="Each document needs exactly one of 'text' or 'url'")
+    # Refuse up front when the user can't cover every document; the worker holds the credits when it runs
+    await credit_ledger.refund(
+        await credit_ledger.reserve(user['$id'], len(request.documents), known_balance=user['idea_credits'])
     )
-    
-    # Map Appwrite documents to frontend expected format
-    return [
-        {
-            "id": doc['$id'],
-            "result": doc['result'],
-            "is_starred": doc.get('is_starred', False)
-        } for doc in result['documents']
+
+    job = await enqueue_batch_job(user['$id'], request)
+    return job.model_dump()
+
+@app.get("/api/generate/batch/{job_id}")
+async def get_batch_status(job_id: str, user: dict = Depends(get_current_user)):
+    job = await get_batch_job(job_id)
+    if job is None or job.owner_id != user['$id']:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job.model_dump()
+
+@app.get("/api/history")
+async def get_history(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = HISTORY_PAGE_SIZE,
+    if_none_match: Optional[str] = Header(None),
+    user: dict = Depends(get_current_user),
+):
+    """
+    One page of the current user's ideas, newest first. Pass the returned `next_cursor` to get the
+    following page. The first page is usually served from the per-user history cache.
+
+    Every page carries an ETag derived from the user's history version, which each idea write (and
+    each refill of the cache) bumps. A matching If-None-Match gets a 304 without reading Appwrite
+    while the user's history is cached; the cache TTL bounds staleness from other processes' writes.
+    """
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    user_id = user['$id']
+
+    read_version = history_cache.version(user_id)
+    etag = history_etag(user_id, read_version, cursor, limit)
+    if etag_matches(if_none_match, etag) and history_cache.is_cached(user_id):
+        return not_modified(etag)
+    response.headers["Cache-Control"] = PRIVATE_REVALIDATE
+
+    if not cursor:
+        cached = history_cache.get_page(user_id, limit)
+        if cached is not None:
+            items, has_more = cached
+            response.headers["ETag"] = etag
+            return {"ideas": items, "next_cursor": items[-1]["id"] if has_more and items else None}
+
+    # A first-page miss reads the whole cache window so the following refreshes are served from memory
+    page_size = limit if cursor else max(limit, HISTORY_CACHE_ITEMS)
+    queries = [
+        Query.equal("owner_id", user_id),
+        Query.order_desc("created_at"), # Served by the owner_id + created_at index
+        Query.select(HISTORY_LIST_FIELDS),
+        Query.limit(page_size + 1), # One extra row tells us whether another page exists
     ]
+    if cursor:
+        queries.append(Query.cursor_after(cursor))
+
+    try:
+        result = await adb.list_documents(DATABASE_ID, IDEAS_COLLECTION_ID, queries=queries)
+    except AppwriteException as e:
+        # Appwrite rejects an unknown/foreign cursor document with 400 or 404; anything else is ours (5xx)
+        if cursor and e.code in (400, 404):
+            raise HTTPException(status_code=400, detail="Invalid history cursor")
+        raise
+
+    documents = result['documents']
+    if not cursor:
+        if history_cache.fill(user_id, documents[:page_size], complete=len(documents) <= page_size, read_version=read_version):
+            etag = history_etag(user_id, history_cache.version(user_id), cursor, limit)
+    # When the fill was skipped, a write landed during the read and the older tag can no longer match
+    response.headers["ETag"] = etag
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+
+    # Map Appwrite documents to frontend expected format
+    return {
+        "ideas": [history_item(doc) for doc in documents],
+        "next_cursor": documents[-1]['$id'] if has_more else None,
+    }
+
+@app.get("/api/ideas/search")
+async def search_ideas(
+    q: str,
+    starred: Optional[bool] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = HISTORY_PAGE_SIZE,
+    user: dict = Depends(get_current_user),
+):
+    """
+    Keyword search over the current user's ideas (name, problem and result), BM25-ranked.
+    Optional filters: `starred`, and `since`/`until` as ISO 8601 timestamps on created_at
+    (without an offset they are taken as UTC).
+    Returns {total, results: [{id, name, preview, is_starred, created_at, score}]}.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty search query")
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    try:
+        since_ts = parse_timestamp(since) if since else None
+        until_ts = parse_timestamp(until) if until else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since/until must be ISO 8601 timestamps")
+    with stage("search"):
+        return await search_index.search(user['$id'], q, limit, starred=starred, since=since_ts, until=until_ts)
+
+@app.get("/api/ideas/similar")
+async def similar_ideas(
+    q: Optional[str] = None,
+    idea_id: Optional[str] = None,
+    limit: int = 10,
+    min_score: float = SIMILARITY_MIN_SCORE,
+    user: dict = Depends(get_current_user),
+):
+    """
+    The current user's ideas closest to free text `q`, or to one of their ideas (`idea_id`),
+    as [{id, name, preview, score}] with cosine scores in [0, 1], best first.
+    """
+    if bool(q) == bool(idea_id):
+        raise HTTPException(status_code=400, detail="Pass exactly one of q or idea_id")
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    with stage("similarity"):
+        results = await similarity_index.search(user['$id'], text=q, idea_id=idea_id, limit=limit, min_score=min_score)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Idea not found")
+    return {"results": results}
+
+async def get_owned_idea(idea_id: str, user: dict) -> dict:
+    """The idea document if it exists and belongs to `user`; 404 otherwise (no existence leak)."""
+    try:
+        doc = await adb.get_document(DATABASE_ID, IDEAS_COLLECTION_ID, idea_id)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Idea not found")
+    if doc.get('owner_id') != user['$id']:
+        raise HTTPException(status_code=404, detail="Idea not found")
+    return doc
+
+@app.get("/api/ideas/{idea_id}")
+async def get_idea(idea_id: str, user: dict = Depends(get_current_user)):
+    """Full idea body, fetched lazily when a history entry is opened."""
+    doc = await get_owned_idea(idea_id, user)
+    with stage("body_fetch"):
+        result = await idea_body(doc)
+    return {
+        "id": doc['$id'],
+        "name": doc.get('name'),
+        "problem": doc.get('problem'),
+        "solution": doc.get('solution'),
+        "result": result,
+        "is_starred": doc.get('is_starred', False),
+        "created_at": doc.get('created_at') or doc.get('$createdAt'),
+    }
 
 @app.patch("/api/ideas/{idea_id}/toggle-star")
-async def toggle_star(idea_id: str):
+async def toggle_star(idea_id: str, user: dict = Depends(get_current_user)):
+    """Kept for older clients; PUT /api/ideas/{idea_id}/star avoids the read and the double-click race."""
+    idea = await get_owned_idea(idea_id, user)
+    new_status = not idea.get('is_starred', False)
     try:
-        idea = databases.get_document(DATABASE_ID, IDEAS_COLLECTION_ID, idea_id)
-        new_status = not idea.get('is_starred', False)
-        
-        databases.update_document(DATABASE_ID, IDEAS_COLLECTION_ID, idea_id, {
+        await adb.update_document(DATABASE_ID, IDEAS_COLLECTION_ID, idea_id, {
             "is_starred": new_status
         })
-        return {"status": "success", "is_starred": new_status}
     except Exception:
         raise HTTPException(status_code=404, detail="Idea not found")
+    idea_events.idea_updated(user['$id'], idea_id, {"is_starred": new_status})
+    return {"status": "success", "is_starred": new_status}
 
-@app.delete("/api/ideas/{idea_id}")
-async def delete_idea(idea_id: str):
+async def ensure_owned(idea_id: str, user: dict):
+    """404 unless the idea belongs to `user`. Free when the id is in the user's cached history."""
+    if idea_id not in await owned_idea_ids(adb, user['$id'], [idea_id]):
+        raise HTTPException(status_code=404, detail="Idea not found")
+
+@app.put("/api/ideas/{idea_id}/star")
+async def set_star(idea_id: str, request: StarRequest, user: dict = Depends(get_current_user)):
+    """Sets the star to an explicit state: idempotent under double-clicks, and no read of the idea."""
+    await ensure_owned(idea_id, user)
     try:
-        databases.delete_document(DATABASE_ID, IDEAS_COLLECTION_ID, idea_id)
-        return {"status": "success", "message": "Idea deleted"}
+        await adb.update_document(DATABASE_ID, IDEAS_COLLECTION_ID, idea_id, {"is_starred": request.starred})
     except Exception:
-        raise HTTPException(status_code=404, detail="Idea not found")
\ No newline at end of file
+        raise HTTPException(status_code=404, detail="Idea not found")
+    idea_events.idea_updated(user['$id'], idea_id, {"is_starred": request.starred})
+    return {"status": "success", "is_starred": request.starred}
+
+@app.delete("/api/ideas/{idea_id}")
+async def delete_idea(idea_id: str, user: dict = Depends(get_current_user)):
+    await ensure_owned(idea_id, user)
+    if await delete_ideas(adb, [idea_id]):
+        raise HTTPException(status_code=404, detail="Idea not found")
+    idea_events.ideas_deleted(user['$id'], [idea_id])
+    return {"status": "success", "message": "Idea deleted"}
+
+@app.post("/api/ideas/bulk")
+async def bulk_ideas(request: BulkIdeaRequest, user: dict = Depends(get_current_user)):
+    """
+    Stars, unstars or deletes many ideas in one request. Ids that don't exist or belong to someone
+    else come back as "not_found"; the rest are written in parallel (IDEA_WRITE_CONCURRENCY at a time).
+    """
+    if not request.ids:
+        raise HTTPException(status_code=400, detail="No idea ids given")
+    if len(request.ids) > BULK_MAX_IDS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_IDS} ideas per request")
+
+    results = await apply_bulk_action(adb, user['$id'], request.action, request.ids)
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    return {"action": request.action, "succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
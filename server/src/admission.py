@@ -0,0 +1,192 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from .auth import verify_token
+
+# --- Configuration Constants ---
+# Outbound Gemini calls allowed in flight per process, and how many more may wait for a slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+# Default token bucket: sustained requests per minute and burst size, per user and route.
+# Override per route with RATE_LIMIT_<ROUTE>="<per_minute>:<burst>", e.g. RATE_LIMIT_GENERATE="30:5"
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "20"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "5"))
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))
+
+
+def route_limits(route: str) -> Tuple[float, int]:
+    """(per_minute, burst) for a route, from RATE_LIMIT_<ROUTE> or the defaults."""
+    override = os.getenv(f"RATE_LIMIT_{route.upper()}")
+    if not override:
+        return RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST
+    per_minute, _, burst = override.partition(":")
+    return float(per_minute), int(burst or RATE_LIMIT_BURST)
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: int):
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by (route, client). Each bucket refills at `per_minute / 60` tokens per second
+    up to `burst`. Buckets are kept in an LRU so idle clients don't accumulate.
+    """
+    def __init__(self, max_buckets: int = RATE_LIMIT_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self.allowed = 0
+        self.rejected: Dict[str, int] = {}
+
+    def acquire(self, route: str, client_key: str, per_minute: float, burst: int) -> float:
+        """Takes one token. Returns 0 when allowed, otherwise the seconds until a token is available."""
+        key = (route, client_key)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(burst)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        rate = per_minute / 60.0
+        now = time.monotonic()
+        bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+        bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            self.allowed += 1
+            return 0.0
+        self.rejected[route] = self.rejected.get(route, 0) + 1
+        return (1 - bucket.tokens) / rate if rate > 0 else float("inf")
+
+    def stats(self):
+        return {
+            "buckets": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": dict(self.rejected),
+        }
+
+
+rate_limiter = RateLimiter()
+
+
+def client_key(request: Request) -> str:
+    """The authenticated user id when a valid bearer token is present, otherwise the client address."""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return f"user:{verify_token(token).user_id}"
+        except HTTPException:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def rate_limit(route: str):
+    """
+    FastAPI dependency factory: `Depends(rate_limit("generate"))`.
+    Rejects with 429 and a Retry-After header once the caller's bucket for `route` is empty.
+    """
+    per_minute, burst = route_limits(route)
+
+    async def dependency(request: Request):
+        retry_after = rate_limiter.acquire(route, client_key(request), per_minute, burst)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded. Please slow down.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    return dependency
+
+
+class LLMAdmission:
+    """
+    Process-wide cap on in-flight Gemini calls. Up to `max_concurrency` calls run; up to `max_queue`
+    more wait (at most `queue_timeout` seconds) for a slot. Anything beyond that gets an immediate 503
+    instead of piling up behind upstream 429s.
+    """
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_MAX_QUEUE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _busy(self, detail: str) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(self.queue_timeout)))},
+        )
+
+    def check(self):
+        """Fast pre-flight rejection for callers (e.g. streams) that can't surface an error later."""
+        if self.in_flight + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejected_queue_full += 1
+            raise self._busy("AI engine is at capacity. Please retry shortly.")
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one LLM slot for the duration of the block."""
+        self.check()
+        semaphore = self._get_semaphore()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            raise self._busy("Timed out waiting for the AI engine. Please retry shortly.")
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
+
+
+llm_admission = LLMAdmission()
@@ -0,0 +1,128 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from .appwrite_service import get_db_client
+from .metrics import observe_appwrite_call
+
+# --- Configuration Constants ---
+# The Appwrite SDK is blocking (requests under the hood), so every call runs on this pool.
+APPWRITE_MAX_WORKERS = int(os.getenv("APPWRITE_MAX_WORKERS", "16"))
+# Number of recent samples kept per method for percentile reporting
+LATENCY_WINDOW = 512
+
+
+class CallStats:
+    """Latency bookkeeping for a single Appwrite method."""
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, elapsed: float, failed: bool):
+        self.count += 1
+        self.errors += int(failed)
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        self.recent.append(elapsed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+
+        def pct(p: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p * len(recent)))] * 1000
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_seconds / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(pct(0.50), 2),
+            "p95_ms": round(pct(0.95), 2),
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+
+
+class AsyncDatabases:
+    """
+    Async facade over the synchronous Appwrite Databases service.
+    Calls run on a sized thread pool so a slow Appwrite round trip never stalls the event loop.
+    """
+    def __init__(self, client=None, max_workers: int = APPWRITE_MAX_WORKERS):
+        self._client = client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="appwrite")
+        self._stats: Dict[str, CallStats] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else get_db_client()
+
+    async def call(self, method: str, *args, **kwargs) -> Any:
+        """Runs `Databases.<method>(*args, **kwargs)` on the pool and records its latency."""
+        fn = functools.partial(getattr(self.client, method), *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        failed = False
+        try:
+            return await loop.run_in_executor(self._executor, fn)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._record(method, time.perf_counter() - start, failed)
+
+    def _record(self, method: str, elapsed: float, failed: bool):
+        observe_appwrite_call(method, elapsed, failed)
+        with self._lock:
+            self._stats.setdefault(method, CallStats()).record(elapsed, failed)
+
+    # --- Document API (mirrors appwrite.services.databases.Databases) ---
+
+    async def list_documents(self, database_id: str, collection_id: str, queries: Optional[List[str]] = None):
+        return await self.call("list_documents", database_id, collection_id, queries=queries)
+
+    async def get_document(self, database_id: str, collection_id: str, document_id: str, queries: Optional[List[str]] = None):
+        return await self.call("get_document", database_id, collection_id, document_id, queries=queries)
+
+    async def create_document(self, database_id: str, collection_id: str, document_id: str, data: dict, permissions: Optional[List[str]] = None):
+        return await self.call("create_document", database_id, collection_id, document_id, data, permissions=permissions)
+
+    async def update_document(self, database_id: str, collection_id: str, document_id: str, data: Optional[dict] = None, permissions: Optional[List[str]] = None):
+        return await self.call("update_document", database_id, collection_id, document_id, data, permissions=permissions)
+
+    async def delete_document(self, database_id: str, collection_id: str, document_id: str):
+        return await self.call("delete_document", database_id, collection_id, document_id)
+
+    async def decrement_document_attribute(self, database_id: str, collection_id: str, document_id: str, attribute: str, value: float, min: Optional[float] = None):
+        """Atomic server-side decrement; with `min`, fails instead of going below it."""
+        return await self.call("decrement_document_attribute", database_id, collection_id, document_id, attribute, value=value, min=min)
+
+    # --- Introspection ---
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-method call counts, error counts and latency (ms)."""
+        with self._lock:
+            return {method: s.snapshot() for method, s in self._stats.items()}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_async_db: Optional[AsyncDatabases] = None
+
+
+def get_async_db() -> AsyncDatabases:
+    """Returns the process-wide async data-access layer."""
+    global _async_db
+    if _async_db is None:
+        _async_db = AsyncDatabases()
+    return _async_db
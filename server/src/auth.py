@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+import hmac
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -6,19 +7,36 @@ from jose import JWTError, jwt
 from pydantic import BaseModel, EmailStr
 import os
 import uuid
+from appwrite.id import ID
 from appwrite.query import Query
+from appwrite.exception import AppwriteException
 
 # Replaced SQL imports with Appwrite Service
-from .appwrite_service import get_db_client, DATABASE_ID, USERS_COLLECTION_ID
-from .database import verify_password, get_password_hash # Keeping utils from database.py for hashing
+from .appwrite_service import DATABASE_ID, USERS_COLLECTION_ID
+from .async_db import get_async_db
+from .password_service import password_hasher # bcrypt runs on a dedicated process pool
+from .cache import TTLCache, TieredCache, get_shared_backend
 
 # JWT Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 43200  # 30 days for Chrome extension
 
+# Authenticated-user cache (keyed by user id) so get_current_user skips Appwrite on hot paths
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+# Bearer token for the operational endpoints (/metrics, /api/internal/stats). Unset: they are disabled.
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN", "")
+
 security = HTTPBearer()
-databases = get_db_client()
+internal_security = HTTPBearer(auto_error=False)
+adb = get_async_db()
+user_cache = TieredCache(
+    TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS),
+    backend=get_shared_backend(),
+    namespace="user:",
+)
 
 # --- Pydantic Schemas ---
 
@@ -83,29 +101,45 @@ def verify_token(token: str) -> TokenData:
 
 # --- Dependency to Get Current User ---
 
+async def require_internal_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(internal_security)
+):
+    """Dependency guarding operational endpoints; they 404 unless INTERNAL_API_TOKEN is configured."""
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), INTERNAL_API_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid internal token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict: # Returned user is now a dict (JSON), not a SQL Model
     """Dependency to get the current authenticated user."""
     token = credentials.credentials
     token_data = verify_token(token)
-    
-    # Appwrite Query
-    result = databases.list_documents(
-        DATABASE_ID, 
-        USERS_COLLECTION_ID, 
-        queries=[Query.equal("email", token_data.email)]
-    )
-    
-    if result['total'] == 0:
-         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = result['documents'][0]
-    
+
+    user = user_cache.get(token_data.user_id)
+    if user is None:
+        # Cache miss: primary-key lookup instead of an email query
+        try:
+            user = await adb.get_document(DATABASE_ID, USERS_COLLECTION_ID, token_data.user_id)
+        except AppwriteException:
+            user = None
+
+        if user is None or user.get('email') != token_data.email:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+        # Never keep the password hash in a cache (the shared tier may live on disk)
+        user = {k: v for k, v in user.items() if k != 'hashed_password'}
+        user_cache.set(token_data.user_id, user)
+
     if not user.get('is_active', True):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -114,12 +148,25 @@ async def get_current_user(
     
     return user
 
+async def update_user(user_id: str, data: dict) -> dict:
+    """
+    Writes user fields (credits, is_active, profile) and invalidates the cached copy.
+    All user mutations should go through here so get_current_user never serves stale data.
+    """
+    user_doc = await adb.update_document(DATABASE_ID, USERS_COLLECTION_ID, user_id, data)
+    invalidate_user(user_id)
+    return user_doc
+
+def invalidate_user(user_id: str):
+    """Drops a user from the authentication cache."""
+    user_cache.delete(user_id)
+
 # --- Authentication Endpoints ---
 
-def signup_user(signup_data: UserSignup) -> Token:
+async def signup_user(signup_data: UserSignup) -> Token:
     """Register a new user."""
     # Check if user already exists
-    result = databases.list_documents(
+    result = await adb.list_documents(
         DATABASE_ID, 
         USERS_COLLECTION_ID, 
         queries=[Query.equal("email", signup_data.email)]
@@ -132,7 +179,7 @@ def signup_user(signup_data: UserSignup) -> Token:
         )
     
     # Create new user
-    hashed_password = get_password_hash(signup_data.password)
+    hashed_password = await password_hasher.hash(signup_data.password)
     user_id = str(uuid.uuid4())
     
     new_user_data = {
@@ -144,7 +191,7 @@ def signup_user(signup_data: UserSignup) -> Token:
         "is_active": True
     }
     
-    user_doc = databases.create_document(
+    user_doc = await adb.create_document(
         DATABASE_ID,
         USERS_COLLECTION_ID,
         ID.unique(),
@@ -167,10 +214,10 @@ def signup_user(signup_data: UserSignup) -> Token:
         }
     )
 
-def login_user(login_data: UserLogin) -> Token:
+async def login_user(login_data: UserLogin) -> Token:
     """Authenticate and login a user."""
     # Find user by email
-    result = databases.list_documents(
+    result = await adb.list_documents(
         DATABASE_ID, 
         USERS_COLLECTION_ID, 
         queries=[Query.equal("email", login_data.email)]
@@ -185,11 +232,19 @@ def login_user(login_data: UserLogin) -> Token:
     user = result['documents'][0]
     
     # Verify password
-    if not verify_password(login_data.password, user['hashed_password']):
+    is_valid, upgraded_hash = await password_hasher.verify(login_data.password, user['hashed_password'])
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
+
+    # Transparent rehash when the bcrypt cost factor has changed since this hash was made
+    if upgraded_hash:
+        try:
+            await update_user(user['$id'], {"hashed_password": upgraded_hash})
+        except Exception as e:
+            print(f"Password rehash failed for user {user['$id']}: {e}")
     
     if not user.get('is_active', True):
          raise HTTPException(
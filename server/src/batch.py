@@ -0,0 +1,328 @@
+import asyncio
+import copy
+import ipaddress
+import os
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from .async_db import get_async_db
+from .credits import Reservation, credit_ledger
+from .idea_store import persist_ideas
+from .idea_parser import IDEA_SCHEMA, SourcedIdea, idea_document, parse_ideas, structured_config
+from .job_queue import Job, JobLease, NonRetryableJobError, enqueue_job, get_job, register_job_handler
+from .llm_client import get_llm_client
+from .preprocess import get_preprocess_engine
+
+# --- Configuration Constants ---
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "200"))
+# Number of document summaries packed into one Gemini call
+BATCH_PACK_SIZE = int(os.getenv("BATCH_PACK_SIZE", "4"))
+BATCH_IDEAS_PER_DOCUMENT = 3
+BATCH_FETCH_CONCURRENCY = int(os.getenv("BATCH_FETCH_CONCURRENCY", "8"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_FETCH_TIMEOUT_SECONDS = float(os.getenv("BATCH_FETCH_TIMEOUT_SECONDS", "15"))
+# Fetched documents: larger bodies are rejected while streaming, before they are held in memory
+BATCH_FETCH_MAX_BYTES = int(os.getenv("BATCH_FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+BATCH_FETCH_MAX_REDIRECTS = 5
+BATCH_FETCH_CONTENT_TYPES = ("text/", "application/xhtml+xml", "application/xml", "application/json")
+
+# IDEA_SCHEMA's items, tagged with the number of the source they came from
+BATCH_IDEA_SCHEMA = copy.deepcopy(IDEA_SCHEMA)
+BATCH_IDEA_SCHEMA["description"] = "Startup ideas for every numbered source, each tagged with its source number."
+# The item count depends on the pack size
+BATCH_IDEA_SCHEMA.pop("minItems")
+BATCH_IDEA_SCHEMA.pop("maxItems")
+BATCH_IDEA_SCHEMA["items"]["properties"]["Source"] = {"type": "integer", "description": "The number of the source this idea is based on."}
+BATCH_IDEA_SCHEMA["items"]["required"].append("Source")
+
+BATCH_LLM_INSTRUCTIONS = (
+    "You are a Venture Capitalist (VC) analyst. You will receive several numbered sources. "
+    f"For EACH source, identify market gaps and generate exactly {BATCH_IDEAS_PER_DOCUMENT} unique, actionable "
+    "startup ideas. Set Source to the number of the source each idea is based on. Use the provided JSON schema."
+)
+
+# --- Pydantic Schemas ---
+
+class BatchDocument(BaseModel):
+    """One input: either raw text/HTML or a URL to fetch."""
+    text: Optional[str] = None
+    url: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    documents: List[BatchDocument]
+    tone: Optional[str] = None
+
+class BatchItem(BaseModel):
+    index: int
+    source: str
+    status: str = "pending" # pending -> preprocessing -> generating -> completed | failed
+    error: Optional[str] = None
+    idea_ids: List[str] = []
+    timings: Dict[str, float] = {}
+
+class BatchJob(BaseModel):
+    job_id: str
+    owner_id: str
+    status: str = "queued" # queued -> running -> completed | failed (a retried attempt goes back to queued)
+    created_at: str
+    finished_at: Optional[str] = None
+    credits_charged: int = 0
+    error: Optional[str] = None
+    items: List[BatchItem]
+
+# --- Jobs ---
+# Batches run on the job queue (src/job_queue.py): status survives restarts and is visible from every
+# process, and a retried attempt resumes from the progress its predecessor saved.
+_fetch_client: Optional[httpx.AsyncClient] = None
+
+
+def new_batch_job(job_id: str, owner_id: str, request: BatchRequest, created_at: Optional[str] = None) -> BatchJob:
+    items = []
+    for index, document in enumerate(request.documents):
+        source = document.url or f"text[{len(document.text or '')} chars]"
+        items.append(BatchItem(index=index, source=source))
+    return BatchJob(
+        job_id=job_id,
+        owner_id=owner_id,
+        created_at=created_at or datetime.utcnow().isoformat(),
+        items=items,
+    )
+
+
+async def enqueue_batch_job(owner_id: str, request: BatchRequest) -> BatchJob:
+    queued = await enqueue_job("batch", {"user_id": owner_id, "request": request.model_dump()}, owner_id=owner_id)
+    return _batch_view(queued)
+
+
+def _batch_view(job: Job) -> BatchJob:
+    """The batch as pollers see it: the last saved progress (or the empty job), with the queue's status."""
+    if job.result:
+        batch = BatchJob(**job.result)
+    else:
+        created_at = datetime.utcfromtimestamp(job.created_at).isoformat()
+        batch = new_batch_job(job.job_id, job.owner_id, BatchRequest(**job.payload["request"]), created_at)
+    if job.status == "failed":
+        batch.status, batch.error = "failed", job.error
+    elif job.status in ("queued", "running") and batch.finished_at is None:
+        batch.status = job.status
+    return batch
+
+
+async def get_batch_job(job_id: str) -> Optional[BatchJob]:
+    job = await get_job(job_id)
+    return _batch_view(job) if job is not None and job.kind == "batch" else None
+
+
+def _get_fetch_client() -> httpx.AsyncClient:
+    global _fetch_client
+    if _fetch_client is None or _fetch_client.is_closed:
+        _fetch_client = httpx.AsyncClient(
+            timeout=BATCH_FETCH_TIMEOUT_SECONDS,
+            follow_redirects=False, # redirects are followed by _fetch_document, re-checking every hop
+            limits=httpx.Limits(max_connections=BATCH_FETCH_CONCURRENCY * 2),
+        )
+    return _fetch_client
+
+
+async def close_batch_resources():
+    """Shutdown hook: closes the fetch client (running batches are drained with the job worker)."""
+    if _fetch_client is not None:
+        await _fetch_client.aclose()
+
+# --- URL Fetching ---
+
+class FetchRejected(ValueError):
+    """A document URL or response the batch fetcher refuses to use."""
+
+
+async def _check_fetch_url(url: httpx.URL) -> str:
+    """
+    Only http(s) URLs whose host resolves exclusively to public addresses (no SSRF into the network).
+    Returns the address to connect to, so a second DNS lookup can't swap in a private one.
+    """
+    if url.scheme not in ("http", "https") or not url.host:
+        raise FetchRejected("Only http and https URLs can be fetched")
+    port = url.port or (443 if url.scheme == "https" else 80)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(url.host, port)
+    except OSError:
+        raise FetchRejected(f"Could not resolve {url.host}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global or address.is_multicast:
+            raise FetchRejected(f"{url.host} resolves to a non-public address")
+    return infos[0][4][0]
+
+
+async def _fetch_document(raw_url: str) -> str:
+    """
+    GETs a user-supplied URL as text. Every redirect hop is re-checked, non-text content is rejected,
+    and the body is streamed with a BATCH_FETCH_MAX_BYTES cap.
+    """
+    url = httpx.URL(raw_url)
+    for _ in range(BATCH_FETCH_MAX_REDIRECTS + 1):
+        address = await _check_fetch_url(url)
+        # Connect to the checked address; Host and TLS SNI (and certificate checks) still use the name
+        pinned = url.copy_with(host=address)
+        headers = {"Host": url.netloc.decode("ascii")}
+        async with _get_fetch_client().stream("GET", pinned, headers=headers, extensions={"sni_hostname": url.host}) as response:
+            if response.is_redirect:
+                url = url.join(response.headers["Location"])
+                continue
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "text/plain").lower()
+            if not content_type.startswith(BATCH_FETCH_CONTENT_TYPES):
+                raise FetchRejected(f"Unsupported content type: {content_type.split(';')[0]}")
+            if int(response.headers.get("Content-Length") or 0) > BATCH_FETCH_MAX_BYTES:
+                raise FetchRejected("Document too large")
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) > BATCH_FETCH_MAX_BYTES:
+                    raise FetchRejected("Document too large")
+            return body.decode(response.encoding or "utf-8", errors="replace")
+    raise FetchRejected("Too many redirects")
+
+# --- Pipeline ---
+
+async def _prepare_item(item: BatchItem, document: BatchDocument, semaphore: asyncio.Semaphore) -> Optional[str]:
+    """Fetch (if URL) + clean + summarize. Returns the context prompt, or None on failure."""
+    async with semaphore:
+        item.status = "preprocessing"
+        try:
+            raw_text = document.text
+            if document.url:
+                raw_text = await _fetch_document(document.url)
+            if not raw_text or not raw_text.strip():
+                raise ValueError("Empty document")
+            preprocessed = await get_preprocess_engine().process(raw_text)
+            item.timings = preprocessed["timings"]
+            return preprocessed["prompt"]
+        except Exception as e:
+            item.status = "failed"
+            item.error = f"Preprocessing failed: {str(e)}"
+            return None
+
+
+async def _generate_pack(
+    job: BatchJob,
+    pack: List[BatchItem],
+    prompts: Dict[int, str],
+    tone: Optional[str],
+    semaphore: asyncio.Semaphore,
+    lease: JobLease,
+    save_progress: Callable[[], Awaitable[None]],
+):
+    """One Gemini call for several sources, then one bulk write for all resulting ideas."""
+    async with semaphore:
+        for item in pack:
+            item.status = "generating"
+
+        # Sources are numbered 1..N within the pack
+        numbered = {position + 1: item for position, item in enumerate(pack)}
+        prompt = "\n\n".join(f"Source {number}:\n{prompts[item.index]}" for number, item in numbered.items())
+        instructions = BATCH_LLM_INSTRUCTIONS + (f" Use a {tone} tone." if tone else "")
+        try:
+            response_text = await get_llm_client().generate(instructions, prompt, structured_config(BATCH_IDEA_SCHEMA))
+        except Exception as e:
+            for item in pack:
+                item.status, item.error = "failed", f"AI engine failed: {str(e)}"
+            return
+
+        # Malformed items are dropped individually; the rest of the pack still counts
+        ideas, _ = parse_ideas(response_text, SourcedIdea)
+        ideas_by_item: Dict[int, List[SourcedIdea]] = {item.index: [] for item in pack}
+        for idea in ideas:
+            item = numbered.get(idea.source)
+            if item is not None:
+                ideas_by_item[item.index].append(idea)
+
+        new_ideas_data, owners = [], []
+        now = datetime.utcnow().isoformat()
+        for item in pack:
+            for idea in ideas_by_item[item.index]:
+                new_ideas_data.append({**idea_document(job.owner_id, idea, now), "job_id": job.job_id})
+                owners.append(item)
+
+        await lease.check() # a re-leased attempt stops before storing anything
+        # persist_ideas keeps input order for successes, so saved docs map back by position
+        saved, failed = await persist_ideas(get_async_db(), new_ideas_data)
+        failed_indexes = {failure["index"] for failure in failed}
+        saved_docs = iter(saved)
+        for index, item in enumerate(owners):
+            if index not in failed_indexes:
+                item.idea_ids.append(next(saved_docs)['$id'])
+
+        for item in pack:
+            if item.idea_ids:
+                item.status = "completed"
+            else:
+                item.status = "failed"
+                item.error = item.error or "No valid ideas returned for this source"
+        await save_progress() # before anything else can fail: a retry must not store these again
+
+
+async def run_batch_job(job: BatchJob, reservation: Reservation, request: BatchRequest, lease: JobLease):
+    """
+    Runs the items not completed by an earlier attempt. Progress is saved after each stored pack, so a
+    retry neither regenerates nor loses them; the final charge covers every completed item once.
+    """
+    job.status = "running"
+    progress_lock = asyncio.Lock()
+
+    async def save_progress():
+        async with progress_lock: # one write at a time, so a newer snapshot is never overwritten by an older one
+            await lease.save_progress(job.model_dump())
+
+    try:
+        todo = [item for item in job.items if item.status != "completed"]
+        for item in todo:
+            item.status, item.error = "pending", None
+        await save_progress()
+
+        fetch_semaphore = asyncio.Semaphore(BATCH_FETCH_CONCURRENCY)
+        prepared = await asyncio.gather(*[
+            _prepare_item(item, request.documents[item.index], fetch_semaphore) for item in todo
+        ])
+        prompts = {item.index: prompt for item, prompt in zip(todo, prepared) if prompt}
+
+        ready = [item for item in todo if item.index in prompts]
+        packs = [ready[i:i + BATCH_PACK_SIZE] for i in range(0, len(ready), BATCH_PACK_SIZE)]
+        llm_semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+        await asyncio.gather(*[
+            _generate_pack(job, pack, prompts, request.tone, llm_semaphore, lease, save_progress) for pack in packs
+        ])
+
+        # One credit per document that produced stored ideas; the rest of the hold is released.
+        # The finished job is saved first: a retry after that returns it instead of charging again.
+        completed = sum(1 for item in job.items if item.status == "completed")
+        job.credits_charged = completed
+        job.status = "completed" if completed else "failed"
+        job.finished_at = datetime.utcnow().isoformat()
+        await save_progress()
+        await credit_ledger.commit(reservation, completed)
+    finally:
+        await credit_ledger.refund(reservation) # no-op once committed
+
+
+@register_job_handler("batch")
+async def batch_job_handler(payload: dict, lease: JobLease) -> dict:
+    """Runs a queued /api/generate/batch request; a retry resumes from the saved progress."""
+    request = BatchRequest(**payload["request"])
+    if lease.progress:
+        job = BatchJob(**lease.progress)
+        if job.finished_at is not None:
+            return job.model_dump() # finished and charged; only recording the result failed
+    else:
+        job = new_batch_job(lease.job_id, payload["user_id"], request)
+    # One credit held per document; documents that fail are refunded
+    try:
+        reservation = await credit_ledger.reserve(job.owner_id, len(request.documents))
+    except HTTPException as e:
+        raise NonRetryableJobError(e.detail) from e
+    await run_batch_job(job, reservation, request, lease)
+    return job.model_dump()
@@ -0,0 +1,145 @@
+"""
+Compressed storage for idea bodies too large to keep inline in Appwrite.
+
+A long `result` is written here under the idea's id. The document keeps a short preview in `result`
+and the blob's key in `body_ref`, and the full body is read only when an idea is opened. Blobs are
+zstd-compressed when `zstandard` is installed and gzip-compressed otherwise; reads detect the codec
+from the frame's magic bytes, so switching codecs never strands old blobs.
+"""
+import asyncio
+import gzip
+import os
+import re
+from typing import Any, Dict, Optional
+
+# --- Configuration Constants ---
+# "none" (default): keep every body inline (the serverless deployment has no durable local disk).
+# "local": filesystem under BLOB_STORE_DIR, which must be durable storage (and shared when API workers
+# run on several hosts). Opt-in only: a blob lost with the disk leaves just the preview behind.
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "none")
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "")
+# Bodies longer than this move to the blob store; the document keeps this many characters as a preview
+BLOB_INLINE_MAX_CHARS = int(os.getenv("BLOB_INLINE_MAX_CHARS", "1000"))
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", "6"))
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_GZIP_MAGIC = b"\x1f\x8b"
+_KEY = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+try:
+    import zstandard  # Optional: smaller and several times faster than gzip
+except ImportError:
+    zstandard = None
+
+
+def compress(data: bytes, level: int = BLOB_COMPRESSION_LEVEL) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, compresslevel=level)
+
+
+def decompress(data: bytes) -> bytes:
+    if data.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("Blob is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if data.startswith(_GZIP_MAGIC):
+        return gzip.decompress(data)
+    return data # stored uncompressed
+
+
+class BlobStore:
+    """Interface for a key -> bytes store. Keys are idea ids."""
+    def put(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    # --- Text helpers (compression + off-loop I/O) ---
+
+    async def put_text(self, key: str, text: str):
+        await asyncio.to_thread(lambda: self.put(key, compress(text.encode("utf-8"))))
+
+    async def get_text(self, key: str) -> Optional[str]:
+        def read() -> Optional[str]:
+            data = self.get(key)
+            return decompress(data).decode("utf-8") if data is not None else None
+        return await asyncio.to_thread(read)
+
+
+class LocalBlobStore(BlobStore):
+    """One file per blob, fanned out by key prefix so no directory grows huge. Writes are atomic."""
+    def __init__(self, root: str):
+        self.root = root
+        self.writes = 0
+        self.reads = 0
+        self.bytes_written = 0
+
+    def _path(self, key: str) -> str:
+        if not _KEY.match(key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return os.path.join(self.root, key[-2:], key)
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.writes += 1
+        self.bytes_written += len(data)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        self.reads += 1
+        return data
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "local",
+            "codec": "zstd" if zstandard is not None else "gzip",
+            "writes": self.writes,
+            "reads": self.reads,
+            "bytes_written": self.bytes_written,
+        }
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def _open_local_store() -> LocalBlobStore:
+    """Fails fast (at startup) rather than losing bodies on every write."""
+    if not BLOB_STORE_DIR:
+        raise RuntimeError("BLOB_STORE_BACKEND=local requires BLOB_STORE_DIR on durable storage")
+    try:
+        os.makedirs(BLOB_STORE_DIR, exist_ok=True)
+    except OSError as e:
+        raise RuntimeError(f"BLOB_STORE_DIR {BLOB_STORE_DIR!r} is not usable: {e}")
+    if not os.access(BLOB_STORE_DIR, os.W_OK):
+        raise RuntimeError(f"BLOB_STORE_DIR {BLOB_STORE_DIR!r} is not writable")
+    return LocalBlobStore(BLOB_STORE_DIR)
+
+
+def get_blob_store() -> Optional[BlobStore]:
+    """The configured store, or None when bodies stay inline (BLOB_STORE_BACKEND=none)."""
+    global _blob_store
+    if BLOB_STORE_BACKEND == "local" and _blob_store is None:
+        _blob_store = _open_local_store()
+    elif BLOB_STORE_BACKEND not in ("local", "none"):
+        raise RuntimeError(f"Unknown BLOB_STORE_BACKEND: {BLOB_STORE_BACKEND!r}")
+    return _blob_store
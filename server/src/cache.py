@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# --- Configuration Constants ---
+# CACHE_BACKEND=disk puts a diskcache store behind the in-process caches (shared by all workers on a host).
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after `ttl` seconds."""
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] < time.monotonic():
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class CacheBackend:
+    """Interface for a shared second-tier store behind a TTLCache."""
+    def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+
+class DiskCacheBackend(CacheBackend):
+    """File-backed store using `diskcache`; safe to share between processes on one host."""
+    def __init__(self, directory: str = CACHE_DIR, size_limit: int = 256 * 1024 * 1024):
+        import diskcache  # Optional dependency, only needed when a disk tier is configured
+        self._cache = diskcache.Cache(directory, size_limit=size_limit)
+
+    def get(self, key: str) -> Any:
+        return self._cache.get(key, default=None)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._cache.set(key, value, expire=ttl)
+
+    def delete(self, key: str):
+        self._cache.delete(key)
+
+    def volume(self) -> int:
+        return self._cache.volume()
+
+
+class TieredCache:
+    """An in-process TTLCache optionally backed by a shared CacheBackend. Keys are namespaced."""
+    def __init__(self, memory: TTLCache, backend: Optional[CacheBackend] = None, namespace: str = ""):
+        self.memory = memory
+        self.backend = backend
+        self.namespace = namespace
+        self.backend_hits = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}{key}"
+
+    def get(self, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is not None or self.backend is None:
+            return value
+        value = self.backend.get(self._key(key))
+        if value is not None:
+            self.backend_hits += 1
+            self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.memory.set(key, value, ttl)
+        if self.backend is not None:
+            self.backend.set(self._key(key), value, self.memory.ttl if ttl is None else ttl)
+
+    def delete(self, key: str):
+        self.memory.delete(key)
+        if self.backend is not None:
+            self.backend.delete(self._key(key))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        stats["backend"] = type(self.backend).__name__ if self.backend is not None else None
+        stats["backend_hits"] = self.backend_hits
+        return stats
+
+
+def open_disk_backend(directory: str, size_limit: int, label: str) -> Optional[DiskCacheBackend]:
+    """
+    A DiskCacheBackend, or None (memory-only) when diskcache is missing or `directory` can't be used,
+    e.g. not a directory or read-only. A cache tier must never stop the app from starting.
+    """
+    try:
+        return DiskCacheBackend(directory, size_limit=size_limit)
+    except ImportError:
+        print(f"Warning: diskcache not installed. {label} is memory-only.")
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: cache directory {directory!r} is not usable ({e}). {label} is memory-only.")
+    return None
+
+
+_shared_backend: Optional[CacheBackend] = None
+_shared_backend_opened = False
+
+
+def get_shared_backend() -> Optional[CacheBackend]:
+    """Returns the configured shared backend, or None for memory-only caching."""
+    global _shared_backend, _shared_backend_opened
+    if CACHE_BACKEND == "disk" and not _shared_backend_opened:
+        _shared_backend_opened = True # a failed open is not retried on every call
+        _shared_backend = open_disk_backend(CACHE_DIR, 256 * 1024 * 1024, "The shared cache tier")
+    return _shared_backend
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import Dict, Optional
+
+from appwrite.exception import AppwriteException
+from fastapi import HTTPException, status
+
+from .appwrite_service import DATABASE_ID, USERS_COLLECTION_ID
+from .async_db import get_async_db
+from .auth import USER_CACHE_TTL_SECONDS, invalidate_user
+
+# --- Configuration Constants ---
+CREDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("CREDIT_FLUSH_INTERVAL_SECONDS", "2"))
+# Reservations never committed or refunded (e.g. a crashed request) are released after this long
+CREDIT_RESERVATION_TTL_SECONDS = float(os.getenv("CREDIT_RESERVATION_TTL_SECONDS", "600"))
+# Settled accounts unused for this long are dropped (and re-read on next use). Never shorter than the
+# user cache TTL plus a flush, so a re-created account can't start from a balance cached before its last flush.
+CREDIT_ACCOUNT_IDLE_SECONDS = max(
+    float(os.getenv("CREDIT_ACCOUNT_IDLE_SECONDS", "600")),
+    USER_CACHE_TTL_SECONDS + 2 * CREDIT_FLUSH_INTERVAL_SECONDS,
+)
+
+
+class Reservation:
+    """Credits held for one in-flight generation."""
+    __slots__ = ("reservation_id", "user_id", "amount", "created_at", "settled")
+
+    def __init__(self, user_id: str, amount: int):
+        self.reservation_id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.amount = amount
+        self.created_at = time.monotonic()
+        self.settled = False
+
+
+class _Account:
+    """In-memory view of one user's balance: synced value + unflushed spend - held reservations."""
+    def __init__(self, synced: int):
+        self.synced = synced
+        self.delta = 0
+        self.reservations: Dict[str, Reservation] = {}
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    @property
+    def reserved(self) -> int:
+        return sum(r.amount for r in self.reservations.values())
+
+    @property
+    def available(self) -> int:
+        return self.synced + self.delta - self.reserved
+
+    @property
+    def settled(self) -> bool:
+        """Nothing held and nothing waiting to be flushed."""
+        return self.delta == 0 and not self.reservations
+
+
+class CreditLedger:
+    """
+    Atomic reserve/commit/refund credit accounting.
+    Balance checks and holds happen in memory under a per-user lock, so concurrent requests from one
+    user can't double-spend. Committed spends are batched and flushed to Appwrite in the background
+    as an atomic decrement, so nothing is lost when several processes (API pods, `src.worker`) flush
+    for the same user, and external changes (top-ups, admin edits) are kept rather than overwritten.
+
+    Each process holds its own ledger, so across processes the balance is only re-synced on flush
+    (and when a reservation would fail). Two processes can therefore together overspend by at most
+    what one flush interval allows; the stored balance never goes below zero.
+    """
+    def __init__(self, flush_interval: float = CREDIT_FLUSH_INTERVAL_SECONDS):
+        self.flush_interval = flush_interval
+        self._accounts: Dict[str, _Account] = {}
+        self._dirty = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flush_errors = 0
+        self.evictions = 0
+
+    async def _account(self, user_id: str, known_balance: Optional[int] = None) -> _Account:
+        account = self._accounts.get(user_id)
+        if account is None:
+            if known_balance is None:
+                known_balance = await self._read_balance(user_id)
+            # Another coroutine may have loaded it while we awaited
+            account = self._accounts.setdefault(user_id, _Account(known_balance))
+        return account
+
+    async def _read_balance(self, user_id: str) -> int:
+        user_doc = await get_async_db().get_document(DATABASE_ID, USERS_COLLECTION_ID, user_id)
+        return user_doc['idea_credits']
+
+    async def reserve(self, user_id: str, amount: int = 1, known_balance: Optional[int] = None) -> Reservation:
+        """
+        Holds `amount` credits or raises 403. `known_balance` (e.g. from the user cache) is only used to
+        create the account; once it exists the ledger's own view wins, since a cached balance can predate
+        the last flush.
+        """
+        account = await self._account(user_id, known_balance)
+        async with account.lock:
+            account.last_used = time.monotonic()
+            if account.available < amount and account.settled:
+                # Re-read before refusing: picks up top-ups and other processes' flushes
+                account.synced = await self._read_balance(user_id)
+            if account.available < amount:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient credits")
+            reservation = Reservation(user_id, amount)
+            account.reservations[reservation.reservation_id] = reservation
+            return reservation
+
+    async def commit(self, reservation: Reservation, amount: Optional[int] = None) -> int:
+        """Spends `amount` (default: all) of the hold, releases the rest. Returns the available balance."""
+        account = await self._account(reservation.user_id)
+        async with account.lock:
+            account.last_used = time.monotonic()
+            if account.reservations.pop(reservation.reservation_id, None) is not None and not reservation.settled:
+                spent = reservation.amount if amount is None else max(0, min(amount, reservation.amount))
+                account.delta -= spent
+                if spent:
+                    self._dirty.add(reservation.user_id)
+            reservation.settled = True
+            return account.available
+
+    async def refund(self, reservation: Reservation) -> int:
+        """Releases the whole hold. Safe to call after commit (no-op)."""
+        return await self.commit(reservation, amount=0)
+
+    async def balance(self, user_id: str) -> int:
+        return (await self._account(user_id)).available
+
+    # --- Flushing ---
+
+    def _expire_reservations(self):
+        cutoff = time.monotonic() - CREDIT_RESERVATION_TTL_SECONDS
+        for account in self._accounts.values():
+            for reservation_id, reservation in list(account.reservations.items()):
+                if reservation.created_at < cutoff:
+                    del account.reservations[reservation_id]
+
+    def _evict_idle(self):
+        """Drops settled accounts nobody has used for CREDIT_ACCOUNT_IDLE_SECONDS."""
+        cutoff = time.monotonic() - CREDIT_ACCOUNT_IDLE_SECONDS
+        for user_id, account in list(self._accounts.items()):
+            if (account.last_used < cutoff and account.settled and user_id not in self._dirty
+                    and not account.lock.locked()):
+                del self._accounts[user_id]
+                self.evictions += 1
+
+    async def _apply_spend(self, user_id: str, spent: int) -> int:
+        """Atomically subtracts `spent` from the stored balance (floored at 0). Returns the new balance."""
+        adb = get_async_db()
+        try:
+            user_doc = await adb.decrement_document_attribute(
+                DATABASE_ID, USERS_COLLECTION_ID, user_id, "idea_credits", value=spent, min=0
+            )
+        except AppwriteException as e:
+            if e.code != 400:
+                raise
+            # Would go negative (spent elsewhere too): take what is left, still atomically
+            remaining = await self._read_balance(user_id)
+            if remaining <= 0:
+                return 0
+            user_doc = await adb.decrement_document_attribute(
+                DATABASE_ID, USERS_COLLECTION_ID, user_id, "idea_credits", value=min(spent, remaining), min=0
+            )
+        return user_doc['idea_credits']
+
+    async def flush(self):
+        """Writes unflushed spends to Appwrite as atomic decrements, then drops idle accounts."""
+        self._expire_reservations()
+        dirty, self._dirty = self._dirty, set()
+        for user_id in dirty:
+            account = self._accounts[user_id]
+            pending = account.delta
+            if pending == 0:
+                continue
+            try:
+                new_balance = await self._apply_spend(user_id, -pending)
+                invalidate_user(user_id) # the cached user document still shows the old balance
+                # Commits made while we were awaiting stay in delta for the next flush
+                account.synced = new_balance
+                account.delta -= pending
+                self.flushes += 1
+            except Exception as e:
+                self.flush_errors += 1
+                self._dirty.add(user_id)
+                print(f"Credit flush failed for user {user_id}: {e}")
+        self._evict_idle()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        """Startup hook: begins periodic flushing."""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Shutdown hook: stops the loop and flushes whatever is left."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "accounts": len(self._accounts),
+            "dirty": len(self._dirty),
+            "reservations": sum(len(a.reservations) for a in self._accounts.values()),
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "evictions": self.evictions,
+        }
+
+
+credit_ledger = CreditLedger()
@@ -1,3 +1,5 @@
+# Legacy SQL layer (pre-Appwrite). Nothing on the request path imports it; the engine is only
+# created when get_engine()/get_db() is first called, so importing this module never needs DATABASE_URL.
 from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Boolean, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
@@ -8,22 +10,31 @@ import os
 # --- 1. Database Configuration ---
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-if not DATABASE_URL:
-    raise Exception("DATABASE_URL is not set. Cannot connect to database.")
+_engine = None
+
+
+def get_engine():
+    """Creates the SQLAlchemy engine on first use."""
+    global _engine
+    if _engine is None:
+        if not DATABASE_URL:
+            raise Exception("DATABASE_URL is not set. Cannot connect to database.")
+        # --- SUPABASE FIX START ---
+        # Cloud DBs like Supabase require extra pooling settings to stay stable.
+        _engine = create_engine(
+            DATABASE_URL,
+            pool_pre_ping=True,  # Automatically reconnects if the cloud drops the connection
+            pool_size=10,        # Number of permanent connections to keep open
+            max_overflow=20,     # Temporary extra connections during high traffic
+            pool_recycle=3600    # Refresh connections every hour
+        )
+        # --- SUPABASE FIX END ---
+        SessionLocal.configure(bind=_engine)
+    return _engine
 
-# --- SUPABASE FIX START ---
-# Cloud DBs like Supabase require extra pooling settings to stay stable.
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,  # Automatically reconnects if the cloud drops the connection
-    pool_size=10,        # Number of permanent connections to keep open
-    max_overflow=20,     # Temporary extra connections during high traffic
-    pool_recycle=3600    # Refresh connections every hour
-)
-# --- SUPABASE FIX END ---
 
 Base = declarative_base()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # --- 2. Database Models ---
@@ -58,6 +69,7 @@ class Idea(Base):
 
 # --- 3. Database Utility ---
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
@@ -66,7 +78,7 @@ def get_db():
 
 def create_database_tables():
     # This will now create tables in the Supabase Cloud dashboard
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
     print("Supabase tables synced/created successfully.")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -0,0 +1,288 @@
+import os
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from appwrite.exception import AppwriteException
+from appwrite.query import Query
+
+from .appwrite_service import DATABASE_ID, IDEAS_COLLECTION_ID, USERS_COLLECTION_ID
+from .async_db import get_async_db
+from .credits import Reservation, credit_ledger
+from .idea_parser import (
+    ParsedIdea, idea_array_schema, idea_document, parse_ideas, request_ideas, serialize_ideas, structured_config
+)
+from .idea_store import idea_body, persist_ideas
+from .job_queue import JobLease, NonRetryableJobError, register_job_handler
+from .llm_client import get_llm_client
+from .metrics import stage
+from .nlp_processor import NLPProcessor
+from .response_cache import response_cache, response_cache_key
+from .similarity import idea_text, similarity_index
+
+# --- Configuration Constants ---
+BRAINSTORM_IDEA_COUNT = 5
+# Follow-up calls asking only for the ideas that came back malformed (0 disables)
+IDEA_REPAIR_ATTEMPTS = int(os.getenv("IDEA_REPAIR_ATTEMPTS", "1"))
+
+BRAINSTORM_CONFIG = structured_config(idea_array_schema(
+    BRAINSTORM_IDEA_COUNT, f"A list of exactly {BRAINSTORM_IDEA_COUNT} unique startup opportunities."
+))
+
+adb = get_async_db()
+
+# --- Pydantic Schemas ---
+class IdeaRequest(BaseModel):
+    prompt: str
+    tone: Optional[str] = None
+    no_cache: bool = False # Skip the LLM response cache and always call Gemini
+
+# --- Generation Helpers ---
+def extract_categories(prompt: str):
+    # Fixed Regex: r"\[Categories:\s*(.*?)\]" correctly finds [Categories: X, Y]
+    match = re.search(r"\[Categories:\s*(.*?)\]", prompt)
+    if match:
+        categories = match.group(1)
+        clean_prompt = prompt.replace(match.group(0), "").strip()
+        return categories, clean_prompt
+    return None, prompt
+
+async def load_generation_user(user_id: str) -> dict:
+    """Fresh user document for work that runs outside a request (queued jobs)."""
+    try:
+        return await adb.get_document(DATABASE_ID, USERS_COLLECTION_ID, user_id)
+    except AppwriteException as e:
+        if e.code == 404:
+            raise HTTPException(status_code=404, detail="User not found")
+        raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}")
+
+async def reserve_generation_credit(user: dict) -> Reservation:
+    """Holds one credit before the LLM call; raises 403 when the user has none available."""
+    return await credit_ledger.reserve(user['$id'], 1, known_balance=user['idea_credits'])
+
+def build_generation_prompt(request: IdeaRequest):
+    """Returns (system_instruction, final_prompt_for_ai, clean_user_prompt, is_brainstorm)."""
+    # Extract Categories
+    categories, clean_user_prompt = extract_categories(request.prompt)
+    is_brainstorm = "BRAINSTORM_MODE" in request.prompt
+
+    # Mode Selection
+    if is_brainstorm:
+        system_instruction = (
+            f"You are a Venture Capitalist. Generate {BRAINSTORM_IDEA_COUNT} unique startup opportunities "
+            f"for: {categories or 'general'}. Use the provided JSON schema."
+        )
+        final_prompt_for_ai = f"Target Industries: {categories}"
+    else:
+        system_instruction = "You are a startup consultant. Analyze this idea and provide a plan."
+        if categories:
+            system_instruction += f" Context: {categories}."
+        final_prompt_for_ai = clean_user_prompt
+
+    if request.tone:
+        system_instruction += f" Use a {request.tone} tone."
+
+    return system_instruction, final_prompt_for_ai, clean_user_prompt, is_brainstorm
+
+def generation_cache_key(request: IdeaRequest, system_instruction: str, final_prompt_for_ai: str) -> str:
+    categories, _ = extract_categories(request.prompt)
+    return response_cache_key(system_instruction, final_prompt_for_ai, request.tone, categories)
+
+def generation_config(is_brainstorm: bool) -> Optional[dict]:
+    """Brainstorms use structured JSON output; analyses are free text."""
+    return BRAINSTORM_CONFIG if is_brainstorm else None
+
+def brainstorm_idea_data(owner_id: str, idea: ParsedIdea) -> dict:
+    return idea_document(owner_id, idea, datetime.utcnow().isoformat())
+
+async def repair_brainstorm(system_instruction: str, final_prompt_for_ai: str, ideas: List[ParsedIdea]) -> List[ParsedIdea]:
+    """
+    Asks again for just the ideas that are missing (malformed or truncated), instead of regenerating
+    the whole brainstorm. Returns the replacements; failures here leave the result partial.
+    """
+    replacements: List[ParsedIdea] = []
+    for _ in range(IDEA_REPAIR_ATTEMPTS):
+        missing = BRAINSTORM_IDEA_COUNT - len(ideas) - len(replacements)
+        if missing <= 0:
+            break
+        try:
+            replacements += await request_ideas(
+                get_llm_client(), system_instruction, final_prompt_for_ai, missing,
+                exclude=[idea.name for idea in ideas + replacements],
+            )
+        except HTTPException:
+            break # admission control: keep what we have
+        except Exception as e:
+            print(f"Idea repair failed: {e}")
+            break
+    return replacements
+
+def analysis_idea_data(owner_id: str, clean_user_prompt: str, ai_raw_response: str) -> dict:
+    return {
+        "owner_id": owner_id,
+        "name": "Analysis",
+        "problem": clean_user_prompt[:255],
+        "result": ai_raw_response,
+        "created_at": datetime.utcnow().isoformat()
+    }
+
+async def find_duplicate_idea(user: dict, request: IdeaRequest, clean_user_prompt: str, is_brainstorm: bool) -> Optional[dict]:
+    """
+    A stored analysis of (nearly) the same prompt, when SIMILARITY_DEDUP_THRESHOLD is set.
+    Brainstorms are meant to differ each time, and no_cache always asks Gemini.
+    """
+    if is_brainstorm or request.no_cache:
+        return None
+    # Compare against what an analysis of this prompt would store, so an identical prompt scores 1.0
+    try:
+        match = await similarity_index.find_duplicate(user['$id'], idea_text(analysis_idea_data(user['$id'], clean_user_prompt, "")))
+    except Exception as e:
+        print(f"Duplicate check skipped: {e}") # an optimisation only; generate as usual
+        return None
+    if match is None:
+        return None
+    try:
+        doc = await adb.get_document(DATABASE_ID, IDEAS_COLLECTION_ID, match["id"])
+    except AppwriteException:
+        return None # deleted since it was indexed
+    return {"id": doc['$id'], "result": await idea_body(doc), "score": match["score"]}
+
+def duplicate_response(duplicate: dict, credits_remaining: int) -> dict:
+    """/api/generate response for a request answered by an existing idea (nothing charged)."""
+    return {
+        "status": "success",
+        "ideas": [{"id": duplicate["id"], "result": duplicate["result"]}],
+        "failed": [],
+        "credits_remaining": credits_remaining,
+        "cached": False,
+        "duplicate": True,
+    }
+
+async def charge_generation(reservation: Reservation, cache_hit: bool = False) -> int:
+    """Settles the held credit once something was actually stored. Returns the remaining balance."""
+    return await credit_ledger.commit(reservation, 1 if response_cache.should_charge(cache_hit) else 0)
+
+async def run_generation(request: IdeaRequest, user: dict, lease: Optional[JobLease] = None) -> dict:
+    """
+    The full /api/generate flow for `user`: credit check, prompt building, LLM call (or cache hit),
+    bulk persistence and charging. Shared by the HTTP route and the background job worker, which
+    passes its `lease`: the ideas are tagged with the job, and nothing is stored once it is lost.
+    """
+    # 1. Credit Check - reserved up front, refunded unless the generation is stored
+    with stage("credit_reserve"):
+        reservation = await reserve_generation_credit(user)
+    try:
+        return await _generate_and_store(request, user, reservation, lease)
+    finally:
+        await credit_ledger.refund(reservation) # no-op once committed
+
+async def _generate_and_store(request: IdeaRequest, user: dict, reservation: Reservation, lease: Optional[JobLease]) -> dict:
+    # 2. Prompt + Mode Selection
+    with stage("prompt_build"):
+        system_instruction, final_prompt_for_ai, clean_user_prompt, is_brainstorm = build_generation_prompt(request)
+
+    # Near-identical earlier analysis: return it instead of generating (and charging) again
+    with stage("dedup"):
+        duplicate = await find_duplicate_idea(user, request, clean_user_prompt, is_brainstorm)
+    if duplicate is not None:
+        return duplicate_response(duplicate, await credit_ledger.refund(reservation))
+
+    # 3. AI Call (served from the response cache when the same inputs were seen recently)
+    with stage("cache_lookup"):
+        cache_key = generation_cache_key(request, system_instruction, final_prompt_for_ai)
+        ai_raw_response = None if request.no_cache else response_cache.get(cache_key)
+    cache_hit = ai_raw_response is not None
+    if not cache_hit:
+        nlp_processor = NLPProcessor()
+        try:
+            with stage("llm"):
+                ai_raw_response = await nlp_processor.generate_idea(
+                    system_instruction, final_prompt_for_ai, generation_config(is_brainstorm)
+                )
+        except HTTPException:
+            raise # admission control (503) passes through as-is
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"AI engine failed: {str(e)}")
+
+    # 4. Process and Save
+    if is_brainstorm:
+        with stage("parse"):
+            ideas, _ = parse_ideas(ai_raw_response)
+        if not cache_hit:
+            with stage("repair"):
+                ideas += await repair_brainstorm(system_instruction, final_prompt_for_ai, ideas)
+            # Cache the validated ideas so a replay needs neither parsing fixes nor repairs
+            if ideas:
+                response_cache.set(cache_key, serialize_ideas(ideas))
+        new_ideas_data = [brainstorm_idea_data(user['$id'], idea) for idea in ideas]
+    else:
+        if not cache_hit:
+            response_cache.set(cache_key, ai_raw_response)
+        new_ideas_data = [analysis_idea_data(user['$id'], clean_user_prompt, ai_raw_response)]
+    if not new_ideas_data:
+        raise HTTPException(status_code=502, detail="AI engine returned no usable ideas. No credits were charged.")
+    if lease is not None:
+        await lease.check() # a re-leased attempt stops before storing (or charging) anything
+        for idea_data in new_ideas_data:
+            idea_data["job_id"] = lease.job_id
+
+    # All ideas are written concurrently (bounded), instead of one round trip each
+    with stage("persist"):
+        saved_ideas, failed_ideas = await persist_ideas(adb, new_ideas_data)
+    if not saved_ideas:
+        raise HTTPException(status_code=502, detail="Failed to save generated ideas. No credits were charged.")
+
+    with stage("credit_commit"):
+        credits_remaining = await charge_generation(reservation, cache_hit)
+
+    return {
+        "status": "partial" if failed_ideas else "success",
+        "ideas": [{"id": i['$id'], "result": i['result']} for i in saved_ideas],
+        "failed": failed_ideas,
+        "credits_remaining": credits_remaining,
+        "cached": cache_hit
+    }
+
+# --- Background Job Handler ---
+
+async def stored_job_result(user_id: str, job_id: str) -> Optional[dict]:
+    """
+    The response for ideas an earlier attempt of `job_id` already stored, or None. That attempt also
+    charged for them (unless it died in between), so the retry returns them instead of generating again.
+    """
+    result = await adb.list_documents(DATABASE_ID, IDEAS_COLLECTION_ID, queries=[
+        Query.equal("owner_id", user_id),
+        Query.equal("job_id", job_id),
+        Query.select(["$id", "result", "body_ref"]),
+        Query.limit(BRAINSTORM_IDEA_COUNT), # the most one generation stores
+    ])
+    if not result['documents']:
+        return None
+    return {
+        "status": "success",
+        "ideas": [{"id": doc['$id'], "result": await idea_body(doc)} for doc in result['documents']],
+        "failed": [],
+        "credits_remaining": await credit_ledger.balance(user_id),
+        "cached": False,
+    }
+
+@register_job_handler("generate")
+async def generate_job_handler(payload: dict, lease: JobLease) -> dict:
+    """
+    Runs a queued /api/jobs/generate request. Client errors (4xx) are final; others are retried,
+    and a retry after the ideas were stored returns them rather than generating (and charging) twice.
+    """
+    try:
+        if not payload.get("user_id"):
+            raise HTTPException(status_code=400, detail="Job has no owner")
+        user = await load_generation_user(payload["user_id"])
+        stored = await stored_job_result(user['$id'], lease.job_id)
+        if stored is not None:
+            return stored
+        return await run_generation(IdeaRequest(**payload), user, lease)
+    except HTTPException as e:
+        if e.status_code < 500:
+            raise NonRetryableJobError(e.detail) from e
+        raise
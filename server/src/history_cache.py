@@ -0,0 +1,158 @@
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from . import idea_events
+from .cache import TTLCache
+
+# --- Configuration Constants ---
+# Newest N history entries kept per user; the first page (and the post-generate refresh) is served from here
+HISTORY_CACHE_ITEMS = int(os.getenv("HISTORY_CACHE_ITEMS", "100"))
+HISTORY_CACHE_USERS = int(os.getenv("HISTORY_CACHE_USERS", "5000"))
+# Version counters outlive windows (they guard fills and back ETags), so keep more of them; LRU-bounded
+HISTORY_VERSION_USERS = max(HISTORY_CACHE_USERS, int(os.getenv("HISTORY_VERSION_USERS", str(HISTORY_CACHE_USERS * 4))))
+# Bounds staleness from writes made by other processes (e.g. a standalone job worker)
+HISTORY_CACHE_TTL_SECONDS = float(os.getenv("HISTORY_CACHE_TTL_SECONDS", "60"))
+HISTORY_PREVIEW_CHARS = int(os.getenv("HISTORY_PREVIEW_CHARS", "200"))
+# List views never need the (up to 5000 char) `result` body
+HISTORY_LIST_FIELDS = ["$id", "$createdAt", "owner_id", "name", "problem", "is_starred", "created_at"]
+
+
+def history_item(doc: dict) -> dict:
+    """Maps an Appwrite idea document to the history list entry the frontend expects."""
+    return {
+        "id": doc['$id'],
+        "name": doc.get('name'),
+        "preview": (doc.get('problem') or "")[:HISTORY_PREVIEW_CHARS],
+        "is_starred": doc.get('is_starred', False),
+        "created_at": doc.get('created_at') or doc.get('$createdAt'),
+    }
+
+
+class _Window:
+    """A user's newest history entries. `complete` means there is nothing older."""
+    __slots__ = ("items", "complete")
+
+    def __init__(self, items: List[dict], complete: bool):
+        self.items = items
+        self.complete = complete
+
+
+class HistoryCache:
+    """
+    Per-user cache of the newest history entries, kept current on write rather than invalidated.
+    A per-user version guards against a slow read overwriting a newer write.
+
+    Versions are drawn from one process-wide counter, so a value is never reused, even for a user
+    whose entry was evicted from the bounded version map. An evicted user just gets a new version,
+    which can cost a skipped fill or a 200 instead of a 304, never a stale answer.
+    """
+    def __init__(
+        self,
+        max_items: int = HISTORY_CACHE_ITEMS,
+        max_users: int = HISTORY_CACHE_USERS,
+        ttl: float = HISTORY_CACHE_TTL_SECONDS,
+        max_versions: int = HISTORY_VERSION_USERS,
+    ):
+        self.max_items = max_items
+        self.max_versions = max(max_users, max_versions)
+        self._windows = TTLCache(maxsize=max_users, ttl=ttl)
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._clock = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def version(self, user_id: str) -> int:
+        with self._lock:
+            version = self._versions.get(user_id)
+            if version is None:
+                return self._bump(user_id)
+            self._versions.move_to_end(user_id)
+            return version
+
+    def _bump(self, user_id: str) -> int:
+        """Assigns a fresh version (caller holds the lock)."""
+        version = self._versions[user_id] = next(self._clock)
+        self._versions.move_to_end(user_id)
+        while len(self._versions) > self.max_versions:
+            self._versions.popitem(last=False)
+        return version
+
+    def is_cached(self, user_id: str) -> bool:
+        """True while the user's window is live, i.e. their history was read from Appwrite within the TTL."""
+        return self._windows.get(user_id) is not None
+
+    def get_page(self, user_id: str, limit: int) -> Optional[Tuple[List[dict], bool]]:
+        """(items, has_more) for the first page, or None if the cache can't answer it."""
+        window: Optional[_Window] = self._windows.get(user_id)
+        if window is None or (len(window.items) < limit and not window.complete):
+            return None
+        return list(window.items[:limit]), len(window.items) > limit or not window.complete
+
+    def fill(self, user_id: str, docs: Iterable[dict], complete: bool, read_version: int) -> bool:
+        """
+        Stores a freshly read first page unless a write landed while it was being read. A stored
+        read bumps the version too, since it may include writes made by other processes.
+        """
+        with self._lock:
+            if self._versions.get(user_id) != read_version:
+                return False
+            items = [history_item(doc) for doc in docs][:self.max_items]
+            self._windows.set(user_id, _Window(items, complete))
+            self._bump(user_id)
+            return True
+
+    def known_ids(self, user_id: str, idea_ids: Iterable[str]) -> Set[str]:
+        """The subset of `idea_ids` present in the user's cached window, i.e. known to be theirs."""
+        window: Optional[_Window] = self._windows.get(user_id)
+        if window is None:
+            return set()
+        wanted = set(idea_ids)
+        return {item["id"] for item in window.items if item["id"] in wanted}
+
+    # --- Write hooks ---
+
+    def ideas_created(self, user_id: str, docs: List[dict]):
+        with self._lock:
+            self._bump(user_id)
+            window: Optional[_Window] = self._windows.get(user_id)
+            if window is None:
+                return
+            new_items = sorted((history_item(doc) for doc in docs), key=lambda i: i["created_at"] or "", reverse=True)
+            combined = new_items + window.items
+            if len(combined) > self.max_items:
+                window.complete = False
+            window.items = combined[:self.max_items]
+
+    def idea_updated(self, user_id: str, idea_id: str, fields: Dict[str, Any]):
+        with self._lock:
+            self._bump(user_id)
+            window: Optional[_Window] = self._windows.get(user_id)
+            for item in window.items if window else []:
+                if item["id"] == idea_id:
+                    item.update({k: v for k, v in fields.items() if k in item})
+
+    def ideas_deleted(self, user_id: str, idea_ids: Iterable[str]):
+        with self._lock:
+            self._bump(user_id)
+            window: Optional[_Window] = self._windows.get(user_id)
+            if window is not None:
+                removed = set(idea_ids)
+                window.items = [item for item in window.items if item["id"] not in removed]
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._bump(user_id)
+            self._windows.delete(user_id)
+
+    def stats(self):
+        stats = self._windows.stats()
+        stats["versions"] = len(self._versions)
+        return stats
+
+
+history_cache = HistoryCache()
+idea_events.subscribe(idea_events.CREATED, history_cache.ideas_created)
+idea_events.subscribe(idea_events.UPDATED, history_cache.idea_updated)
+idea_events.subscribe(idea_events.DELETED, history_cache.ideas_deleted)
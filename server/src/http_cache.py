@@ -0,0 +1,43 @@
+"""
+Conditional GET support: ETag construction and If-None-Match matching.
+
+ETags for per-user data are derived from the user's history version (src/history_cache.py), which
+every idea write bumps, so a matching tag can be answered with 304 before any Appwrite read. Versions
+are per-process counters; the process epoch in each tag keeps a tag from one process (or from before
+a restart) from ever matching another process's counter.
+"""
+import hashlib
+import os
+from typing import Optional
+
+from fastapi.responses import Response
+
+# Distinguishes this process's version counters from any other's
+PROCESS_EPOCH = os.urandom(8).hex()
+
+# Per-user responses: the browser (or the client's own cache) must revalidate before each use
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def make_etag(*parts, weak: bool = True) -> str:
+    """Quoted ETag from the given parts. Weak by default: compressed and identity bodies share it."""
+    digest = hashlib.blake2b("\x1f".join(str(p) for p in parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def _opaque(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison (RFC 9110 13.1.2) against an If-None-Match header value."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = _opaque(etag)
+    return any(_opaque(candidate.strip()) == wanted for candidate in if_none_match.split(","))
+
+
+def not_modified(etag: str, cache_control: str = PRIVATE_REVALIDATE) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
@@ -0,0 +1,38 @@
+"""
+In-process notifications for writes to the Ideas collection.
+
+Caches and indexes derived from a user's ideas (the history window, the similarity index) subscribe
+here instead of every write path calling each of them. Listeners run synchronously in the writer's
+context, so they must be cheap; a failing listener is logged and does not affect the others.
+"""
+from typing import Any, Callable, Dict, Iterable, List
+
+CREATED = "created"   # listener(user_id, docs)
+UPDATED = "updated"   # listener(user_id, idea_id, fields)
+DELETED = "deleted"   # listener(user_id, idea_ids)
+
+_listeners: Dict[str, List[Callable[..., None]]] = {CREATED: [], UPDATED: [], DELETED: []}
+
+
+def subscribe(event: str, listener: Callable[..., None]):
+    _listeners[event].append(listener)
+
+
+def _emit(event: str, *args):
+    for listener in _listeners[event]:
+        try:
+            listener(*args)
+        except Exception as e:
+            print(f"Idea event listener {getattr(listener, '__qualname__', listener)} failed: {e}")
+
+
+def ideas_created(user_id: str, docs: List[dict]):
+    _emit(CREATED, user_id, docs)
+
+
+def idea_updated(user_id: str, idea_id: str, fields: Dict[str, Any]):
+    _emit(UPDATED, user_id, idea_id, fields)
+
+
+def ideas_deleted(user_id: str, idea_ids: Iterable[str]):
+    _emit(DELETED, user_id, list(idea_ids))
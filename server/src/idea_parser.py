@@ -0,0 +1,225 @@
+"""
+Structured idea output: the JSON schema sent to Gemini, validation, and an incremental parser.
+
+Gemini is asked for a JSON array of {Name, Problem, Solution} objects (responseSchema). The parser
+consumes the response chunk by chunk and hands back each idea as soon as its object closes, so the
+stream route can save ideas while the rest is still generating. Objects that fail to parse or
+validate are recorded as malformed; only that shortfall needs to be asked for again.
+"""
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from .metrics import IDEA_PARSE_ITEMS
+
+# --- Configuration Constants ---
+# Problem/solution text shorter than this is treated as a malformed idea
+MIN_IDEA_CHARS = 10
+# Appwrite attribute sizes for the Ideas collection (see src/migrations.py)
+IDEA_NAME_MAX_CHARS = 255
+IDEA_TEXT_MAX_CHARS = 5000
+
+
+# --- JSON Schema for Structured Output ---
+
+def idea_array_schema(count: int, description: str) -> Dict[str, Any]:
+    """responseSchema for an array of exactly `count` ideas."""
+    return {
+        "type": "array",
+        "description": description,
+        "minItems": count,
+        "maxItems": count,
+        "items": {
+            "type": "object",
+            "properties": {
+                "Name": {"type": "string", "description": "A catchy, short name for the startup idea."},
+                "Problem": {"type": "string", "description": "The specific market problem identified in the text context."},
+                "Solution": {"type": "string", "description": "A brief, actionable solution using modern technology."}
+            },
+            "required": ["Name", "Problem", "Solution"]
+        }
+    }
+
+
+# This schema forces the LLM to return data in a reliable, parsable format.
+IDEA_SCHEMA = idea_array_schema(3, "A list of exactly 3 unique startup ideas based on the provided text.")
+
+
+def structured_config(schema: Dict[str, Any], temperature: float = 0.8) -> Dict[str, Any]:
+    """generationConfig enforcing JSON output that matches `schema`."""
+    return {
+        "responseMimeType": "application/json",
+        "responseSchema": schema,
+        "temperature": temperature,
+    }
+
+
+# --- Pydantic Schemas ---
+
+class ParsedIdea(BaseModel):
+    """One validated idea. Accepts the schema's capitalised keys as well as the field names."""
+    model_config = ConfigDict(populate_by_name=True, str_strip_whitespace=True)
+
+    name: str = Field(alias="Name", min_length=1)
+    problem: str = Field(alias="Problem", min_length=MIN_IDEA_CHARS)
+    solution: str = Field(alias="Solution", min_length=MIN_IDEA_CHARS)
+
+
+class SourcedIdea(ParsedIdea):
+    """Batch output: an idea tagged with the number of the source it is based on."""
+    source: int = Field(alias="Source")
+
+
+def format_idea(idea: ParsedIdea) -> str:
+    """The single-string form shown by the frontend (and stored as `result`)."""
+    return f"NAME: {idea.name} | PROBLEM: {idea.problem} | SOLUTION: {idea.solution}"
+
+
+def idea_document(owner_id: str, idea: ParsedIdea, created_at: str) -> dict:
+    """Ideas collection document for a parsed idea, truncated to the attribute sizes."""
+    return {
+        "owner_id": owner_id,
+        "name": idea.name[:IDEA_NAME_MAX_CHARS],
+        "problem": idea.problem[:IDEA_TEXT_MAX_CHARS],
+        "solution": idea.solution[:IDEA_TEXT_MAX_CHARS],
+        "result": format_idea(idea)[:IDEA_TEXT_MAX_CHARS],
+        "created_at": created_at,
+    }
+
+
+def serialize_ideas(ideas: Iterable[ParsedIdea]) -> str:
+    """JSON array in the schema's shape; what gets cached, so a replay parses without repairs."""
+    return json.dumps([idea.model_dump(by_alias=True) for idea in ideas])
+
+
+# --- Incremental Parser ---
+
+# Characters that can change the parser state; everything between them is skipped in one step
+_SIGNIFICANT = re.compile(r'[\[\]{}"\\]')
+
+
+class IdeaStreamParser:
+    """
+    Incremental parser for a JSON array of idea objects.
+
+    feed() returns the ideas completed by that chunk. Only the unfinished object is kept in memory,
+    and each character is scanned once. Text before the opening bracket (e.g. a ```json fence) is ignored.
+    """
+    def __init__(self, model: Type[ParsedIdea] = ParsedIdea):
+        self.model = model
+        self.ideas: List[ParsedIdea] = []
+        self.malformed: List[Dict[str, Any]] = [] # {"index": i, "error": "..."}
+        self.closed = False # saw the array's closing bracket
+        self._buffer = ""
+        self._pos = 0
+        self._opened = False
+        self._start: Optional[int] = None # offset of the current object's opening brace
+        self._depth = 0
+        self._in_string = False
+        self._count = 0
+
+    def feed(self, chunk: str) -> List[ParsedIdea]:
+        completed: List[ParsedIdea] = []
+        if self.closed or not chunk:
+            return completed
+        self._buffer += chunk
+        buffer = self._buffer
+
+        while True:
+            match = _SIGNIFICANT.search(buffer, self._pos)
+            if match is None:
+                self._pos = len(buffer)
+                break
+            char, position = match.group(), match.start()
+            self._pos = position + 1
+
+            if self._in_string:
+                if char == "\\":
+                    if self._pos >= len(buffer):
+                        self._pos = position # escape split across chunks; rescan it next time
+                        break
+                    self._pos += 1
+                elif char == '"':
+                    self._in_string = False
+            elif not self._opened:
+                self._opened = char == "["
+            elif self._start is None:
+                # Between items: only an object or the end of the array is meaningful
+                if char == "{":
+                    self._start, self._depth = position, 1
+                elif char == "]":
+                    self.closed = True
+                    break
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    idea = self._complete(buffer[self._start:position + 1])
+                    if idea is not None:
+                        completed.append(idea)
+                    self._start = None
+
+        # Drop everything before the unfinished object
+        keep_from = self._start if self._start is not None else self._pos
+        self._buffer = buffer[keep_from:]
+        self._pos -= keep_from
+        if self._start is not None:
+            self._start = 0
+        return completed
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Marks an unfinished trailing object as malformed. Returns all malformed items."""
+        if self._start is not None:
+            self._reject("Truncated idea object")
+            self._start = None
+        return self.malformed
+
+    def _complete(self, text: str) -> Optional[ParsedIdea]:
+        try:
+            idea = self.model.model_validate(json.loads(text))
+        except (ValueError, ValidationError) as e: # JSONDecodeError is a ValueError
+            self._reject(str(e).splitlines()[0])
+            return None
+        self._count += 1
+        self.ideas.append(idea)
+        IDEA_PARSE_ITEMS.labels("valid").inc()
+        return idea
+
+    def _reject(self, error: str):
+        self.malformed.append({"index": self._count, "error": error})
+        self._count += 1
+        IDEA_PARSE_ITEMS.labels("malformed").inc()
+
+
+def parse_ideas(text: str, model: Type[ParsedIdea] = ParsedIdea) -> Tuple[List[ParsedIdea], List[Dict[str, Any]]]:
+    """Parses a complete response. Returns (valid_ideas, malformed_items)."""
+    parser = IdeaStreamParser(model)
+    parser.feed(text)
+    return parser.ideas, parser.finish()
+
+
+async def request_ideas(
+    llm_client,
+    system_instruction: str,
+    prompt: str,
+    count: int,
+    exclude: Iterable[str] = (),
+) -> List[ParsedIdea]:
+    """
+    Asks for `count` more ideas (e.g. to replace malformed ones), avoiding the names in `exclude`.
+    Returns only the ones that validate.
+    """
+    names = [name for name in dict.fromkeys(exclude) if name]
+    instruction = f"{system_instruction} Return exactly {count} ideas."
+    if names:
+        instruction += f" Do not repeat these ideas: {', '.join(names)}."
+    schema = idea_array_schema(count, f"A list of exactly {count} unique startup ideas.")
+    text = await llm_client.generate(instruction, prompt, structured_config(schema))
+    ideas, _ = parse_ideas(text)
+    IDEA_PARSE_ITEMS.labels("repaired").inc(len(ideas[:count]))
+    return ideas[:count]
@@ -0,0 +1,194 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Dict, List, Literal, Set, Tuple
+
+from appwrite.id import ID
+from appwrite.query import Query
+from pydantic import BaseModel
+
+from .appwrite_service import DATABASE_ID, IDEAS_COLLECTION_ID
+from .async_db import AsyncDatabases
+from .blob_store import BLOB_INLINE_MAX_CHARS, get_blob_store
+from . import idea_events
+from .history_cache import history_cache
+
+# --- Configuration Constants ---
+IDEA_WRITE_CONCURRENCY = int(os.getenv("IDEA_WRITE_CONCURRENCY", "5"))
+# "partial": keep whatever was saved and report failures. "all_or_nothing": roll back on any failure.
+IDEA_WRITE_POLICY = os.getenv("IDEA_WRITE_POLICY", "partial")
+BULK_MAX_IDS = int(os.getenv("BULK_MAX_IDS", "100"))
+
+
+async def persist_ideas(
+    adb: AsyncDatabases,
+    ideas: List[Dict[str, Any]],
+    max_parallel: int = IDEA_WRITE_CONCURRENCY,
+    all_or_nothing: bool = IDEA_WRITE_POLICY == "all_or_nothing",
+) -> Tuple[List[dict], List[Dict[str, Any]]]:
+    """
+    Creates idea documents concurrently (at most `max_parallel` in flight).
+    Returns (saved_documents, failures) where each failure is {"index": i, "error": "..."}.
+    With all_or_nothing, any failure deletes the documents that did get written.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+    store = get_blob_store()
+
+    async def create(idea_data: Dict[str, Any]) -> dict:
+        async with semaphore:
+            idea_id = ID.unique() # generated client-side, so the body can be stored under it first
+            body = idea_data.get("result") or ""
+            offload = store is not None and len(body) > BLOB_INLINE_MAX_CHARS
+            if offload:
+                await store.put_text(idea_id, body)
+                idea_data = {**idea_data, "result": body[:BLOB_INLINE_MAX_CHARS], "body_ref": idea_id}
+            try:
+                doc = await adb.create_document(DATABASE_ID, IDEAS_COLLECTION_ID, idea_id, idea_data)
+            except Exception:
+                if offload:
+                    await asyncio.to_thread(store.delete, idea_id)
+                raise
+            if offload:
+                doc['result'] = body # callers and idea event listeners get the full text
+            return doc
+
+    results = await asyncio.gather(*[create(idea) for idea in ideas], return_exceptions=True)
+
+    saved, failed = [], []
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            failed.append({"index": index, "error": str(result)})
+        else:
+            saved.append(result)
+
+    if failed and saved and all_or_nothing:
+        await delete_ideas(adb, [doc['$id'] for doc in saved], max_parallel)
+        print(f"Rolled back {len(saved)} ideas after {len(failed)} failed writes.")
+        errors = {f["index"]: f["error"] for f in failed}
+        failed = [{"index": i, "error": errors.get(i, "rolled back")} for i in range(len(ideas))]
+        saved = []
+
+    # Keep each owner's derived caches/indexes current instead of invalidating them
+    by_owner: Dict[str, List[dict]] = {}
+    for doc in saved:
+        by_owner.setdefault(doc.get('owner_id'), []).append(doc)
+    for owner_id, docs in by_owner.items():
+        if owner_id:
+            idea_events.ideas_created(owner_id, docs)
+
+    return saved, failed
+
+
+async def delete_ideas(adb: AsyncDatabases, idea_ids: List[str], max_parallel: int = IDEA_WRITE_CONCURRENCY) -> List[str]:
+    """Deletes ideas (and any off-loaded bodies) concurrently; returns the ids that could not be deleted."""
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+    store = get_blob_store()
+
+    async def delete(idea_id: str):
+        async with semaphore:
+            await adb.delete_document(DATABASE_ID, IDEAS_COLLECTION_ID, idea_id)
+            if store is not None:
+                await asyncio.to_thread(store.delete, idea_id) # missing blob (inline body) is a no-op
+
+    results = await asyncio.gather(*[delete(i) for i in idea_ids], return_exceptions=True)
+    return [idea_id for idea_id, r in zip(idea_ids, results) if isinstance(r, Exception)]
+
+
+async def idea_body(doc: dict) -> str:
+    """The full `result` of an idea document, reading the blob store when the body was off-loaded."""
+    ref = doc.get('body_ref')
+    store = get_blob_store()
+    if ref and store is not None:
+        body = await store.get_text(ref)
+        if body is not None:
+            return body
+        print(f"Warning: body blob {ref} is missing; serving the inline preview")
+    return doc['result']
+
+
+async def update_ideas(
+    adb: AsyncDatabases, idea_ids: List[str], data: Dict[str, Any], max_parallel: int = IDEA_WRITE_CONCURRENCY
+) -> List[str]:
+    """Applies the same field values to every idea concurrently; returns the ids that could not be updated."""
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+
+    async def update(idea_id: str):
+        async with semaphore:
+            await adb.update_document(DATABASE_ID, IDEAS_COLLECTION_ID, idea_id, data)
+
+    results = await asyncio.gather(*[update(i) for i in idea_ids], return_exceptions=True)
+    return [idea_id for idea_id, r in zip(idea_ids, results) if isinstance(r, Exception)]
+
+
+async def iter_user_ideas(
+    adb: AsyncDatabases, user_id: str, fields: List[str], page_size: int = 500
+) -> AsyncIterator[List[dict]]:
+    """All of a user's ideas (projected to `fields`), one page at a time; for building per-user indexes."""
+    cursor = None
+    while True:
+        queries = [Query.equal("owner_id", user_id), Query.select(fields), Query.limit(page_size)]
+        if cursor:
+            queries.append(Query.cursor_after(cursor))
+        documents = (await adb.list_documents(DATABASE_ID, IDEAS_COLLECTION_ID, queries=queries))['documents']
+        if documents:
+            yield documents
+        if len(documents) < page_size:
+            return
+        cursor = documents[-1]['$id']
+
+
+async def owned_idea_ids(adb: AsyncDatabases, user_id: str, idea_ids: List[str]) -> Set[str]:
+    """
+    Which of `idea_ids` belong to `user_id`. Ids in the user's cached history window need no lookup;
+    the rest are resolved with a single owner-filtered query.
+    """
+    owned = history_cache.known_ids(user_id, idea_ids)
+    unknown = [idea_id for idea_id in dict.fromkeys(idea_ids) if idea_id not in owned]
+    if unknown:
+        result = await adb.list_documents(DATABASE_ID, IDEAS_COLLECTION_ID, queries=[
+            Query.equal("$id", unknown),
+            Query.equal("owner_id", user_id),
+            Query.select(["$id"]),
+            Query.limit(len(unknown)),
+        ])
+        owned.update(doc['$id'] for doc in result['documents'])
+    return owned
+
+
+# --- Pydantic Schemas ---
+
+class StarRequest(BaseModel):
+    starred: bool
+
+
+class BulkIdeaRequest(BaseModel):
+    action: Literal["star", "unstar", "delete"]
+    ids: List[str]
+
+
+# --- Bulk mutations ---
+
+async def apply_bulk_action(
+    adb: AsyncDatabases, user_id: str, action: str, idea_ids: List[str], max_parallel: int = IDEA_WRITE_CONCURRENCY
+) -> List[Dict[str, Any]]:
+    """
+    Runs one action over the user's ideas with at most `max_parallel` writes in flight.
+    Returns one {"id", "status"} per distinct id; status is "ok", "not_found" or "failed".
+    """
+    idea_ids = list(dict.fromkeys(idea_ids))
+    owned = await owned_idea_ids(adb, user_id, idea_ids)
+    targets = [idea_id for idea_id in idea_ids if idea_id in owned]
+
+    if action == "delete":
+        failed = set(await delete_ideas(adb, targets, max_parallel))
+        idea_events.ideas_deleted(user_id, [i for i in targets if i not in failed])
+    else:
+        starred = action == "star"
+        failed = set(await update_ideas(adb, targets, {"is_starred": starred}, max_parallel))
+        for idea_id in targets:
+            if idea_id not in failed:
+                idea_events.idea_updated(user_id, idea_id, {"is_starred": starred})
+
+    return [
+        {"id": idea_id, "status": "not_found" if idea_id not in owned else "failed" if idea_id in failed else "ok"}
+        for idea_id in idea_ids
+    ]
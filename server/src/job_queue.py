@@ -0,0 +1,522 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from .cache import CACHE_DIR
+
+# --- Configuration Constants ---
+# "sqlite" works across processes on one host with no extra services; "memory" is per-process only.
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "sqlite")
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(CACHE_DIR, "jobs.sqlite3"))
+# "inprocess": the API process also runs a worker. "external": only `python -m src.worker` runs jobs.
+JOB_WORKER_MODE = os.getenv("JOB_WORKER_MODE", "inprocess")
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "0.5"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "60"))
+# A running job whose worker died is handed out again after this long
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Live workers renew their leases this often, so only dead workers' jobs are re-leased
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(JOB_LEASE_SECONDS / 3)))
+JOB_DRAIN_TIMEOUT_SECONDS = float(os.getenv("JOB_DRAIN_TIMEOUT_SECONDS", "30"))
+
+
+class Job(BaseModel):
+    job_id: str
+    kind: str
+    payload: Dict[str, Any]
+    status: str = "queued" # queued -> running -> succeeded | failed (retries go back to queued)
+    attempts: int = 0
+    max_attempts: int = JOB_MAX_ATTEMPTS
+    idempotency_key: Optional[str] = None
+    owner_id: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    run_after: float = 0.0
+
+
+class NonRetryableJobError(Exception):
+    """Raised by a handler when retrying cannot help (bad input, insufficient credits, ...)."""
+
+
+class LeaseLost(Exception):
+    """Raised by JobLease.check() once the job has been re-leased to another attempt."""
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter between attempts."""
+    def __init__(self, base: float = JOB_RETRY_BASE_SECONDS, maximum: float = JOB_RETRY_MAX_SECONDS):
+        self.base = base
+        self.maximum = maximum
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.maximum, self.base * (2 ** max(0, attempt - 1))))
+
+
+# --- Queue Backends ---
+
+class QueueBackend:
+    """
+    Storage for jobs. Implementations must make claim() atomic across all workers they serve.
+
+    A claim's attempt number is its lease token: renew(), complete() and fail() only apply while the
+    job is still running under that attempt, and return False once it has been re-leased, so a worker
+    that overran its lease can't overwrite the newer attempt.
+    """
+    def enqueue(self, job: Job) -> Job:
+        """Stores the job; if its idempotency key was already used by the same owner, returns that job."""
+        raise NotImplementedError
+
+    def claim(self) -> Optional[Job]:
+        raise NotImplementedError
+
+    def renew(self, job_id: str, attempt: int) -> bool:
+        """Extends the lease of a running attempt."""
+        raise NotImplementedError
+
+    def save_progress(self, job_id: str, attempt: int, progress: Dict[str, Any]) -> bool:
+        """Stores a running attempt's partial result in `result` (and extends its lease)."""
+        raise NotImplementedError
+
+    def complete(self, job_id: str, attempt: int, result: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def fail(self, job_id: str, attempt: int, error: str, retry_at: Optional[float]) -> bool:
+        """Marks the attempt failed; with retry_at the job is re-queued, otherwise it is final."""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+class MemoryQueueBackend(QueueBackend):
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, job: Job) -> Job:
+        with self._lock:
+            if job.idempotency_key:
+                for existing in self._jobs.values():
+                    if existing.idempotency_key == job.idempotency_key and existing.owner_id == job.owner_id:
+                        return existing
+            self._jobs[job.job_id] = job
+            return job
+
+    def claim(self) -> Optional[Job]:
+        now = time.time()
+        with self._lock:
+            for job in sorted(self._jobs.values(), key=lambda j: j.created_at):
+                lease_expired = job.status == "running" and job.updated_at + JOB_LEASE_SECONDS < now
+                if (job.status == "queued" and job.run_after <= now) or lease_expired:
+                    job.status, job.attempts, job.updated_at = "running", job.attempts + 1, now
+                    return job.model_copy()
+        return None
+
+    def _leased(self, job_id: str, attempt: int) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        return job if job is not None and job.status == "running" and job.attempts == attempt else None
+
+    def renew(self, job_id: str, attempt: int) -> bool:
+        with self._lock:
+            job = self._leased(job_id, attempt)
+            if job is not None:
+                job.updated_at = time.time()
+            return job is not None
+
+    def save_progress(self, job_id: str, attempt: int, progress: Dict[str, Any]) -> bool:
+        with self._lock:
+            job = self._leased(job_id, attempt)
+            if job is not None:
+                job.result, job.updated_at = progress, time.time()
+            return job is not None
+
+    def complete(self, job_id: str, attempt: int, result: Dict[str, Any]) -> bool:
+        with self._lock:
+            job = self._leased(job_id, attempt)
+            if job is not None:
+                job.status, job.result, job.error, job.updated_at = "succeeded", result, None, time.time()
+            return job is not None
+
+    def fail(self, job_id: str, attempt: int, error: str, retry_at: Optional[float]) -> bool:
+        with self._lock:
+            job = self._leased(job_id, attempt)
+            if job is not None:
+                job.error, job.updated_at = error, time.time()
+                job.status = "queued" if retry_at is not None else "failed"
+                job.run_after = retry_at or 0.0
+            return job is not None
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy() if job else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+
+class SQLiteQueueBackend(QueueBackend):
+    """
+    Durable queue in a local SQLite file (WAL mode). Claims use BEGIN IMMEDIATE, so several
+    worker processes on the same host can share one queue safely.
+    """
+    def __init__(self, path: str = JOB_QUEUE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    idempotency_key TEXT,
+                    owner_id TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    run_after REAL NOT NULL DEFAULT 0
+                )
+            """)
+            self._conn.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS jobs_idempotency
+                ON jobs (IFNULL(owner_id, ''), idempotency_key) WHERE idempotency_key IS NOT NULL
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after, created_at)")
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Job:
+        data = dict(row)
+        data["payload"] = json.loads(data["payload"])
+        data["result"] = json.loads(data["result"]) if data["result"] else None
+        return Job(**data)
+
+    def enqueue(self, job: Job) -> Job:
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO jobs (job_id, kind, payload, status, attempts, max_attempts, idempotency_key,"
+                    " owner_id, created_at, updated_at, run_after) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job.job_id, job.kind, json.dumps(job.payload), job.status, job.attempts, job.max_attempts,
+                     job.idempotency_key, job.owner_id, job.created_at, job.updated_at, job.run_after),
+                )
+                return job
+            except sqlite3.IntegrityError:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE IFNULL(owner_id, '') = IFNULL(?, '') AND idempotency_key = ?",
+                    (job.owner_id, job.idempotency_key),
+                ).fetchone()
+                return self._row_to_job(row)
+
+    def claim(self) -> Optional[Job]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE (status = 'queued' AND run_after <= ?)"
+                    " OR (status = 'running' AND updated_at < ?) ORDER BY created_at LIMIT 1",
+                    (now, now - JOB_LEASE_SECONDS),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                    (now, row["job_id"]),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        job = self._row_to_job(row)
+        job.status, job.attempts, job.updated_at = "running", job.attempts + 1, now
+        return job
+
+    # Every write by a worker is fenced on its attempt number (see QueueBackend)
+    _LEASED = " WHERE job_id = ? AND attempts = ? AND status = 'running'"
+
+    def renew(self, job_id: str, attempt: int) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("UPDATE jobs SET updated_at = ?" + self._LEASED, (time.time(), job_id, attempt))
+        return cursor.rowcount == 1
+
+    def save_progress(self, job_id: str, attempt: int, progress: Dict[str, Any]) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET result = ?, updated_at = ?" + self._LEASED,
+                (json.dumps(progress), time.time(), job_id, attempt),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, attempt: int, result: Dict[str, Any]) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, updated_at = ?" + self._LEASED,
+                (json.dumps(result), time.time(), job_id, attempt),
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: str, attempt: int, error: str, retry_at: Optional[float]) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, run_after = ?, updated_at = ?" + self._LEASED,
+                ("queued" if retry_at is not None else "failed", error, retry_at or 0.0, time.time(), job_id, attempt),
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+# --- Handlers ---
+
+class JobLease:
+    """
+    A running attempt's hold on its job, passed to handlers. Retries of a job share its job_id, so
+    handlers key their side effects on it; check() right before a side effect stops an attempt
+    that has already been re-leased. Handlers that save progress get it back in `progress` on retry.
+    """
+    def __init__(self, backend: QueueBackend, job: Job):
+        self.backend = backend
+        self.job_id = job.job_id
+        self.attempt = job.attempts
+        self.progress = job.result # saved by an earlier attempt, if any
+        self.lost = False
+
+    async def _fenced(self, write, *args):
+        if not self.lost and not await asyncio.to_thread(write, self.job_id, self.attempt, *args):
+            self.lost = True
+        if self.lost:
+            raise LeaseLost(f"Job {self.job_id} attempt {self.attempt} was re-leased")
+
+    async def check(self):
+        """Renews the lease, or raises LeaseLost if another attempt owns the job now."""
+        await self._fenced(self.backend.renew)
+
+    async def save_progress(self, progress: Dict[str, Any]):
+        """Stores a partial result for pollers and retries; raises LeaseLost like check()."""
+        await self._fenced(self.backend.save_progress, progress)
+
+
+JobHandler = Callable[[Dict[str, Any], JobLease], Awaitable[Dict[str, Any]]]
+_handlers: Dict[str, JobHandler] = {}
+
+
+def register_job_handler(kind: str):
+    """Decorator: `@register_job_handler("generate")` on an `async def handler(payload, lease) -> dict`."""
+    def decorator(fn: JobHandler) -> JobHandler:
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+# --- Queue facade ---
+_backend: Optional[QueueBackend] = None
+
+
+def _open_sqlite_backend(path: str = JOB_QUEUE_PATH) -> QueueBackend:
+    """
+    The SQLite queue, or a per-process memory queue when `path` can't be used (e.g. a read-only or
+    missing disk on serverless hosts). The queue must never stop the app from starting.
+    """
+    try:
+        return SQLiteQueueBackend(path)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: job queue path {path!r} is not usable ({e}). Jobs are kept in memory, per process.")
+        return MemoryQueueBackend()
+
+
+def get_queue_backend() -> QueueBackend:
+    global _backend
+    if _backend is None:
+        _backend = _open_sqlite_backend() if JOB_QUEUE_BACKEND == "sqlite" else MemoryQueueBackend()
+    return _backend
+
+
+async def enqueue_job(
+    kind: str,
+    payload: Dict[str, Any],
+    idempotency_key: Optional[str] = None,
+    owner_id: Optional[str] = None,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+) -> Job:
+    now = time.time()
+    job = Job(
+        job_id=str(uuid.uuid4()),
+        kind=kind,
+        payload=payload,
+        idempotency_key=idempotency_key,
+        owner_id=owner_id,
+        max_attempts=max_attempts,
+        created_at=now,
+        updated_at=now,
+    )
+    return await asyncio.to_thread(get_queue_backend().enqueue, job)
+
+
+async def get_job(job_id: str) -> Optional[Job]:
+    return await asyncio.to_thread(get_queue_backend().get, job_id)
+
+
+# --- Worker ---
+
+class JobWorker:
+    """Polls the queue and runs up to `concurrency` jobs at once. drain() stops claiming and waits."""
+    def __init__(
+        self,
+        backend: Optional[QueueBackend] = None,
+        concurrency: int = JOB_WORKER_CONCURRENCY,
+        poll_interval: float = JOB_POLL_INTERVAL_SECONDS,
+        retry_policy: Optional[RetryPolicy] = None,
+        heartbeat_interval: float = JOB_HEARTBEAT_SECONDS,
+    ):
+        self.backend = backend or get_queue_backend()
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._stopping = asyncio.Event()
+        self._in_flight: List[asyncio.Task] = []
+        self._loop_task: Optional[asyncio.Task] = None
+        self.processed = 0
+        self.failed = 0
+        self.leases_lost = 0
+
+    async def _heartbeat(self, lease: JobLease, runner: asyncio.Task):
+        """Renews the lease while the handler runs; cancels it if the job was re-leased meanwhile."""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await lease.check()
+            except LeaseLost:
+                runner.cancel()
+                return
+            except Exception as e:
+                print(f"Job {lease.job_id} lease renewal failed: {e}")
+
+    async def _execute(self, job: Job):
+        handler = _handlers.get(job.kind)
+        lease = JobLease(self.backend, job)
+        heartbeat = asyncio.create_task(self._heartbeat(lease, asyncio.current_task()))
+        try:
+            error: Optional[Exception] = None
+            try:
+                if handler is None:
+                    raise NonRetryableJobError(f"No handler registered for job kind '{job.kind}'")
+                result = await handler(job.payload, lease)
+            except Exception as e:
+                error = e
+
+            if lease.lost:
+                pass # the handler stopped at a lease check; the current attempt owns the outcome
+            elif error is None:
+                applied = await asyncio.to_thread(self.backend.complete, job.job_id, job.attempts, result)
+                if applied:
+                    self.processed += 1
+                lease.lost = not applied
+            else:
+                retryable = not isinstance(error, NonRetryableJobError) and job.attempts < job.max_attempts
+                retry_at = time.time() + self.retry_policy.delay(job.attempts) if retryable else None
+                applied = await asyncio.to_thread(self.backend.fail, job.job_id, job.attempts, str(error), retry_at)
+                print(f"Job {job.job_id} ({job.kind}) attempt {job.attempts} failed: {error}")
+                if applied and not retryable:
+                    self.failed += 1
+                lease.lost = not applied
+        except asyncio.CancelledError:
+            if not lease.lost:
+                raise # drain() timeout: the lease expires and the job is handed out again
+        finally:
+            heartbeat.cancel()
+        if lease.lost:
+            self.leases_lost += 1
+            print(f"Job {job.job_id} ({job.kind}) attempt {job.attempts} lost its lease; its outcome was discarded")
+
+    async def run(self):
+        while not self._stopping.is_set():
+            self._in_flight = [t for t in self._in_flight if not t.done()]
+            job = None
+            if len(self._in_flight) < self.concurrency:
+                job = await asyncio.to_thread(self.backend.claim)
+            if job is not None:
+                self._in_flight.append(asyncio.create_task(self._execute(job)))
+                continue
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        self._loop_task = asyncio.create_task(self.run())
+
+    async def drain(self, timeout: float = JOB_DRAIN_TIMEOUT_SECONDS):
+        """Graceful shutdown: stop claiming, let running jobs finish (anything left is re-leased later)."""
+        self._stopping.set()
+        if self._loop_task is not None:
+            await self._loop_task
+        if self._in_flight:
+            done, pending = await asyncio.wait(self._in_flight, timeout=timeout)
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len([t for t in self._in_flight if not t.done()]),
+            "processed": self.processed,
+            "failed": self.failed,
+            "leases_lost": self.leases_lost,
+            "queue": self.backend.counts(),
+        }
+
+
+_worker: Optional[JobWorker] = None
+
+
+async def start_inprocess_worker():
+    """Startup hook: runs a worker inside the API process unless JOB_WORKER_MODE=external."""
+    global _worker
+    if JOB_WORKER_MODE == "inprocess" and _worker is None:
+        _worker = JobWorker()
+        _worker.start()
+
+
+async def drain_inprocess_worker():
+    """Shutdown hook: graceful drain of the in-process worker."""
+    if _worker is not None:
+        await _worker.drain()
+
+
+def worker_stats() -> Optional[Dict[str, Any]]:
+    return _worker.stats() if _worker is not None else None
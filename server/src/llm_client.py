@@ -0,0 +1,263 @@
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from .admission import llm_admission
+from .metrics import LLM_FIRST_CHUNK_SECONDS, observe_llm_call, observe_llm_usage
+
+# --- Configuration Constants ---
+# GEMINI_BASE_URL can point at a local stub server so tests never hit Google.
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_READ_TIMEOUT_SECONDS = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+
+# 429 = quota/rate limit, 5xx = transient upstream failures. Everything else is final.
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when the Gemini API cannot produce a usable response."""
+
+
+class GeminiClient:
+    """
+    Async Gemini REST client backed by one pooled httpx.AsyncClient.
+    Connections are kept alive between calls, so only the first request pays for the TLS handshake.
+    """
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = GEMINI_BASE_URL,
+        model: str = GEMINI_MODEL,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        max_keepalive_connections: int = LLM_MAX_KEEPALIVE_CONNECTIONS,
+        connect_timeout: float = LLM_CONNECT_TIMEOUT_SECONDS,
+        read_timeout: float = LLM_READ_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.max_retries = max_retries
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._transport = transport  # e.g. httpx.MockTransport for tests
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _get_http(self) -> httpx.AsyncClient:
+        # Created lazily so the client binds to the running event loop, not the import-time one.
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                limits=self._limits,
+                timeout=self._timeout,
+                transport=self._transport,
+                headers={"Content-Type": "application/json"},
+            )
+        return self._http
+
+    def _url(self, method: str) -> str:
+        return f"{self.base_url}/models/{self.model}:{method}"
+
+    def build_payload(
+        self,
+        system_instruction: str,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Builds the generateContent request body."""
+        payload: Dict[str, Any] = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        }
+        if system_instruction:
+            payload["systemInstruction"] = {"parts": [{"text": system_instruction}]}
+        if generation_config:
+            payload["generationConfig"] = generation_config
+        return payload
+
+    def _backoff_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when Gemini sends one."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), LLM_BACKOFF_MAX_SECONDS)
+                except ValueError:
+                    pass
+        ceiling = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    async def _post(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POSTs with retries on 429/5xx and transport errors."""
+        http = self._get_http()
+        headers = {"x-goog-api-key": self.api_key or ""}
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = await http.post(url, json=payload, headers=headers)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                last_error = LLMError(f"Gemini returned HTTP {response.status_code}")
+            except httpx.HTTPStatusError as e:
+                raise LLMError(f"Gemini request rejected: HTTP {e.response.status_code}") from e
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                last_error = e
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff_delay(attempt, response))
+
+        raise LLMError(f"Gemini request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    @staticmethod
+    def extract_text(response_data: Dict[str, Any]) -> str:
+        """Pulls the generated text out of the 'candidates' structure."""
+        try:
+            parts = response_data["candidates"][0]["content"]["parts"]
+        except (KeyError, IndexError, TypeError) as e:
+            raise LLMError("Unexpected response structure returned by Gemini.") from e
+        return "".join(part.get("text", "") for part in parts)
+
+    async def generate(
+        self,
+        system_instruction: str,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Runs a single generateContent call and returns the text of the first candidate."""
+        if not self.api_key:
+            raise LLMError("GEMINI_API_KEY is not set.")
+        payload = self.build_payload(system_instruction, prompt, generation_config)
+        async with llm_admission.slot():
+            start = time.perf_counter()
+            failed = True
+            try:
+                response_data = await self._post(self._url("generateContent"), payload)
+                failed = False
+            finally:
+                observe_llm_call("generate", time.perf_counter() - start, failed)
+        observe_llm_usage(response_data)
+        return self.extract_text(response_data)
+
+    async def stream_generate(
+        self,
+        system_instruction: str,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Runs streamGenerateContent (SSE) and yields text chunks as Gemini produces them.
+        Connection errors and 429/5xx are retried only until the first chunk has been yielded.
+        The admission slot is held until the stream ends.
+        """
+        if not self.api_key:
+            raise LLMError("GEMINI_API_KEY is not set.")
+        async with llm_admission.slot():
+            start = time.perf_counter()
+            failed = True
+            first_chunk = True
+            try:
+                async for text in self._stream(system_instruction, prompt, generation_config):
+                    if first_chunk:
+                        LLM_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - start)
+                        first_chunk = False
+                    yield text
+                failed = False
+            finally:
+                observe_llm_call("stream", time.perf_counter() - start, failed)
+
+    async def _stream(
+        self,
+        system_instruction: str,
+        prompt: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        http = self._get_http()
+        url = self._url("streamGenerateContent") + "?alt=sse"
+        payload = self.build_payload(system_instruction, prompt, generation_config)
+        headers = {"x-goog-api-key": self.api_key}
+        last_error: Optional[Exception] = None
+        yielded = False
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                async with http.stream("POST", url, json=payload, headers=headers) as response:
+                    if response.status_code in RETRYABLE_STATUS_CODES:
+                        last_error = LLMError(f"Gemini returned HTTP {response.status_code}")
+                    elif response.status_code >= 400:
+                        raise LLMError(f"Gemini request rejected: HTTP {response.status_code}")
+                    else:
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            try:
+                                chunk = json.loads(line[len("data:"):].strip())
+                            except json.JSONDecodeError as e:
+                                raise LLMError("Malformed stream chunk returned by Gemini.") from e
+                            candidates = chunk.get("candidates") or []
+                            if candidates and candidates[0].get("finishReason"):
+                                observe_llm_usage(chunk) # usage is cumulative; count it once, on the final chunk
+                            text = self.extract_text(chunk) if candidates else ""
+                            if text:
+                                yielded = True
+                                yield text
+                        return
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if yielded:
+                    # Part of the answer already went out; a retry would duplicate it
+                    raise LLMError(f"Gemini stream interrupted: {e}") from e
+                last_error = e
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff_delay(attempt, response))
+
+        raise LLMError(f"Gemini stream failed after {self.max_retries + 1} attempts: {last_error}")
+
+    async def aclose(self):
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+
+
+# --- Process-wide client ---
+_llm_client: Optional[GeminiClient] = None
+
+
+def get_llm_client() -> GeminiClient:
+    """Returns the shared client, creating it on first use."""
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = GeminiClient()
+    return _llm_client
+
+
+def set_llm_client(client: GeminiClient):
+    """Swaps the shared client, e.g. for one pointed at a local stub server."""
+    global _llm_client
+    _llm_client = client
+
+
+async def close_llm_client():
+    """Shutdown hook: closes pooled connections."""
+    if _llm_client is not None:
+        await _llm_client.aclose()
@@ -0,0 +1,157 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# --- Configuration Constants ---
+# Adds a `Server-Timing` header with the per-stage breakdown to every response (visible in browser devtools)
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING", "0") == "1"
+
+# Latency buckets (seconds) spanning cache hits up to slow LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# --- Metric Definitions ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "propelai_http_request_seconds", "HTTP request latency (until response headers).",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_STAGE_SECONDS = Histogram(
+    "propelai_request_stage_seconds", "Time spent in each stage of a request.",
+    ["route", "stage"], buckets=LATENCY_BUCKETS,
+)
+APPWRITE_CALL_SECONDS = Histogram(
+    "propelai_appwrite_call_seconds", "Appwrite SDK call latency, including thread-pool wait.",
+    ["method", "outcome"], buckets=LATENCY_BUCKETS,
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "propelai_llm_request_seconds", "Gemini call latency, including retries.",
+    ["method", "outcome"], buckets=LATENCY_BUCKETS,
+)
+LLM_FIRST_CHUNK_SECONDS = Histogram(
+    "propelai_llm_first_chunk_seconds", "Time until the first streamed Gemini chunk.",
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "propelai_llm_tokens", "Gemini tokens reported in usageMetadata.", ["kind"],
+)
+IDEA_PARSE_ITEMS = Counter(
+    "propelai_idea_parse_items", "Structured ideas parsed from Gemini output.", ["outcome"], # valid | malformed | repaired
+)
+NLP_STAGE_SECONDS = Histogram(
+    "propelai_nlp_stage_seconds", "Preprocessing stage time (worker CPU time; `total` is wall-clock).",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+
+# Request-scoped state: {"scope": ASGI scope, "stages": {stage: seconds}}, set by MetricsMiddleware
+_request_state: ContextVar[Optional[Dict[str, Any]]] = ContextVar("propelai_request_state", default=None)
+
+# Gemini usageMetadata field -> token kind label
+_USAGE_FIELDS = {
+    "promptTokenCount": "prompt",
+    "candidatesTokenCount": "completion",
+    "thoughtsTokenCount": "thoughts",
+    "totalTokenCount": "total",
+}
+
+
+def _route_label(scope: Optional[Dict[str, Any]]) -> str:
+    """The matched route template (e.g. /api/ideas/{idea_id}), so ids don't explode label cardinality."""
+    route = scope.get("route") if scope else None
+    return getattr(route, "path", None) or "unmatched"
+
+
+@contextmanager
+def stage(name: str):
+    """Times a block as one stage of the current request. Safe to use across awaits."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        state = _request_state.get()
+        REQUEST_STAGE_SECONDS.labels(_route_label(state["scope"]) if state else "background", name).observe(elapsed)
+        if state is not None:
+            stages = state["stages"]
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def observe_appwrite_call(method: str, elapsed: float, failed: bool):
+    APPWRITE_CALL_SECONDS.labels(method, "error" if failed else "ok").observe(elapsed)
+
+
+def observe_llm_call(method: str, elapsed: float, failed: bool):
+    LLM_REQUEST_SECONDS.labels(method, "error" if failed else "ok").observe(elapsed)
+
+
+def observe_llm_usage(response_data: Dict[str, Any]):
+    usage = response_data.get("usageMetadata") or {}
+    for field, kind in _USAGE_FIELDS.items():
+        if usage.get(field):
+            LLM_TOKENS.labels(kind).inc(usage[field])
+
+
+def observe_nlp_timings(timings: Dict[str, float]):
+    """Records PreprocessEngine timings (`<stage>_ms` keys)."""
+    for key, ms in timings.items():
+        NLP_STAGE_SECONDS.labels(key[:-3] if key.endswith("_ms") else key).observe(ms / 1000)
+
+
+def register_gauge(name: str, documentation: str, fn: Callable[[], float]):
+    """Exposes a value that is read at scrape time (e.g. queue depth)."""
+    Gauge(name, documentation).set_function(fn)
+
+
+def render_metrics():
+    """(body, content type) for the /metrics endpoint."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def _server_timing(stages: Dict[str, float], total: float) -> bytes:
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (streaming-safe): opens the request-scoped stage timer, records request latency
+    and, with SERVER_TIMING=1, adds a `Server-Timing` header built from the stages timed so far.
+    """
+    def __init__(self, app, server_timing: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = {"scope": scope, "stages": {}}
+        token = _request_state.set(state)
+        start = time.perf_counter()
+        started = False
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                elapsed = time.perf_counter() - start
+                HTTP_REQUEST_SECONDS.labels(scope["method"], _route_label(scope), str(message["status"])).observe(elapsed)
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(state["stages"], elapsed)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not started:
+                HTTP_REQUEST_SECONDS.labels(scope["method"], _route_label(scope), "500").observe(time.perf_counter() - start)
+            raise
+        finally:
+            _request_state.reset(token)
@@ -0,0 +1,120 @@
+"""
+Versioned, cached schema migration.
+
+Applying the schema (src/migrations.py) takes a dozen or more Appwrite calls. The applied schema version
+is recorded in Appwrite (Meta/schema) and in a local marker file, so a warm boot costs zero calls and a
+fresh pod costs one. Run it out-of-band before a deploy with:
+
+    python -m src.migrate [--force]      (run from server/)
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from appwrite.exception import AppwriteException
+
+from .appwrite_service import DATABASE_ID, META_COLLECTION_ID, databases
+from .cache import CACHE_DIR
+from .migrations import SCHEMA_VERSION, apply_schema
+
+# --- Configuration Constants ---
+SCHEMA_DOCUMENT_ID = "schema"
+# "startup": migrate before serving (fast once cached), "background": serve while it runs, "skip": out-of-band only
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "startup")
+SCHEMA_MARKER_PATH = os.getenv("SCHEMA_MARKER_PATH", os.path.join(CACHE_DIR, "schema_version.json"))
+
+
+def _target() -> str:
+    """Identifies the Appwrite database the marker applies to."""
+    return f"{os.getenv('APPWRITE_ENDPOINT')}|{os.getenv('APPWRITE_PROJECT_ID')}|{DATABASE_ID}"
+
+
+def read_marker() -> Optional[int]:
+    try:
+        with open(SCHEMA_MARKER_PATH) as f:
+            marker = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return marker.get("version") if marker.get("target") == _target() else None
+
+
+def write_marker(version: int):
+    try:
+        os.makedirs(os.path.dirname(SCHEMA_MARKER_PATH), exist_ok=True)
+        with open(SCHEMA_MARKER_PATH, "w") as f:
+            json.dump({"target": _target(), "version": version}, f)
+    except OSError as e:
+        print(f"Warning: could not write schema marker: {e}")
+
+
+def remote_schema_version() -> Optional[int]:
+    """One Appwrite call: the version recorded by the last successful migration, if any."""
+    try:
+        return databases.get_document(DATABASE_ID, META_COLLECTION_ID, SCHEMA_DOCUMENT_ID).get("version")
+    except AppwriteException:
+        return None
+
+
+def record_schema_version(version: int):
+    """Upserts Meta/schema (the Meta collection is part of the declared schema)."""
+    try:
+        databases.update_document(DATABASE_ID, META_COLLECTION_ID, SCHEMA_DOCUMENT_ID, {"version": version})
+    except AppwriteException:
+        databases.create_document(DATABASE_ID, META_COLLECTION_ID, SCHEMA_DOCUMENT_ID, {"version": version})
+
+
+def ensure_schema(force: bool = False) -> str:
+    """
+    Brings the schema up to SCHEMA_VERSION. Returns "cached" (local marker, no calls),
+    "current" (remote version already applied) or "migrated".
+    """
+    if not force:
+        if (read_marker() or 0) >= SCHEMA_VERSION:
+            return "cached"
+        if (remote_schema_version() or 0) >= SCHEMA_VERSION:
+            write_marker(SCHEMA_VERSION)
+            return "current"
+
+    apply_schema(databases)
+    record_schema_version(SCHEMA_VERSION)
+    write_marker(SCHEMA_VERSION)
+    return "migrated"
+
+
+_migration_task: Optional[asyncio.Task] = None
+
+
+async def _run_migration():
+    start = time.perf_counter()
+    try:
+        outcome = await asyncio.to_thread(ensure_schema)
+        print(f"Schema v{SCHEMA_VERSION}: {outcome} in {(time.perf_counter() - start) * 1000:.0f}ms")
+    except Exception as e:
+        # Idempotent: the next boot (or `python -m src.migrate`) retries
+        print(f"Schema migration failed: {e}")
+
+
+async def run_startup_migrations():
+    """Startup hook honouring RUN_MIGRATIONS."""
+    global _migration_task
+    if RUN_MIGRATIONS == "skip":
+        return
+    if RUN_MIGRATIONS == "background":
+        if _migration_task is None:
+            _migration_task = asyncio.create_task(_run_migration())
+        return
+    await _run_migration()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the Appwrite schema")
+    parser.add_argument("--force", action="store_true", help="Re-run even if the recorded version is current")
+    args = parser.parse_args()
+    print(f"Schema v{SCHEMA_VERSION}: {ensure_schema(force=args.force)}")
@@ -0,0 +1,211 @@
+"""
+Declarative Appwrite schema: collections, attributes and indexes.
+
+apply_schema() diffs SCHEMA against what exists and creates only what is missing, so it is safe to run
+repeatedly. Existing attributes are never altered or dropped; differences are reported instead.
+Bump SCHEMA_VERSION whenever SCHEMA changes so cached deployments (see src/migrate.py) pick it up.
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from appwrite.exception import AppwriteException
+from appwrite.enums.order_by import OrderBy
+
+try:
+    from appwrite.enums.databases_index_type import DatabasesIndexType as IndexType
+except ImportError:  # SDKs before the TablesDB split
+    from appwrite.enums.index_type import IndexType
+
+from .appwrite_service import (
+    DATABASE_ID, IDEAS_COLLECTION_ID, META_COLLECTION_ID, USERS_COLLECTION_ID, get_db_client
+)
+
+# --- Configuration Constants ---
+SCHEMA_VERSION = 5
+# Appwrite builds attributes and indexes asynchronously; how long to wait for them to become available
+SCHEMA_WAIT_SECONDS = float(os.getenv("SCHEMA_WAIT_SECONDS", "120"))
+SCHEMA_POLL_SECONDS = 0.5
+
+
+def _as_dict(response: Any) -> Dict[str, Any]:
+    """Newer SDKs return pydantic models, older ones plain dicts."""
+    return response.to_dict() if hasattr(response, "to_dict") else response
+
+
+class Attribute:
+    """One collection attribute. `kind` is string, integer, boolean or datetime."""
+    def __init__(self, key: str, kind: str, required: bool = False, size: Optional[int] = None, default: Any = None):
+        self.key = key
+        self.kind = kind
+        self.required = required
+        self.size = size
+        # Appwrite rejects defaults on required attributes
+        self.default = None if required else default
+
+    def create(self, db, database_id: str, collection_id: str):
+        if self.kind == "string":
+            db.create_string_attribute(database_id, collection_id, self.key, self.size, self.required, default=self.default)
+        elif self.kind == "integer":
+            db.create_integer_attribute(database_id, collection_id, self.key, self.required, default=self.default)
+        elif self.kind == "boolean":
+            db.create_boolean_attribute(database_id, collection_id, self.key, self.required, default=self.default)
+        elif self.kind == "datetime":
+            db.create_datetime_attribute(database_id, collection_id, self.key, self.required, default=self.default)
+        else:
+            raise ValueError(f"Unsupported attribute type '{self.kind}' for '{self.key}'")
+
+    def drift(self, existing: Dict[str, Any]) -> Optional[str]:
+        """Describes how an existing attribute differs from this declaration, if it does."""
+        differences = []
+        if existing.get("type") != self.kind:
+            differences.append(f"type {existing.get('type')} != {self.kind}")
+        if existing.get("required") != self.required:
+            differences.append(f"required {existing.get('required')} != {self.required}")
+        if self.size is not None and existing.get("size") not in (None, self.size):
+            differences.append(f"size {existing.get('size')} != {self.size}")
+        return ", ".join(differences) or None
+
+
+class Index:
+    """A key, unique or fulltext index over one or more attributes."""
+    def __init__(self, key: str, kind: str, attributes: List[str], orders: Optional[List[str]] = None):
+        self.key = key
+        self.kind = kind
+        self.attributes = attributes
+        self.orders = orders
+
+    def create(self, db, database_id: str, collection_id: str):
+        orders = [OrderBy(order) for order in self.orders] if self.orders else None
+        db.create_index(database_id, collection_id, self.key, IndexType(self.kind), self.attributes, orders=orders)
+
+
+class Collection:
+    def __init__(self, collection_id: str, name: str, attributes: List[Attribute], indexes: Optional[List[Index]] = None):
+        self.collection_id = collection_id
+        self.name = name
+        self.attributes = attributes
+        self.indexes = indexes or []
+
+
+# --- Schema ---
+
+SCHEMA: List[Collection] = [
+    Collection(USERS_COLLECTION_ID, "Users", [
+        Attribute("email", "string", required=True, size=255),
+        Attribute("full_name", "string", required=True, size=255),
+        Attribute("hashed_password", "string", required=True, size=255),
+        Attribute("subscription_tier", "string", size=50, default="free"),
+        Attribute("idea_credits", "integer", default=5),
+        Attribute("is_active", "boolean", default=True),
+    ], indexes=[
+        # Login and signup look users up by email
+        Index("email_unique", "unique", ["email"]),
+    ]),
+    Collection(IDEAS_COLLECTION_ID, "Ideas", [
+        Attribute("owner_id", "string", required=True, size=255),
+        Attribute("name", "string", required=True, size=255),
+        Attribute("problem", "string", required=True, size=5000),
+        Attribute("result", "string", required=True, size=5000),
+        Attribute("solution", "string", size=5000), # v3: structured output; older ideas only have `result`
+        Attribute("body_ref", "string", size=64), # v4: full `result` lives in the blob store; `result` is a preview
+        Attribute("job_id", "string", size=64), # v5: the queued job that stored it; retries return these ideas
+        Attribute("is_starred", "boolean", default=False),
+        Attribute("created_at", "datetime"),
+    ], indexes=[
+        # History: one owner's ideas, newest first
+        Index("owner_created", "key", ["owner_id", "created_at"], orders=["asc", "desc"]),
+        # A retried generation job looks up what an earlier attempt stored
+        Index("owner_job", "key", ["owner_id", "job_id"]),
+    ]),
+    Collection(META_COLLECTION_ID, "Meta", [
+        Attribute("version", "integer", required=True),
+    ]),
+]
+
+
+# --- Apply ---
+
+def _wait_until_available(fetch, keys: List[str], what: str, wait_seconds: float):
+    """Polls `fetch()` (a list of attribute/index dicts) until every key in `keys` is available."""
+    deadline = time.monotonic() + wait_seconds
+    while True:
+        statuses = {item["key"]: item for item in fetch() if item["key"] in keys}
+        failed = [f"{key} ({item.get('error') or item.get('status')})" for key, item in statuses.items()
+                  if item.get("status") in ("failed", "stuck")]
+        if failed:
+            raise RuntimeError(f"{what} failed: {', '.join(failed)}")
+        pending = [key for key in keys if statuses.get(key, {}).get("status") != "available"]
+        if not pending:
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{what} still processing after {wait_seconds:.0f}s: {', '.join(pending)}")
+        time.sleep(SCHEMA_POLL_SECONDS)
+
+
+def _ensure_database(db, database_id: str, report: Dict[str, List[str]]):
+    try:
+        db.get(database_id)
+    except AppwriteException:
+        db.create(database_id, "PropelAI Database")
+        report["created"].append(f"database {database_id}")
+
+
+def _ensure_collection(db, database_id: str, collection: Collection, report: Dict[str, List[str]], wait_seconds: float):
+    cid = collection.collection_id
+    try:
+        db.get_collection(database_id, cid)
+    except AppwriteException:
+        db.create_collection(database_id, cid, collection.name)
+        report["created"].append(f"collection {cid}")
+
+    def list_attributes():
+        return _as_dict(db.list_attributes(database_id, cid))["attributes"]
+
+    existing = {item["key"]: item for item in list_attributes()}
+    for attribute in collection.attributes:
+        if attribute.key in existing:
+            drift = attribute.drift(existing[attribute.key])
+            if drift:
+                report["drift"].append(f"{cid}.{attribute.key}: {drift}")
+            continue
+        attribute.create(db, database_id, cid)
+        report["created"].append(f"attribute {cid}.{attribute.key}")
+    # Indexes (and writes) can only use attributes once Appwrite has finished building them
+    _wait_until_available(list_attributes, [a.key for a in collection.attributes], f"{cid} attributes", wait_seconds)
+
+    if not collection.indexes:
+        return
+
+    def list_indexes():
+        return _as_dict(db.list_indexes(database_id, cid))["indexes"]
+
+    existing_indexes = {item["key"] for item in list_indexes()}
+    for index in collection.indexes:
+        if index.key not in existing_indexes:
+            index.create(db, database_id, cid)
+            report["created"].append(f"index {cid}.{index.key}")
+    _wait_until_available(list_indexes, [i.key for i in collection.indexes], f"{cid} indexes", wait_seconds)
+
+
+def apply_schema(
+    db=None,
+    database_id: str = DATABASE_ID,
+    schema: List[Collection] = SCHEMA,
+    wait_seconds: float = SCHEMA_WAIT_SECONDS,
+) -> Dict[str, List[str]]:
+    """
+    Creates whatever SCHEMA declares that doesn't exist yet and waits for it to become available.
+    Returns {"created": [...], "drift": [...]}. A unique index fails if existing rows violate it.
+    """
+    db = db or get_db_client()
+    report: Dict[str, List[str]] = {"created": [], "drift": []}
+    _ensure_database(db, database_id, report)
+    for collection in schema:
+        _ensure_collection(db, database_id, collection, report, wait_seconds)
+
+    for item in report["created"]:
+        print(f"Schema: created {item}")
+    for item in report["drift"]:
+        print(f"Schema: warning, {item} (existing attributes are not altered)")
+    return report
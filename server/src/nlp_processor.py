@@ -1,137 +1,220 @@
-from bs4 import BeautifulSoup
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.lsa import LsaSummarizer as Summarizer
-from yake import KeywordExtractor
-import requests
+# bs4, sumy (nltk) and yake are imported on first use: together they cost ~0.5s of import time,
+# and most processes (API workers serving cached/LLM-only requests) never touch them.
+import asyncio
+import hashlib
 import os
-import json
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, AsyncIterator, Optional
+
+from .cache import TTLCache
+from .idea_parser import IDEA_SCHEMA, parse_ideas, structured_config
+from .llm_client import GeminiClient, LLMError, get_llm_client
 
 # --- Configuration Constants ---
 LANGUAGE = "english"
 SUMMARY_SENTENCES_COUNT = 5
 KEYWORD_COUNT = 10
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
-
-# --- JSON Schema for Structured Output ---
-# This dictionary structure forces the LLM to return data in a reliable, parsable format.
-IDEA_SCHEMA = {
-    "type": "array",
-    "description": "A list of exactly 3 unique startup ideas based on the provided text.",
-    "items": {
-        "type": "object",
-        "properties": {
-            "Name": {"type": "string", "description": "A catchy, short name for the startup idea."},
-            "Problem": {"type": "string", "description": "The specific market problem identified in the text context."},
-            "Solution": {"type": "string", "description": "A brief, actionable solution using modern technology."}
-        },
-        "required": ["Name", "Problem", "Solution"]
-    }
-}
+# Intermediate results (cleaned text, summary, keywords) are memoized per document
+NLP_MEMO_ENTRIES = int(os.getenv("NLP_MEMO_ENTRIES", "256"))
+NLP_MEMO_TTL_SECONDS = float(os.getenv("NLP_MEMO_TTL_SECONDS", "3600"))
+# "background": load the models after startup without delaying traffic, "startup": before, "off": on first use
+NLP_WARM_ON_STARTUP = os.getenv("NLP_WARM_ON_STARTUP", "background")
+
+_html_parser: Optional[str] = None
+
+
+def html_parser() -> str:
+    """lxml is several times faster than the pure-Python parser; fall back when it isn't installed."""
+    global _html_parser
+    if _html_parser is None:
+        try:
+            import lxml  # noqa: F401
+            _html_parser = "lxml"
+        except ImportError:
+            _html_parser = "html.parser"
+    return _html_parser
 
 LLM_INSTRUCTIONS = (
     "You are a Venture Capitalist (VC) analyst. Analyze the context and identify market gaps. "
     "Generate exactly 3 unique, actionable startup ideas. Use the provided JSON schema."
 )
 
+def format_context_prompt(summary: str, keywords: str) -> str:
+    """Combines the summary and keywords into the context block sent to the LLM."""
+    return (
+        f"Context Summary:\n'{summary}'\n\n"
+        f"Key Concepts:\n'{keywords}'"
+    )
+
+
+class NLPPipeline:
+    """
+    Long-lived text pipeline: tokenizer, LSA summarizer and YAKE extractor are built once and reused.
+    Each stage is memoized by document hash, so repeated calls on the same text are free.
+    """
+    def __init__(self, language: str = LANGUAGE):
+        self.language = language
+        self._tokenizer = None
+        self._summarizer = None
+        self._keyword_extractor = None
+        self._memo = TTLCache(maxsize=NLP_MEMO_ENTRIES, ttl=NLP_MEMO_TTL_SECONDS)
+        # One lock per model: the sumy/YAKE objects are not documented as thread-safe
+        self._warm_lock = threading.Lock()
+        self._summarizer_lock = threading.Lock()
+        self._keyword_lock = threading.Lock()
+
+    def warm(self):
+        """Builds the models (loads NLTK data, stopword lists). Safe to call repeatedly."""
+        with self._warm_lock:
+            if self._tokenizer is None:
+                from sumy.nlp.tokenizers import Tokenizer
+                from sumy.summarizers.lsa import LsaSummarizer as Summarizer
+                from yake import KeywordExtractor
+                self._tokenizer = Tokenizer(self.language)
+                self._summarizer = Summarizer()
+                self._keyword_extractor = KeywordExtractor(lan=self.language, n=3, top=KEYWORD_COUNT, dedupLim=0.9)
+
+    def _memoized(self, stage: str, text: str, compute):
+        key = f"{stage}:{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+        value = self._memo.get(key)
+        if value is None:
+            value = compute(text)
+            self._memo.set(key, value)
+        return value
+
+    def clean_html(self, raw_text: str) -> str:
+        """Strips HTML tags from the raw text, leaving only plain body copy."""
+        def compute(text: str) -> str:
+            from bs4 import BeautifulSoup
+            soup = BeautifulSoup(text, html_parser())
+            # Filter scripts, styles, and headers to get cleaner body text
+            for tag in soup(["script", "style", "header", "footer", "nav"]):
+                tag.decompose()
+            return soup.get_text(separator=' ', strip=True)
+        return self._memoized("clean", raw_text, compute)
+
+    def summarize(self, cleaned_text: str, sentences_count: int = SUMMARY_SENTENCES_COUNT) -> str:
+        """Uses LSA Summarizer to generate a short, representative summary."""
+        def compute(text: str) -> str:
+            from sumy.parsers.plaintext import PlaintextParser
+            self.warm()
+            parser = PlaintextParser.from_string(text, self._tokenizer)
+            with self._summarizer_lock:
+                summary_sentences = [str(sentence) for sentence in self._summarizer(parser.document, sentences_count)]
+            return " ".join(summary_sentences)
+        return self._memoized(f"summary{sentences_count}", cleaned_text, compute)
+
+    def extract_keywords(self, cleaned_text: str) -> str:
+        """Uses YAKE to extract the most relevant keywords and phrases."""
+        def compute(text: str) -> str:
+            self.warm()
+            with self._keyword_lock:
+                keywords = [kw for score, kw in self._keyword_extractor.extract_keywords(text)]
+            return ", ".join(keywords)
+        return self._memoized("keywords", cleaned_text, compute)
+
+    def build_prompt(self, cleaned_text: str) -> str:
+        """Combines the extracted data and instructions into a single LLM prompt."""
+        return format_context_prompt(self.summarize(cleaned_text), self.extract_keywords(cleaned_text))
+
+
+_pipeline: Optional[NLPPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_nlp_pipeline() -> NLPPipeline:
+    """Returns the process-wide pipeline."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = NLPPipeline()
+    return _pipeline
+
+
+_warm_task: Optional[asyncio.Task] = None
+
+
+async def warm_nlp_pipeline():
+    """
+    Startup hook: imports and loads the NLP models off the event loop so the first request doesn't pay
+    for it. In "background" mode the server starts accepting traffic while this runs.
+    """
+    global _warm_task
+    if NLP_WARM_ON_STARTUP == "off":
+        return
+    warm = asyncio.to_thread(get_nlp_pipeline().warm)
+    if NLP_WARM_ON_STARTUP == "startup":
+        await warm
+    elif _warm_task is None:
+        _warm_task = asyncio.create_task(warm)
+        _warm_task.add_done_callback(_report_warm_failure)
+
+
+def _report_warm_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Warning: NLP warm-up failed; models will load on first use: {task.exception()}")
+
+
 class NLPProcessor:
     """Handles text cleaning, summarization, keyword extraction, and LLM communication."""
-    def __init__(self, raw_text: str):
+    def __init__(self, raw_text: str = "", llm_client: Optional[GeminiClient] = None):
         self.raw_text = raw_text
-        self.cleaned_text = self._clean_html()
-        self.api_key = os.getenv("GEMINI_API_KEY")
+        self.pipeline = get_nlp_pipeline()
+        self._cleaned_text: Optional[str] = None
+        # Shared, pooled client unless one is injected (e.g. pointed at a stub server)
+        self.llm_client = llm_client or get_llm_client()
 
-        if not self.api_key:
+        if not self.llm_client.api_key:
              print("Warning: GEMINI_API_KEY not set. LLM calls will fail.")
              # NOTE: main.py will handle the critical failure exception
 
+    @property
+    def cleaned_text(self) -> str:
+        # Parsed on first use so building a processor for an LLM-only call costs nothing
+        if self._cleaned_text is None:
+            self._cleaned_text = self._clean_html()
+        return self._cleaned_text
+
     def _clean_html(self) -> str:
-        """Strips HTML tags from the raw text, leaving only plain body copy."""
-        soup = BeautifulSoup(self.raw_text, 'html.parser')
-        # Filter scripts, styles, and headers to get cleaner body text
-        for tag in soup(["script", "style", "header", "footer", "nav"]):
-            tag.decompose()
-        return soup.get_text(separator=' ', strip=True)
+        return self.pipeline.clean_html(self.raw_text)
 
     def _generate_summary(self) -> str:
-        """Uses LSA Summarizer to generate a short, representative summary."""
-        parser = PlaintextParser.from_string(self.cleaned_text, Tokenizer(LANGUAGE))
-        summarizer = Summarizer()
-        summary_sentences = [str(sentence) for sentence in summarizer(parser.document, SUMMARY_SENTENCES_COUNT)]
-        return " ".join(summary_sentences)
+        return self.pipeline.summarize(self.cleaned_text)
 
     def _extract_keywords(self) -> str:
-        """Uses YAKE to extract the most relevant keywords and phrases."""
-        kw_extractor = KeywordExtractor(lan=LANGUAGE, n=3, top=KEYWORD_COUNT, dedupLim=0.9)
-        keywords = [kw for score, kw in kw_extractor.extract_keywords(self.cleaned_text)]
-        return ", ".join(keywords)
+        return self.pipeline.extract_keywords(self.cleaned_text)
 
     def build_optimized_prompt(self) -> str:
-        """Combines the extracted data and instructions into a single LLM prompt."""
-        summary = self._generate_summary()
-        keywords = self._extract_keywords()
-        
-        prompt = (
-            f"Context Summary:\n'{summary}'\n\n"
-            f"Key Concepts:\n'{keywords}'"
-        )
-        return prompt
-
-    def call_llm(self) -> List[Dict[str, str]]:
+        return self.pipeline.build_prompt(self.cleaned_text)
+
+    async def generate_idea(self, system_instruction: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+        """Generation used by /api/generate. Returns the raw model text (JSON when a schema is configured)."""
+        return await self.llm_client.generate(system_instruction, prompt, generation_config)
+
+    async def stream_idea(
+        self, system_instruction: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Streaming variant of generate_idea; yields text chunks as they arrive."""
+        async for chunk in self.llm_client.stream_generate(system_instruction, prompt, generation_config):
+            yield chunk
+
+    async def call_llm(self) -> List[Dict[str, str]]:
         """
         Makes the final API call to the Gemini LLM for structured output.
         Returns a list of dictionaries containing the ideas.
         """
-        optimized_prompt = self.build_optimized_prompt()
-        
-        # 1. Define the Request Body
-        headers = {
-            'Content-Type': 'application/json',
-            # 2. Authentication via Header
-            'x-goog-api-key': self.api_key 
-        }
-
-        data = {
-            # Contents array holds the user's prompt
-            "contents": [
-                {
-                    "parts": [
-                        {"text": self.build_optimized_prompt()}
-                    ]
-                }
-            ],
-            # 3. Configuration to enforce Structured JSON Output
-            "config": {
-                "systemInstruction": LLM_INSTRUCTIONS, # Set the persona
-                "responseMimeType": "application/json",
-                "responseSchema": IDEA_SCHEMA,
-                "temperature": 0.8 # Added for a bit of creativity in ideas
-            }
-        }
-        
-        # 4. Make the HTTP POST Request
-        try:
-            response = requests.post(
-                GEMINI_API_URL, 
-                headers=headers, 
-                data=json.dumps(data)
-            )
-            response.raise_for_status() # Raises an HTTPError for bad responses (4xx or 5xx)
-
-            # 5. Parse the Response
-            # The response.json() contains the 'candidates' structure
-            response_data = response.json()
-            
-            # Extract the raw JSON string from the response
-            json_text = response_data['candidates'][0]['content']['parts'][0]['text']
-            
-            # The LLM output is a JSON string, so we parse it into a Python list of dicts
-            return json.loads(json_text)
-
-        except requests.exceptions.RequestException as e:
-            print(f"API Request Error: {e}")
-            raise HTTPException(status_code=500, detail="External API Request Failed.")
-        except (KeyError, IndexError, json.JSONDecodeError) as e:
-            print(f"Response Parsing Error: {e}")
-            raise HTTPException(status_code=500, detail="Invalid JSON structure returned by LLM.")
\ No newline at end of file
+        # CPU-heavy preprocessing runs on the process pool, not the event loop
+        from .preprocess import get_preprocess_engine
+        preprocessed = await get_preprocess_engine().process(self.raw_text)
+        optimized_prompt = preprocessed["prompt"]
+
+        # Configuration to enforce Structured JSON Output
+        generation_config = structured_config(IDEA_SCHEMA)
+        json_text = await self.llm_client.generate(LLM_INSTRUCTIONS, optimized_prompt, generation_config)
+
+        # Malformed items are dropped; only a response with no usable idea is an error
+        ideas, malformed = parse_ideas(json_text)
+        if not ideas:
+            print(f"Response Parsing Error: {malformed[:1]}")
+            raise LLMError("Invalid JSON structure returned by LLM.")
+        return [idea.model_dump(by_alias=True) for idea in ideas]
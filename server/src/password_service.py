@@ -0,0 +1,137 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+# --- Configuration Constants ---
+# bcrypt cost factor. Changing it makes existing hashes "stale"; they are rehashed on next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Jobs allowed to wait for a free worker before new requests are rejected with 429
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+# --- Worker-side functions (must be top-level so they can be pickled) ---
+_contexts: Dict[int, CryptContext] = {}
+
+
+def _get_context(rounds: int) -> CryptContext:
+    # Pinning min/max rounds to the configured cost makes needs_update() flag any other cost.
+    if rounds not in _contexts:
+        _contexts[rounds] = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+    return _contexts[rounds]
+
+
+def _hash_password(password: str, rounds: int) -> str:
+    return _get_context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    """Returns (is_valid, new_hash). new_hash is only set when the stored hash uses stale parameters."""
+    return _get_context(rounds).verify_and_update(password, hashed_password)
+
+
+def _warm_up(rounds: int) -> bool:
+    _get_context(rounds)
+    return True
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated process pool so a login burst never blocks the event loop.
+    At most `workers` hashes run at once; up to `max_queue` more wait, anything beyond gets a 429.
+    """
+    def __init__(
+        self,
+        rounds: int = BCRYPT_ROUNDS,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+    ):
+        self.rounds = rounds
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._outstanding = 0
+        self.rejected = 0
+        self.pool_restarts = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 'spawn' keeps workers free of the parent's threads and event loop state
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _replace_broken(self, broken: ProcessPoolExecutor):
+        """Drops a pool whose worker died (OOM, kill); the next call spawns a fresh one."""
+        if self._executor is broken: # concurrent callers may already have replaced it
+            self._executor = None
+            self.pool_restarts += 1
+            broken.shutdown(wait=False, cancel_futures=True)
+            print("Warning: password hashing pool broke (a worker died); recreating it.")
+
+    async def _run(self, fn, *args):
+        if self._outstanding >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Authentication service is busy. Please retry shortly.",
+                headers={"Retry-After": "1"},
+            )
+        self._outstanding += 1
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                # Retry once on a fresh pool; a second failure is a real problem and propagates
+                self._replace_broken(executor)
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._outstanding -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Checks a password; also returns a fresh hash when the stored one should be upgraded."""
+        return await self._run(_verify_and_update, password, hashed_password, self.rounds)
+
+    async def start(self):
+        """Startup hook: spawns the workers ahead of the first login, without holding up startup."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        warm_up = asyncio.gather(*[
+            loop.run_in_executor(executor, _warm_up, self.rounds) for _ in range(self.workers)
+        ])
+        warm_up.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "outstanding": self._outstanding,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "pool_restarts": self.pool_restarts,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,153 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import observe_nlp_timings
+from .nlp_processor import SUMMARY_SENTENCES_COUNT, format_context_prompt, get_nlp_pipeline
+
+# --- Configuration Constants ---
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# Raw input beyond this is cut off before parsing (a multi-MB page is mostly markup anyway)
+PREPROCESS_MAX_INPUT_CHARS = int(os.getenv("PREPROCESS_MAX_INPUT_CHARS", str(5 * 1024 * 1024)))
+# Cleaned text longer than this is summarized chunk-by-chunk in parallel, then summarized again
+PREPROCESS_CHUNK_CHARS = int(os.getenv("PREPROCESS_CHUNK_CHARS", "40000"))
+PREPROCESS_TIMEOUT_SECONDS = float(os.getenv("PREPROCESS_TIMEOUT_SECONDS", "60"))
+
+
+# --- Worker-side stages (top-level so they can be pickled) ---
+
+def _warm_worker():
+    get_nlp_pipeline().warm()
+
+
+def _clean_stage(raw_text: str) -> Tuple[str, float]:
+    start = time.perf_counter()
+    return get_nlp_pipeline().clean_html(raw_text), time.perf_counter() - start
+
+
+def _summary_stage(text: str, sentences_count: int) -> Tuple[str, float]:
+    start = time.perf_counter()
+    return get_nlp_pipeline().summarize(text, sentences_count), time.perf_counter() - start
+
+
+def _keywords_stage(text: str) -> Tuple[str, float]:
+    start = time.perf_counter()
+    return get_nlp_pipeline().extract_keywords(text), time.perf_counter() - start
+
+
+def split_into_chunks(text: str, chunk_chars: int = PREPROCESS_CHUNK_CHARS) -> List[str]:
+    """Splits text into ~chunk_chars pieces, breaking at sentence ends where possible."""
+    chunks = []
+    while len(text) > chunk_chars:
+        window = text[:chunk_chars]
+        cut = max(window.rfind(". "), window.rfind("! "), window.rfind("? "))
+        cut = cut + 1 if cut > chunk_chars // 2 else chunk_chars
+        chunks.append(text[:cut].strip())
+        text = text[cut:]
+    if text.strip():
+        chunks.append(text.strip())
+    return chunks
+
+
+class PreprocessEngine:
+    """
+    Async front end for the CPU-heavy NLP stages (HTML cleaning, LSA summary, YAKE keywords).
+    Stages run on a process pool so large pages never pin the event loop's core.
+    """
+    def __init__(
+        self,
+        workers: int = PREPROCESS_WORKERS,
+        max_input_chars: int = PREPROCESS_MAX_INPUT_CHARS,
+        chunk_chars: int = PREPROCESS_CHUNK_CHARS,
+        timeout: float = PREPROCESS_TIMEOUT_SECONDS,
+    ):
+        self.workers = max(1, workers)
+        self.max_input_chars = max_input_chars
+        self.chunk_chars = chunk_chars
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+            )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(self._get_executor(), fn, *args), self.timeout)
+
+    async def _summarize(self, cleaned_text: str, timings: Dict[str, float]) -> Tuple[str, int]:
+        chunks = split_into_chunks(cleaned_text, self.chunk_chars)
+        if len(chunks) <= 1:
+            summary, elapsed = await self._run(_summary_stage, cleaned_text, SUMMARY_SENTENCES_COUNT)
+            timings["summary_ms"] = elapsed * 1000
+            return summary, 1
+
+        # Map: summarize chunks in parallel. Reduce: summarize the concatenated partial summaries.
+        partials = await asyncio.gather(*[
+            self._run(_summary_stage, chunk, SUMMARY_SENTENCES_COUNT) for chunk in chunks
+        ])
+        summary, reduce_elapsed = await self._run(
+            _summary_stage, " ".join(text for text, _ in partials), SUMMARY_SENTENCES_COUNT
+        )
+        timings["summary_ms"] = (sum(elapsed for _, elapsed in partials) + reduce_elapsed) * 1000
+        return summary, len(chunks)
+
+    async def process(self, raw_text: str) -> Dict[str, Any]:
+        """
+        Runs clean -> (summary || keywords) and returns the results plus per-stage timings (ms).
+        Timings are worker CPU time per stage; `total_ms` is wall-clock time.
+        """
+        start = time.perf_counter()
+        truncated = len(raw_text) > self.max_input_chars
+        if truncated:
+            raw_text = raw_text[:self.max_input_chars]
+
+        timings: Dict[str, float] = {}
+        cleaned_text, elapsed = await self._run(_clean_stage, raw_text)
+        timings["clean_ms"] = elapsed * 1000
+
+        (summary, chunk_count), (keywords, kw_elapsed) = await asyncio.gather(
+            self._summarize(cleaned_text, timings),
+            self._run(_keywords_stage, cleaned_text),
+        )
+        timings["keywords_ms"] = kw_elapsed * 1000
+        timings["total_ms"] = (time.perf_counter() - start) * 1000
+        observe_nlp_timings(timings)
+
+        return {
+            "cleaned_text": cleaned_text,
+            "summary": summary,
+            "keywords": keywords,
+            "prompt": format_context_prompt(summary, keywords),
+            "truncated": truncated,
+            "chunks": chunk_count,
+            "timings": {stage: round(ms, 2) for stage, ms in timings.items()},
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_engine: Optional[PreprocessEngine] = None
+
+
+def get_preprocess_engine() -> PreprocessEngine:
+    global _engine
+    if _engine is None:
+        _engine = PreprocessEngine()
+    return _engine
+
+
+def shutdown_preprocess_engine():
+    if _engine is not None:
+        _engine.shutdown()
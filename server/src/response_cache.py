@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+from typing import Optional
+
+from .cache import CACHE_DIR, TieredCache, TTLCache, open_disk_backend
+from .llm_client import GEMINI_MODEL
+
+# --- Configuration Constants ---
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(24 * 3600)))
+RESPONSE_CACHE_MEMORY_ENTRIES = int(os.getenv("RESPONSE_CACHE_MEMORY_ENTRIES", "512"))
+RESPONSE_CACHE_DISK_BYTES = int(os.getenv("RESPONSE_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", os.path.join(CACHE_DIR, "llm"))
+# "full": a cached answer costs a credit like a fresh one. "free": cache hits are not charged.
+CACHED_RESPONSE_CHARGE_POLICY = os.getenv("CACHED_RESPONSE_CHARGE_POLICY", "full")
+
+
+def _normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").split()).lower()
+
+
+def response_cache_key(
+    system_instruction: str,
+    prompt: str,
+    tone: Optional[str],
+    categories: Optional[str],
+) -> str:
+    """Content hash of the normalized prompt inputs (whitespace/case-insensitive, category order ignored)."""
+    category_list = sorted(_normalize(c) for c in (categories or "").split(",") if c.strip())
+    material = json.dumps({
+        "model": GEMINI_MODEL,
+        "system": _normalize(system_instruction),
+        "prompt": _normalize(prompt),
+        "tone": _normalize(tone),
+        "categories": category_list,
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Memory + on-disk cache of raw Gemini responses, keyed by response_cache_key()."""
+    def __init__(self, enabled: bool = RESPONSE_CACHE_ENABLED, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.enabled = enabled
+        self.ttl = ttl
+        backend = None
+        if enabled:
+            backend = open_disk_backend(RESPONSE_CACHE_DIR, RESPONSE_CACHE_DISK_BYTES, "LLM response cache")
+        self._cache = TieredCache(TTLCache(maxsize=RESPONSE_CACHE_MEMORY_ENTRIES, ttl=ttl), backend=backend, namespace="llm:")
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        return self._cache.get(key)
+
+    def set(self, key: str, response_text: str):
+        if self.enabled and response_text:
+            self._cache.set(key, response_text, self.ttl)
+
+    def should_charge(self, cache_hit: bool) -> bool:
+        return not cache_hit or CACHED_RESPONSE_CHARGE_POLICY != "free"
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats["enabled"] = self.enabled
+        return stats
+
+
+response_cache = ResponseCache()
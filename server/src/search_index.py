@@ -0,0 +1,237 @@
+"""
+Per-user keyword search over stored ideas: an in-process inverted index with BM25 ranking.
+
+Built from an idea's name, problem and result on first search (one paged, owner-filtered scan),
+kept current through idea events, and snapshotted to CACHE_DIR/search as zlib-compressed JSON
+(see src/user_index.py). Only per-document term counts are stored; the postings are rebuilt from
+them on load.
+"""
+import heapq
+import json
+import math
+import os
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .blob_store import BLOB_INLINE_MAX_CHARS
+from .cache import CACHE_DIR
+from .similarity import tokenize
+from .user_index import PerUserIndexes, UserIndex
+
+# --- Configuration Constants ---
+# Documents held in memory across all users; least recently used users go first
+SEARCH_MAX_DOCUMENTS = int(os.getenv("SEARCH_MAX_DOCUMENTS", "200000"))
+SEARCH_INDEX_DIR = os.getenv("SEARCH_INDEX_DIR", os.path.join(CACHE_DIR, "search"))
+# Snapshots (and in-memory indexes) older than this are rebuilt, bounding staleness from other processes
+SEARCH_INDEX_MAX_AGE_SECONDS = float(os.getenv("SEARCH_INDEX_MAX_AGE_SECONDS", "3600"))
+SEARCH_PREVIEW_CHARS = 200
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+INDEX_FIELDS = ["$id", "name", "problem", "result", "body_ref", "is_starred", "created_at", "$createdAt"]
+
+
+def _indexed_result(document: dict) -> str:
+    """
+    The part of `result` that is indexed: the inline preview for off-loaded bodies. Idea events carry
+    the full body but a rebuild only reads the document, and both must index the same text.
+    """
+    result = document.get('result') or ""
+    return result[:BLOB_INLINE_MAX_CHARS] if document.get('body_ref') else result
+
+
+def parse_timestamp(value: str) -> float:
+    """
+    POSIX timestamp of an ISO 8601 string. created_at comes both naive (datetime.utcnow().isoformat())
+    and with an offset (Appwrite's $createdAt), so naive values are taken as UTC. Raises ValueError.
+    """
+    parsed = datetime.fromisoformat(value.strip())
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class _Doc:
+    __slots__ = ("name", "preview", "is_starred", "created_at", "created_ts", "terms", "length")
+
+    def __init__(self, name: str, preview: str, is_starred: bool, created_at: str, terms: Dict[str, int]):
+        self.name = name
+        self.preview = preview
+        self.is_starred = is_starred
+        self.created_at = created_at
+        try:
+            self.created_ts: Optional[float] = parse_timestamp(created_at)
+        except ValueError:
+            self.created_ts = None # unparseable dates never pass a since/until filter
+        self.terms = terms
+        self.length = sum(terms.values())
+
+
+class _UserSearchIndex(UserIndex):
+    """term -> {idea_id: term frequency}, plus per-document metadata for filters and display."""
+    def __init__(self):
+        super().__init__()
+        self.docs: Dict[str, _Doc] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.docs)
+
+    def add_doc(self, idea_id: str, doc: _Doc):
+        if idea_id in self.docs:
+            self.remove([idea_id])
+        self.docs[idea_id] = doc
+        self.total_length += doc.length
+        for term, count in doc.terms.items():
+            self.postings.setdefault(term, {})[idea_id] = count
+        self.dirty = True
+
+    def add(self, documents: List[dict]):
+        for document in documents:
+            text = " ".join((document.get('name') or "", document.get('problem') or "", _indexed_result(document)))
+            self.add_doc(document['$id'], _Doc(
+                name=document.get('name') or "",
+                preview=(document.get('problem') or "")[:SEARCH_PREVIEW_CHARS],
+                is_starred=bool(document.get('is_starred', False)),
+                created_at=document.get('created_at') or document.get('$createdAt') or "",
+                terms=dict(Counter(tokenize(text))),
+            ))
+
+    def remove(self, idea_ids: List[str]):
+        for idea_id in idea_ids:
+            doc = self.docs.pop(idea_id, None)
+            if doc is None:
+                continue
+            self.total_length -= doc.length
+            for term in doc.terms:
+                posting = self.postings.get(term)
+                if posting is not None:
+                    posting.pop(idea_id, None)
+                    if not posting:
+                        del self.postings[term]
+            self.dirty = True
+
+    def search(
+        self,
+        query: str,
+        limit: int,
+        starred: Optional[bool] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """BM25 over the query terms, restricted to documents passing the filters (since/until: POSIX time)."""
+        n = len(self.docs)
+        if not n:
+            return {"total": 0, "results": []}
+        average_length = self.total_length / n
+        dated = since is not None or until is not None
+
+        def allowed(doc: _Doc) -> bool:
+            if starred is not None and doc.is_starred != starred:
+                return False
+            if not dated:
+                return True
+            return (doc.created_ts is not None
+                    and (since is None or doc.created_ts >= since)
+                    and (until is None or doc.created_ts < until))
+
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for idea_id, tf in posting.items():
+                doc = self.docs[idea_id]
+                if not allowed(doc):
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * doc.length / average_length)
+                scores[idea_id] = scores.get(idea_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return {
+            "total": len(scores),
+            "results": [
+                {
+                    "id": idea_id,
+                    "name": self.docs[idea_id].name,
+                    "preview": self.docs[idea_id].preview,
+                    "is_starred": self.docs[idea_id].is_starred,
+                    "created_at": self.docs[idea_id].created_at,
+                    "score": round(score, 4),
+                }
+                for idea_id, score in top
+            ],
+        }
+
+    # --- Snapshot form ---
+
+    def dump(self) -> bytes:
+        rows = [[idea_id, d.name, d.preview, d.is_starred, d.created_at, d.terms] for idea_id, d in self.docs.items()]
+        return zlib.compress(json.dumps({"built_at": self.built_at, "docs": rows}, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def load(cls, data: bytes) -> "_UserSearchIndex":
+        snapshot = json.loads(zlib.decompress(data))
+        index = cls()
+        for idea_id, name, preview, is_starred, created_at, terms in snapshot["docs"]:
+            index.add_doc(idea_id, _Doc(name, preview, is_starred, created_at, terms))
+        index.built_at = snapshot["built_at"]
+        index.dirty = False
+        return index
+
+
+class SearchIndex(PerUserIndexes[_UserSearchIndex]):
+    """Lazily built per-user inverted indexes with an LRU bound on total documents."""
+    label = "search"
+    item_label = "documents"
+    snapshot_suffix = ".json.z"
+    fields = INDEX_FIELDS
+    text_fields = ("name", "problem", "result")
+    snapshot_errors = PerUserIndexes.snapshot_errors + (zlib.error,)
+
+    def __init__(
+        self,
+        max_documents: int = SEARCH_MAX_DOCUMENTS,
+        directory: str = SEARCH_INDEX_DIR,
+        max_age: float = SEARCH_INDEX_MAX_AGE_SECONDS,
+    ):
+        super().__init__(max_documents, directory, max_age)
+
+    def new_index(self) -> _UserSearchIndex:
+        return _UserSearchIndex()
+
+    def dump(self, index: _UserSearchIndex) -> bytes:
+        return index.dump()
+
+    def load(self, data: bytes) -> _UserSearchIndex:
+        return _UserSearchIndex.load(data)
+
+    def apply_update(self, index: _UserSearchIndex, idea_id: str, fields: Dict[str, Any]):
+        if "is_starred" in fields and idea_id in index.docs:
+            index.docs[idea_id].is_starred = bool(fields["is_starred"])
+            index.dirty = True
+
+    # --- Queries ---
+
+    async def search(
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 20,
+        starred: Optional[bool] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        index = await self.get(user_id)
+        self._counters["searches"] += 1
+        return index.search(query, limit, starred, since, until)
+
+
+search_index = SearchIndex()
+search_index.subscribe_to_idea_events()
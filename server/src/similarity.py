@@ -0,0 +1,222 @@
+"""
+Per-user similarity index over stored ideas.
+
+Each idea's name/problem/solution is turned into a hashed term-frequency vector (unigrams + bigrams,
+signed feature hashing, L2-normalized), so cosine similarity is a single matrix-vector product and
+no model or vocabulary has to be loaded. A user's vectors live in one contiguous NumPy matrix that
+is built from Appwrite on first use, kept current through idea events, and snapshotted to disk
+(CACHE_DIR/similarity) so a restart does not rescan the collection (see src/user_index.py).
+"""
+import hashlib
+import io
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from .cache import CACHE_DIR
+from .user_index import PerUserIndexes, UserIndex
+
+# --- Configuration Constants ---
+SIMILARITY_DIMENSIONS = int(os.getenv("SIMILARITY_DIMENSIONS", "512"))
+# Vectors held in memory across all users (4 bytes * dimensions each); least recently used users go first
+SIMILARITY_MAX_VECTORS = int(os.getenv("SIMILARITY_MAX_VECTORS", "100000"))
+SIMILARITY_INDEX_DIR = os.getenv("SIMILARITY_INDEX_DIR", os.path.join(CACHE_DIR, "similarity"))
+# Snapshots (and in-memory indexes) older than this are rebuilt, bounding staleness from other processes
+SIMILARITY_INDEX_MAX_AGE_SECONDS = float(os.getenv("SIMILARITY_INDEX_MAX_AGE_SECONDS", "3600"))
+SIMILARITY_MIN_SCORE = float(os.getenv("SIMILARITY_MIN_SCORE", "0.2"))
+# Analysis requests this close to one of the user's stored ideas return it instead of calling Gemini (0 disables)
+SIMILARITY_DEDUP_THRESHOLD = float(os.getenv("SIMILARITY_DEDUP_THRESHOLD", "0"))
+SIMILARITY_PREVIEW_CHARS = 200
+
+INDEX_FIELDS = ["$id", "name", "problem", "solution", "created_at"]
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Very common words plus the labels in the stored `result` format
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or that the their this to "
+    "with will your you we our can name problem solution".split()
+)
+
+
+# --- Vectors ---
+
+def idea_text(doc: dict) -> str:
+    return " ".join(doc.get(field) or "" for field in ("name", "problem", "solution"))
+
+
+@lru_cache(maxsize=65536)
+def _term_hash(term: str) -> int:
+    # Stable across processes (unlike hash()) and well mixed (crc32 is linear: "x 3"/"x 7" collide with "3"/"7")
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric words minus stopwords; shared with the keyword search index."""
+    return [w for w in _TOKEN.findall(text.lower()) if w not in STOPWORDS]
+
+
+def embed(text: str, dimensions: int = SIMILARITY_DIMENSIONS) -> np.ndarray:
+    """Hashed, sublinear-TF, L2-normalized vector."""
+    words = tokenize(text)
+    counts: Dict[int, float] = {}
+    for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        h = _term_hash(term)
+        slot = h % dimensions
+        counts[slot] = counts.get(slot, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for slot, count in counts.items():
+        if count:
+            vector[slot] = math.copysign(1.0 + math.log(abs(count)), count)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class _UserIndex(UserIndex):
+    """One user's vectors, row-aligned with ids and display fields. Grows by doubling."""
+    def __init__(self, dimensions: int):
+        super().__init__()
+        self.vectors = np.zeros((16, dimensions), dtype=np.float32)
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self.previews: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def add(self, docs: Iterable[dict]):
+        for doc in docs:
+            idea_id = doc['$id']
+            if idea_id in self.rows:
+                continue
+            if self.size == len(self.vectors):
+                self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+            self.rows[idea_id] = self.size
+            self.vectors[self.size] = embed(idea_text(doc), self.vectors.shape[1])
+            self.ids.append(idea_id)
+            self.names.append(doc.get('name') or "")
+            self.previews.append((doc.get('problem') or "")[:SIMILARITY_PREVIEW_CHARS])
+            self.dirty = True
+
+    def remove(self, idea_ids: Iterable[str]):
+        """Swap-with-last removal: O(1) per id, no matrix copy."""
+        for idea_id in idea_ids:
+            row = self.rows.pop(idea_id, None)
+            if row is None:
+                continue
+            last = self.size - 1
+            if row != last:
+                self.vectors[row] = self.vectors[last]
+                for column in (self.ids, self.names, self.previews):
+                    column[row] = column[last]
+                self.rows[self.ids[row]] = row
+            for column in (self.ids, self.names, self.previews):
+                column.pop()
+            self.dirty = True
+
+    def search(self, vector: np.ndarray, limit: int, min_score: float, exclude: Optional[str] = None) -> List[Tuple[int, float]]:
+        if not self.size:
+            return []
+        scores = self.vectors[:self.size] @ vector
+        if exclude in self.rows:
+            scores[self.rows[exclude]] = -1.0
+        k = min(limit, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top if scores[row] >= min_score]
+
+    def results(self, hits: List[Tuple[int, float]]) -> List[dict]:
+        return [
+            {"id": self.ids[row], "name": self.names[row], "preview": self.previews[row], "score": round(score, 4)}
+            for row, score in hits
+        ]
+
+
+class SimilarityIndex(PerUserIndexes[_UserIndex]):
+    """Lazily built per-user vector indexes with an LRU bound on total vectors."""
+    label = "similarity"
+    item_label = "vectors"
+    snapshot_suffix = ".npz"
+    fields = INDEX_FIELDS
+    text_fields = ("name", "problem", "solution") # stars don't change the vector
+
+    def __init__(
+        self,
+        dimensions: int = SIMILARITY_DIMENSIONS,
+        max_vectors: int = SIMILARITY_MAX_VECTORS,
+        directory: str = SIMILARITY_INDEX_DIR,
+        max_age: float = SIMILARITY_INDEX_MAX_AGE_SECONDS,
+    ):
+        super().__init__(max_vectors, directory, max_age)
+        self.dimensions = dimensions
+
+    def new_index(self) -> _UserIndex:
+        return _UserIndex(self.dimensions)
+
+    def dump(self, index: _UserIndex) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            vectors=index.vectors[:index.size],
+            ids=np.array(index.ids, dtype=str),
+            names=np.array(index.names, dtype=str),
+            previews=np.array(index.previews, dtype=str),
+            built_at=np.float64(index.built_at),
+        )
+        return buffer.getvalue()
+
+    def load(self, data: bytes) -> _UserIndex:
+        with np.load(io.BytesIO(data), allow_pickle=False) as snapshot:
+            vectors = snapshot["vectors"]
+            if vectors.shape[1] != self.dimensions:
+                raise ValueError("Snapshot has different dimensions")
+            index = _UserIndex(self.dimensions)
+            index.vectors = np.array(vectors, dtype=np.float32) if len(vectors) else index.vectors
+            index.ids = snapshot["ids"].tolist()
+            index.names = snapshot["names"].tolist()
+            index.previews = snapshot["previews"].tolist()
+            index.built_at = float(snapshot["built_at"])
+        index.rows = {idea_id: row for row, idea_id in enumerate(index.ids)}
+        return index
+
+    # --- Queries ---
+
+    async def search(
+        self,
+        user_id: str,
+        text: Optional[str] = None,
+        idea_id: Optional[str] = None,
+        limit: int = 10,
+        min_score: float = SIMILARITY_MIN_SCORE,
+    ) -> Optional[List[dict]]:
+        """
+        The user's ideas most similar to `text`, or to the stored idea `idea_id` (which is excluded).
+        Returns None when `idea_id` isn't one of the user's ideas.
+        """
+        index = await self.get(user_id)
+        self._counters["searches"] += 1
+        if idea_id is not None:
+            row = index.rows.get(idea_id)
+            if row is None:
+                return None
+            vector = index.vectors[row].copy()
+        else:
+            vector = embed(text or "", self.dimensions)
+        return index.results(index.search(vector, limit, min_score, exclude=idea_id))
+
+    async def find_duplicate(self, user_id: str, text: str, threshold: float = SIMILARITY_DEDUP_THRESHOLD) -> Optional[dict]:
+        """The user's closest stored idea if its similarity to `text` is at least `threshold`."""
+        if threshold <= 0:
+            return None
+        index = await self.get(user_id)
+        hits = index.search(embed(text, self.dimensions), 1, threshold)
+        return index.results(hits)[0] if hits else None
+
+
+similarity_index = SimilarityIndex()
+similarity_index.subscribe_to_idea_events()
@@ -0,0 +1,217 @@
+"""
+Shared scaffolding for the per-user derived indexes (similarity vectors, keyword search).
+
+An index is built from the user's stored ideas on first use (one paged, owner-filtered scan), kept
+current through idea events, bounded by an LRU over the total number of indexed ideas, and
+snapshotted to disk so a restart does not rescan the collection. Subclasses supply the per-user
+index type and its snapshot encoding.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, Type, TypeVar
+
+from . import idea_events
+from .async_db import get_async_db
+from .idea_store import iter_user_ideas
+
+BUILD_PAGE_SIZE = 500
+
+
+class UserIndex:
+    """One user's index. Subclasses implement add/remove and report their size."""
+    def __init__(self):
+        self.built_at = time.time()
+        self.dirty = False
+
+    @property
+    def size(self) -> int:
+        raise NotImplementedError
+
+    def add(self, docs: List[dict]):
+        raise NotImplementedError
+
+    def remove(self, idea_ids: List[str]):
+        raise NotImplementedError
+
+
+IndexT = TypeVar("IndexT", bound=UserIndex)
+
+
+class PerUserIndexes(Generic[IndexT]):
+    """Lazily built per-user indexes with an LRU bound on the total number of indexed ideas."""
+    label = "index"                # used in warnings
+    item_label = "items"           # stats key for the total size
+    snapshot_suffix = ".snapshot"
+    fields: List[str] = []         # Appwrite projection for builds
+    text_fields: Tuple[str, ...] = ()  # an update touching one of these triggers a rebuild
+    snapshot_errors: Tuple[Type[BaseException], ...] = (OSError, KeyError, ValueError)
+
+    def __init__(self, max_items: int, directory: str, max_age: float):
+        self.max_items = max_items
+        self.directory = directory
+        self.max_age = max_age
+        self._users: "OrderedDict[str, IndexT]" = OrderedDict()
+        self._build_locks: Dict[str, asyncio.Lock] = {}
+        # Idea events that arrive while a user's index loads or builds, replayed on it in _store
+        self._pending_events: Dict[str, List[Callable[[IndexT], None]]] = {}
+        self._counters = {"builds": 0, "snapshot_loads": 0, "searches": 0}
+
+    # --- Subclass hooks ---
+
+    def new_index(self) -> IndexT:
+        raise NotImplementedError
+
+    def dump(self, index: IndexT) -> bytes:
+        raise NotImplementedError
+
+    def load(self, data: bytes) -> IndexT:
+        """Raises one of `snapshot_errors` for a snapshot that can't be used."""
+        raise NotImplementedError
+
+    def apply_update(self, index: IndexT, idea_id: str, fields: Dict[str, Any]):
+        """An update not touching `text_fields` (e.g. a star); the default ignores it."""
+
+    # --- Loading ---
+
+    async def get(self, user_id: str) -> IndexT:
+        index = self._fresh(user_id)
+        if index is not None:
+            return index
+        # One build per user at a time; concurrent callers wait for it
+        lock = self._build_locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            index = self._fresh(user_id)
+            if index is None:
+                # The snapshot or the paged scan can miss ideas written meanwhile; buffer their events
+                self._pending_events[user_id] = []
+                try:
+                    index = await asyncio.to_thread(self._load_snapshot, user_id)
+                    if index is None:
+                        index = await self._build(user_id)
+                except BaseException:
+                    self._pending_events.pop(user_id, None)
+                    raise
+                self._store(user_id, index)
+            # Inside the lock, so a waiter can't set up a second lock and start a duplicate build
+            if self._build_locks.get(user_id) is lock:
+                del self._build_locks[user_id]
+        return index
+
+    def _fresh(self, user_id: str) -> Optional[IndexT]:
+        index = self._users.get(user_id)
+        if index is None or time.time() - index.built_at > self.max_age:
+            return None
+        self._users.move_to_end(user_id)
+        return index
+
+    async def _build(self, user_id: str) -> IndexT:
+        index = self.new_index()
+        async for documents in iter_user_ideas(get_async_db(), user_id, self.fields, BUILD_PAGE_SIZE):
+            await asyncio.to_thread(index.add, documents) # tokenizing thousands of ideas is CPU work
+        self._counters["builds"] += 1
+        await asyncio.to_thread(self._save_snapshot, user_id, index)
+        return index
+
+    def _store(self, user_id: str, index: IndexT):
+        for apply in self._pending_events.pop(user_id, ()):
+            apply(index)
+        self._users[user_id] = index
+        self._users.move_to_end(user_id)
+        total = sum(i.size for i in self._users.values())
+        while total > self.max_items and len(self._users) > 1:
+            evicted_id, evicted = self._users.popitem(last=False)
+            if evicted.dirty:
+                self._save_snapshot(evicted_id, evicted)
+            total -= evicted.size
+
+    # --- Snapshots ---
+
+    def _snapshot_path(self, user_id: str) -> str:
+        name = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}{self.snapshot_suffix}")
+
+    def _load_snapshot(self, user_id: str) -> Optional[IndexT]:
+        path = self._snapshot_path(user_id)
+        try:
+            with open(path, "rb") as f:
+                index = self.load(f.read())
+        except self.snapshot_errors:
+            return None
+        # Age comes from the build, not the file: flushes rewrite old indexes without rebuilding them
+        if time.time() - index.built_at > self.max_age:
+            return None
+        index.dirty = False
+        self._counters["snapshot_loads"] += 1
+        return index
+
+    def _save_snapshot(self, user_id: str, index: IndexT):
+        path = self._snapshot_path(user_id)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self.dump(index))
+            os.replace(tmp_path, path) # atomic: readers never see a partial file
+            index.dirty = False
+        except OSError as e:
+            print(f"Warning: could not write {self.label} snapshot: {e}")
+
+    def _discard_snapshot(self, user_id: str):
+        try:
+            os.remove(self._snapshot_path(user_id))
+        except OSError:
+            pass # none written yet
+
+    def flush(self):
+        """Writes snapshots for indexes changed since they were loaded (shutdown hook)."""
+        for user_id, index in list(self._users.items()):
+            if index.dirty:
+                self._save_snapshot(user_id, index)
+
+    # --- Idea event listeners ---
+
+    def _on_event(self, user_id: str, apply: Callable[[IndexT], None]):
+        """Applies an idea event to the loaded index, and queues it for one being loaded or built."""
+        pending = self._pending_events.get(user_id)
+        if pending is not None:
+            pending.append(apply)
+        index = self._users.get(user_id)
+        if index is not None: # not loaded and not loading: it will be built with the change included
+            apply(index)
+
+    def ideas_created(self, user_id: str, docs: List[dict]):
+        self._on_event(user_id, lambda index: index.add(docs))
+
+    def idea_updated(self, user_id: str, idea_id: str, fields: Dict[str, Any]):
+        if any(k in fields for k in self.text_fields):
+            # Text edits only carry some fields: rebuild on next use, not from a snapshot of the old text
+            self._users.pop(user_id, None)
+            self._discard_snapshot(user_id)
+            pending = self._pending_events.get(user_id)
+            if pending is not None:
+                pending.append(lambda index: self._expire(user_id, index))
+        else:
+            self._on_event(user_id, lambda index: self.apply_update(index, idea_id, fields))
+
+    def _expire(self, user_id: str, index: IndexT):
+        """An index built while its text changed: serve it once, rebuild on next use."""
+        index.built_at = 0.0
+        self._discard_snapshot(user_id) # the build wrote one
+
+    def ideas_deleted(self, user_id: str, idea_ids: List[str]):
+        self._on_event(user_id, lambda index: index.remove(idea_ids))
+
+    def subscribe_to_idea_events(self):
+        idea_events.subscribe(idea_events.CREATED, self.ideas_created)
+        idea_events.subscribe(idea_events.UPDATED, self.idea_updated)
+        idea_events.subscribe(idea_events.DELETED, self.ideas_deleted)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._users),
+            self.item_label: sum(index.size for index in self._users.values()),
+            **self._counters,
+        }
@@ -0,0 +1,41 @@
+"""
+Standalone generation worker: `python -m src.worker` (run from server/).
+Shares the queue with the API (JOB_QUEUE_PATH) so API pods and workers scale independently.
+Set JOB_WORKER_MODE=external on the API to stop it from running jobs itself.
+"""
+import asyncio
+import signal
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from .job_queue import JobWorker
+from .llm_client import close_llm_client
+from .async_db import get_async_db
+from .credits import credit_ledger
+from . import batch, generation  # noqa: F401  (register the "batch" and "generate" handlers)
+
+
+async def main():
+    worker = JobWorker()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await credit_ledger.start()
+    worker.start()
+    print(f"Job worker started (concurrency={worker.concurrency}).")
+    await stop.wait()
+
+    print("Draining job worker...")
+    await worker.drain()
+    await credit_ledger.stop()
+    await close_llm_client()
+    get_async_db().shutdown()
+    print("Job worker stopped.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,37 @@
+"""
+Unit tests run against the benchmark stand-ins (benchmarks/fakes.py): Appwrite and Gemini are
+replaced in-process, so no credentials or network are needed.
+
+    cd server && python -m pytest -q
+"""
+import os
+
+import pytest
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from benchmarks.fakes import FaultProfile
+from benchmarks.scenarios import BenchEnvironment
+
+# Built at import, before any test module imports the server: several modules grab the database singleton on import
+ENV = BenchEnvironment(FaultProfile(), FaultProfile())
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def env() -> BenchEnvironment:
+    return ENV
+
+
+@pytest.fixture
+def seed_user(env):
+    """Creates a user document with the given balance and returns its id."""
+    from src.appwrite_service import DATABASE_ID, USERS_COLLECTION_ID
+
+    def seed(credits: int) -> str:
+        return env.fake_db.seed(DATABASE_ID, USERS_COLLECTION_ID, {"email": "t@example.com", "idea_credits": credits})["$id"]
+    return seed
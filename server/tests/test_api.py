@@ -0,0 +1,65 @@
+import pytest
+
+import main
+from benchmarks.scenarios import BRAINSTORM_PROMPT
+from src.credits import credit_ledger
+from src.generation import IdeaRequest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_history_revalidation_until_a_write(env):
+    async with env.client() as http:
+        first = await http.get("/api/history", params={"limit": 20})
+        etag = first.headers["ETag"]
+        assert first.headers["Cache-Control"] == "private, no-cache"
+
+        unchanged = await http.get("/api/history", params={"limit": 20}, headers={"If-None-Match": etag})
+        assert unchanged.status_code == 304 and unchanged.headers["ETag"] == etag
+
+        star = await http.put(f"/api/ideas/{first.json()['ideas'][0]['id']}/star", json={"starred": True})
+        assert star.status_code == 200
+
+        changed = await http.get("/api/history", params={"limit": 20}, headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+        assert changed.json()["ideas"][0]["is_starred"]
+
+
+async def test_history_etag_differs_per_page(env):
+    async with env.client() as http:
+        first = await http.get("/api/history", params={"limit": 5})
+        second = await http.get("/api/history", params={"limit": 5, "cursor": first.json()["next_cursor"]})
+        assert second.status_code == 200
+        assert second.headers["ETag"] != first.headers["ETag"]
+
+
+async def test_greeting_is_publicly_cacheable(env):
+    async with env.client() as http:
+        r = await http.get("/api/greeting")
+        again = await http.get("/api/greeting", headers={"If-None-Match": r.headers["ETag"]})
+        assert again.status_code == 304 and "public" in again.headers["Cache-Control"]
+
+
+async def disconnect_after(env, event_name: str) -> int:
+    """Starts a brainstorm stream, drops it once `event_name` is sent, returns the change in the user's balance."""
+    user = dict(env.user)
+    before = await credit_ledger.balance(user["$id"])
+    response = await main.generate_idea_stream(IdeaRequest(prompt=BRAINSTORM_PROMPT, no_cache=True), user)
+    events = response.body_iterator
+    async for event in events:
+        if event.startswith(f"event: {event_name}"):
+            break
+    await events.aclose()
+
+    account = credit_ledger._accounts[user["$id"]]
+    assert not account.reservations
+    return await credit_ledger.balance(user["$id"]) - before
+
+
+async def test_disconnect_after_an_idea_is_charged(env):
+    assert await disconnect_after(env, "idea") == -1
+
+
+async def test_disconnect_before_any_idea_is_refunded(env):
+    assert await disconnect_after(env, "token") == 0
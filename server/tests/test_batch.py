@@ -0,0 +1,78 @@
+import pytest
+
+from src import batch, job_queue
+from src.batch import BatchJob
+from src.credits import credit_ledger
+from src.job_queue import JobWorker, get_queue_backend
+
+pytestmark = pytest.mark.anyio
+
+DOCUMENTS = [
+    {"text": "Independent pharmacies struggle to track expiring stock and lose margin every month."},
+    {"text": "Community gardens coordinate watering schedules over group chats and miss days."},
+]
+
+
+class PassThroughEngine:
+    """Preprocessing needs NLTK data; these tests are about queueing and resuming, not summaries."""
+    async def process(self, text: str) -> dict:
+        return {"prompt": text, "timings": {}}
+
+
+@pytest.fixture(autouse=True)
+def preprocess_engine(monkeypatch):
+    monkeypatch.setattr(batch, "get_preprocess_engine", PassThroughEngine)
+
+
+async def run_next_job():
+    worker = JobWorker(get_queue_backend(), heartbeat_interval=60)
+    await worker._execute(get_queue_backend().claim())
+    return worker
+
+
+async def test_batch_runs_on_the_job_queue(env):
+    user_id = env.user["$id"]
+    before = await credit_ledger.balance(user_id)
+    async with env.client() as http:
+        queued = await http.post("/api/generate/batch", json={"documents": DOCUMENTS})
+        assert queued.status_code == 202 and queued.json()["status"] == "queued"
+        job_id = queued.json()["job_id"]
+
+        # Visible from any process through the queue, before a worker picks it up
+        pending = await http.get(f"/api/generate/batch/{job_id}")
+        assert [item["status"] for item in pending.json()["items"]] == ["pending", "pending"]
+
+        await run_next_job()
+        done = (await http.get(f"/api/generate/batch/{job_id}")).json()
+
+    assert done["status"] == "completed" and done["credits_charged"] == 2
+    assert all(item["status"] == "completed" and item["idea_ids"] for item in done["items"])
+    assert await credit_ledger.balance(user_id) == before - 2
+
+
+async def test_retry_resumes_without_regenerating_or_recharging(env, monkeypatch):
+    user_id = env.user["$id"]
+    async with env.client() as http:
+        job_id = (await http.post("/api/generate/batch", json={"documents": DOCUMENTS})).json()["job_id"]
+    backend = get_queue_backend()
+
+    # The first attempt finishes (stores, charges), then its lease expires before complete() lands
+    real_complete = backend.complete
+    monkeypatch.setattr(backend, "complete", lambda *args: False)
+    await run_next_job()
+    first = BatchJob(**backend.get(job_id).result)
+    balance = await credit_ledger.balance(user_id)
+
+    monkeypatch.setattr(backend, "complete", real_complete)
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    worker = await run_next_job()
+
+    job = backend.get(job_id)
+    assert job.status == "succeeded" and job.attempts == 2 and worker.processed == 1
+    assert [item.idea_ids for item in BatchJob(**job.result).items] == [item.idea_ids for item in first.items]
+    assert await credit_ledger.balance(user_id) == balance
+
+
+async def test_unknown_batch_is_not_found(env):
+    async with env.client() as http:
+        assert (await http.get("/api/generate/batch/missing")).status_code == 404
@@ -0,0 +1,118 @@
+import pytest
+from fastapi import HTTPException
+
+from src import credits
+from src.appwrite_service import DATABASE_ID, USERS_COLLECTION_ID
+from src.credits import CreditLedger
+
+pytestmark = pytest.mark.anyio
+
+
+def stored_balance(env, user_id: str) -> int:
+    return env.fake_db.get_document(DATABASE_ID, USERS_COLLECTION_ID, user_id)["idea_credits"]
+
+
+def set_stored_balance(env, user_id: str, value: int):
+    env.fake_db.update_document(DATABASE_ID, USERS_COLLECTION_ID, user_id, {"idea_credits": value})
+
+
+async def test_reserve_holds_until_commit_or_refund(seed_user):
+    ledger = CreditLedger()
+    user_id = seed_user(5)
+
+    first = await ledger.reserve(user_id)
+    second = await ledger.reserve(user_id, amount=2)
+    assert await ledger.balance(user_id) == 2
+
+    assert await ledger.refund(first) == 3
+    assert await ledger.commit(second, amount=1) == 4
+    # Settling twice is a no-op
+    assert await ledger.commit(second) == 4
+    assert await ledger.refund(first) == 4
+
+
+async def test_reserve_refuses_beyond_available(seed_user):
+    ledger = CreditLedger()
+    user_id = seed_user(1)
+
+    await ledger.reserve(user_id)
+    with pytest.raises(HTTPException) as excinfo:
+        await ledger.reserve(user_id)
+    assert excinfo.value.status_code == 403
+
+
+async def test_settled_account_rereads_before_refusing(env, seed_user):
+    ledger = CreditLedger()
+    user_id = seed_user(0)
+
+    with pytest.raises(HTTPException):
+        await ledger.reserve(user_id)
+    set_stored_balance(env, user_id, 2) # a top-up
+    assert (await ledger.reserve(user_id)).amount == 1
+
+
+async def test_known_balance_only_seeds_a_new_account(seed_user):
+    ledger = CreditLedger()
+    user_id = seed_user(3)
+
+    await ledger.commit(await ledger.reserve(user_id, known_balance=3))
+    # A cached user document from before the spend must not resurrect the credit
+    await ledger.reserve(user_id, known_balance=3)
+    assert await ledger.balance(user_id) == 1
+
+
+async def test_flush_decrements_the_stored_balance(env, seed_user):
+    ledger = CreditLedger()
+    user_id = seed_user(10)
+
+    for _ in range(3):
+        await ledger.commit(await ledger.reserve(user_id))
+    set_stored_balance(env, user_id, 20) # changed elsewhere since the account was loaded
+    await ledger.flush()
+
+    assert stored_balance(env, user_id) == 17
+    assert await ledger.balance(user_id) == 17
+    assert ledger.stats()["dirty"] == 0
+
+
+async def test_flush_floors_at_zero_when_spent_elsewhere(env, seed_user):
+    ledger = CreditLedger()
+    user_id = seed_user(3)
+
+    for _ in range(3):
+        await ledger.commit(await ledger.reserve(user_id))
+    set_stored_balance(env, user_id, 1) # another process already spent most of it
+    await ledger.flush()
+
+    assert stored_balance(env, user_id) == 0
+    assert ledger.flush_errors == 0
+
+
+async def test_flush_keeps_spends_that_fail_to_write(env, seed_user, monkeypatch):
+    ledger = CreditLedger()
+    user_id = seed_user(5)
+    await ledger.commit(await ledger.reserve(user_id))
+
+    async def unavailable(*args, **kwargs):
+        raise RuntimeError("Appwrite unavailable")
+    monkeypatch.setattr(ledger, "_apply_spend", unavailable)
+    await ledger.flush()
+    assert ledger.flush_errors == 1 and stored_balance(env, user_id) == 5
+
+    monkeypatch.undo()
+    await ledger.flush()
+    assert stored_balance(env, user_id) == 4
+
+
+async def test_idle_settled_accounts_are_evicted(seed_user, monkeypatch):
+    ledger = CreditLedger()
+    busy, idle = seed_user(5), seed_user(5)
+    await ledger.reserve(busy)
+    await ledger.balance(idle)
+
+    monkeypatch.setattr(credits, "CREDIT_ACCOUNT_IDLE_SECONDS", -1)
+    await ledger.flush()
+
+    # The held reservation keeps its account
+    assert ledger.stats()["accounts"] == 1
+    assert ledger.evictions == 1
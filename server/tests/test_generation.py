@@ -0,0 +1,55 @@
+import pytest
+from appwrite.query import Query
+
+from benchmarks.scenarios import BRAINSTORM_PROMPT
+from src.appwrite_service import DATABASE_ID, IDEAS_COLLECTION_ID
+from src.credits import credit_ledger
+from src.generation import generate_job_handler
+from src.job_queue import JobLease, LeaseLost, MemoryQueueBackend
+
+from .test_job_queue import make_job
+
+pytestmark = pytest.mark.anyio
+
+
+def claimed_lease(backend: MemoryQueueBackend, payload: dict) -> JobLease:
+    backend.enqueue(make_job("generate", payload=payload))
+    return JobLease(backend, backend.claim())
+
+
+def stored_job_ideas(env, job_id: str) -> list:
+    return env.fake_db.list_documents(DATABASE_ID, IDEAS_COLLECTION_ID, queries=[Query.equal("job_id", job_id)])['documents']
+
+
+async def test_retried_job_returns_the_stored_ideas(env):
+    user_id = env.user["$id"]
+    payload = {"prompt": BRAINSTORM_PROMPT, "no_cache": True, "user_id": user_id}
+    backend = MemoryQueueBackend()
+    lease = claimed_lease(backend, payload)
+    before = await credit_ledger.balance(user_id)
+
+    first = await generate_job_handler(payload, lease)
+    # e.g. complete() failed or the lease expired after the ideas were stored and charged
+    retry = await generate_job_handler(payload, lease)
+
+    assert retry["ideas"] == first["ideas"]
+    assert len(stored_job_ideas(env, lease.job_id)) == len(first["ideas"])
+    assert await credit_ledger.balance(user_id) == before - 1
+
+
+async def test_re_leased_attempt_stores_nothing(env, monkeypatch):
+    from src import job_queue
+
+    user_id = env.user["$id"]
+    payload = {"prompt": BRAINSTORM_PROMPT, "no_cache": True, "user_id": user_id}
+    backend = MemoryQueueBackend()
+    lease = claimed_lease(backend, payload)
+    before = await credit_ledger.balance(user_id)
+
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    backend.claim()
+    with pytest.raises(LeaseLost):
+        await generate_job_handler(payload, lease)
+
+    assert stored_job_ideas(env, lease.job_id) == []
+    assert await credit_ledger.balance(user_id) == before
@@ -0,0 +1,53 @@
+from src.history_cache import HistoryCache
+from src.http_cache import etag_matches, make_etag
+
+
+def doc(idea_id: str, created_at: str = "2024-01-01T00:00:00") -> dict:
+    return {"$id": idea_id, "name": idea_id, "problem": "p", "is_starred": False, "created_at": created_at}
+
+
+def test_fill_is_skipped_when_a_write_lands_during_the_read():
+    cache = HistoryCache(max_items=10)
+    read_version = cache.version("u")
+    cache.ideas_created("u", [doc("new")])
+
+    assert not cache.fill("u", [doc("old")], complete=True, read_version=read_version)
+    assert not cache.is_cached("u")
+
+
+def test_writes_bump_the_version_and_update_the_window():
+    cache = HistoryCache(max_items=10)
+    assert cache.fill("u", [doc("a")], complete=True, read_version=cache.version("u"))
+    versions = [cache.version("u")]
+
+    cache.ideas_created("u", [doc("b", "2024-01-02T00:00:00")])
+    versions.append(cache.version("u"))
+    cache.idea_updated("u", "a", {"is_starred": True})
+    versions.append(cache.version("u"))
+    cache.ideas_deleted("u", ["b"])
+    versions.append(cache.version("u"))
+
+    assert len(set(versions)) == len(versions)
+    items, has_more = cache.get_page("u", 10)
+    assert [item["id"] for item in items] == ["a"] and items[0]["is_starred"] and not has_more
+
+
+def test_evicted_versions_are_never_reused():
+    cache = HistoryCache(max_users=2, max_versions=2)
+    first = cache.version("u")
+    cache.version("v")
+    cache.version("w") # evicts "u"
+
+    assert cache.stats()["versions"] == 2
+    assert cache.version("u") != first
+    assert not cache.fill("u", [doc("a")], complete=True, read_version=first)
+
+
+def test_etag_matching():
+    etag = make_etag("epoch", "u", 1)
+    assert etag.startswith('W/"')
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag[2:]}', etag) # weak comparison ignores W/
+    assert etag_matches("*", etag)
+    assert not etag_matches(make_etag("epoch", "u", 2), etag)
+    assert not etag_matches(None, etag)
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from src.idea_parser import IdeaStreamParser, parse_ideas
+
+IDEAS = [
+    {"Name": "Lab Swap", "Problem": "Labs overpay for equipment.", "Solution": "A refurbished equipment marketplace."},
+    {"Name": "Quote \"Bot\"", "Problem": "Escaped \\ quotes and {braces} in text.", "Solution": "Parse them as string content."},
+    {"Name": "Ledger", "Problem": "Small shops lose receipts.", "Solution": "Photograph and file them automatically."},
+]
+
+
+def stream(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, 10_000])
+def test_ideas_complete_regardless_of_chunking(size):
+    text = "```json\n" + json.dumps(IDEAS, indent=2) + "\n```"
+    parser = IdeaStreamParser()
+    completed = [idea for chunk in stream(text, size) for idea in parser.feed(chunk)]
+
+    assert [idea.name for idea in completed] == ["Lab Swap", 'Quote "Bot"', "Ledger"]
+    assert parser.closed and parser.finish() == []
+
+
+def test_each_idea_is_emitted_by_the_chunk_that_closes_it():
+    text = json.dumps(IDEAS)
+    first_end = text.index("}") + 1
+    parser = IdeaStreamParser()
+
+    assert parser.feed(text[:first_end - 1]) == []
+    assert [idea.name for idea in parser.feed(text[first_end - 1:first_end])] == ["Lab Swap"]
+
+
+def test_invalid_and_truncated_items_are_reported_by_index():
+    items = [IDEAS[0], {"Name": "Too short", "Problem": "x", "Solution": "y"}, IDEAS[2]]
+    text = json.dumps(items)[:-1] + ', {"Name": "Cut off", "Problem": "Never fin'
+    parser = IdeaStreamParser()
+    parser.feed(text)
+    malformed = parser.finish()
+
+    assert [idea.name for idea in parser.ideas] == ["Lab Swap", "Ledger"]
+    assert [item["index"] for item in malformed] == [1, 3]
+    assert malformed[1]["error"] == "Truncated idea object"
+
+
+def test_only_the_unfinished_object_is_buffered():
+    parser = IdeaStreamParser()
+    parser.feed(json.dumps(IDEAS[:2])[:-1] + ', {"Name": "Pa')
+    assert parser._buffer == '{"Name": "Pa'
+
+
+def test_parse_ideas_on_a_complete_response():
+    ideas, malformed = parse_ideas(json.dumps(IDEAS))
+    assert len(ideas) == 3 and malformed == []
@@ -0,0 +1,130 @@
+import asyncio
+import time
+import uuid
+from typing import Optional
+
+import pytest
+
+from src import job_queue
+from src.job_queue import (
+    Job, JobLease, JobWorker, LeaseLost, MemoryQueueBackend, SQLiteQueueBackend, _open_sqlite_backend,
+    register_job_handler,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryQueueBackend()
+    return SQLiteQueueBackend(str(tmp_path / "jobs.sqlite3"))
+
+
+def make_job(kind: str = "test", payload: Optional[dict] = None, **fields) -> Job:
+    now = time.time()
+    return Job(job_id=str(uuid.uuid4()), kind=kind, payload=payload or {}, created_at=now, updated_at=now, **fields)
+
+
+def test_unusable_queue_path_falls_back_to_memory(tmp_path):
+    not_a_directory = tmp_path / "file"
+    not_a_directory.write_text("")
+    assert isinstance(_open_sqlite_backend(str(not_a_directory / "jobs.sqlite3")), MemoryQueueBackend)
+
+
+def test_expired_lease_is_handed_out_again(backend, monkeypatch):
+    job = backend.enqueue(make_job())
+    assert backend.claim().attempts == 1
+    assert backend.claim() is None
+
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    assert backend.claim().attempts == 2
+
+
+def test_stale_attempt_cannot_write(backend, monkeypatch):
+    job = backend.enqueue(make_job())
+    backend.claim()
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    backend.claim()
+
+    assert not backend.renew(job.job_id, 1)
+    assert not backend.complete(job.job_id, 1, {"from": "stale"})
+    assert not backend.fail(job.job_id, 1, "stale", retry_at=None)
+    assert backend.get(job.job_id).status == "running"
+
+    assert backend.complete(job.job_id, 2, {"from": "current"})
+    assert backend.get(job.job_id).result == {"from": "current"}
+    # Finished: no attempt holds a lease any more
+    assert not backend.renew(job.job_id, 2)
+
+
+def test_failed_attempt_is_requeued_or_final(backend):
+    job = backend.enqueue(make_job())
+    backend.claim()
+    assert backend.fail(job.job_id, 1, "boom", retry_at=time.time() - 1)
+    assert backend.get(job.job_id).status == "queued"
+
+    backend.claim()
+    assert backend.fail(job.job_id, 2, "boom", retry_at=None)
+    assert backend.get(job.job_id).status == "failed"
+
+
+def test_idempotency_key_returns_the_existing_job(backend):
+    first = backend.enqueue(make_job(idempotency_key="k", owner_id="u"))
+    assert backend.enqueue(make_job(idempotency_key="k", owner_id="u")).job_id == first.job_id
+    assert backend.enqueue(make_job(idempotency_key="k", owner_id="v")).job_id != first.job_id
+
+
+@pytest.mark.anyio
+async def test_worker_cancels_a_handler_whose_lease_was_taken(backend, monkeypatch):
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    @register_job_handler("test_lease_lost")
+    async def slow_handler(payload, lease):
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return {}
+
+    job = backend.enqueue(make_job("test_lease_lost"))
+    worker = JobWorker(backend, heartbeat_interval=0.01)
+    execution = asyncio.create_task(worker._execute(backend.claim()))
+    await started.wait()
+
+    # Another worker re-leases the job while the first one is still running it
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    assert backend.claim().attempts == 2
+    await asyncio.wait_for(execution, 5)
+
+    assert cancelled.is_set()
+    assert worker.leases_lost == 1 and worker.processed == 0
+    stored = backend.get(job.job_id)
+    assert stored.status == "running" and stored.attempts == 2
+
+
+@pytest.mark.anyio
+async def test_worker_records_result_under_its_lease(backend):
+    @register_job_handler("test_succeeds")
+    async def handler(payload, lease):
+        return {"ok": True}
+
+    job = backend.enqueue(make_job("test_succeeds"))
+    worker = JobWorker(backend, heartbeat_interval=0.01)
+    await worker._execute(backend.claim())
+
+    assert worker.processed == 1 and worker.leases_lost == 0
+    assert backend.get(job.job_id).result == {"ok": True}
+
+
+@pytest.mark.anyio
+async def test_lease_check_stops_a_re_leased_attempt(backend, monkeypatch):
+    backend.enqueue(make_job())
+    lease = JobLease(backend, backend.claim())
+    await lease.check()
+
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    backend.claim()
+    with pytest.raises(LeaseLost):
+        await lease.check()
+    assert lease.lost
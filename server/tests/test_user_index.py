@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from src.search_index import SearchIndex
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_flushed_snapshot_of_an_expired_index_is_rebuilt(env, tmp_path):
+    index = SearchIndex(directory=str(tmp_path), max_age=60)
+    user_id = env.user["$id"]
+    await index.get(user_id)
+
+    # An index built long ago, rewritten by a flush: the file is new, the contents are not
+    stale = index._users.pop(user_id)
+    stale.built_at -= 120
+    index._save_snapshot(user_id, stale)
+
+    fresh = await index.get(user_id)
+    assert time.time() - fresh.built_at < 60
+    assert index.stats()["builds"] == 2 and index.stats()["snapshot_loads"] == 0
+
+
+async def test_fresh_snapshot_is_loaded_instead_of_rebuilt(env, tmp_path):
+    user_id = env.user["$id"]
+    await SearchIndex(directory=str(tmp_path)).get(user_id)
+
+    restarted = SearchIndex(directory=str(tmp_path))
+    await restarted.get(user_id)
+    assert restarted.stats()["builds"] == 0 and restarted.stats()["snapshot_loads"] == 1
+
+
+def idea(idea_id: str, text: str) -> dict:
+    return {"$id": idea_id, "name": text, "problem": text, "result": text, "created_at": "2024-01-01T00:00:00"}
+
+
+def paged_build(monkeypatch, pages, between_pages):
+    """Makes builds scan `pages`, calling `between_pages()` after the first one (a write racing the scan)."""
+    from src import user_index
+
+    async def iter_user_ideas(adb, user_id, fields, page_size):
+        for number, page in enumerate(pages):
+            yield page
+            if number == 0:
+                between_pages()
+    monkeypatch.setattr(user_index, "iter_user_ideas", iter_user_ideas)
+
+
+async def test_events_during_a_build_are_applied(tmp_path, monkeypatch):
+    index = SearchIndex(directory=str(tmp_path))
+
+    def write_during_scan():
+        index.ideas_created("u", [idea("new", "quantum bakery")])
+        index.ideas_deleted("u", ["later"])
+    paged_build(monkeypatch, [[idea("old", "solar kiosk")], [idea("later", "drone library")]], write_during_scan)
+
+    built = await index.get("u")
+    assert set(built.docs) == {"old", "new"}
+
+
+async def test_text_edit_during_a_build_forces_a_rebuild(tmp_path, monkeypatch):
+    index = SearchIndex(directory=str(tmp_path))
+    paged_build(monkeypatch, [[idea("a", "solar kiosk")], []],
+                lambda: index.idea_updated("u", "a", {"name": "lunar kiosk"}))
+
+    await index.get("u")
+    await index.get("u")
+    assert index.stats()["builds"] == 2 and index.stats()["snapshot_loads"] == 0
+
+
+async def test_concurrent_gets_share_one_build(tmp_path, monkeypatch):
+    import asyncio
+
+    index = SearchIndex(directory=str(tmp_path))
+    paged_build(monkeypatch, [[idea("a", "solar kiosk")]], lambda: None)
+
+    results = await asyncio.gather(*[index.get("u") for _ in range(5)])
+    assert all(result is results[0] for result in results)
+    assert index.stats()["builds"] == 1 and not index._build_locks and not index._pending_events